@@ -1,8 +1,13 @@
 import os
-from openai import OpenAI
-from swarm import Agent, Swarm
-from typing import List, Dict, Any
-from back.database_manager import FAQManager
+import time
+from swarm import Agent, Response, Swarm
+from typing import List, Dict, Any, Callable, Optional
+from back.context_window import ContextWindow, build_retrieval_query, count_message_tokens, count_tokens, make_chat_summarizer
+from back.database_manager import get_faq_manager
+from back.fast_path import FastPathRouter
+from back.metrics import metrics, span
+from back.provider_client import get_provider_client
+from back.query_cache import normalize_query
 import json
 
 def search_database(messages: List[Dict[str, str]], context_variables: Dict[str, Any]) -> str:
@@ -11,36 +16,34 @@ def search_database(messages: List[Dict[str, str]], context_variables: Dict[str,
 
     Args:
         messages (List[Dict[str, str]]): List of messages from the conversation history.
-        context_variables (Dict[str, Any]): Context variables, including the path to the knowledge database file.
+        context_variables (Dict[str, Any]): Context variables, including the path to the knowledge database file,
+            the text of the recent user turns and, if the turn already searched them, the 'retrieval' results.
 
     Returns:
         str: Formatted response with the best matches from the database.
     """
-    faq_manager = FAQManager(context_variables["knowledge_db_file"])
-    
-    if isinstance(messages, str): # 5 ultimas consultas
-        enriched_query = [messages]
-    else:
-        enriched_query = messages[-5:]
-
-    enriched_query = " ".join(enriched_query)
-    results = faq_manager.search_faq(enriched_query, k=3)
-    print(f"\033[92mDatabase top-3 results:\033[0m")
+    with span("tool.search_database") as record:
+        faq_manager = get_faq_manager(context_variables["knowledge_db_file"])
+
+        # Texto de los últimos turnos del usuario
+        enriched_query = build_retrieval_query(messages) or context_variables.get("retrieval_query", "")
+        # Resultados que el turno ya buscó para la clave de la caché de respuestas, si siguen vigentes
+        retrieval = context_variables.get("retrieval") or {}
+        if retrieval and normalize_query(retrieval["query"]) == normalize_query(enriched_query) and retrieval["version"] == faq_manager.version:
+            results = retrieval["results"]
+            record["reused"] = True
+        else:
+            results = faq_manager.search_faq(enriched_query, k=3)
+        record["results"] = [{"id": result["id"], "rrf_score": result["rrf_score"]} for result in results]
     if not results:
         return json.dumps({"answer": None, "confidence": 0})
-    
-    for result in results:
-        print(f"Question: {result['question']}")
-        print(f"Answer: {result['answer']}")
-        print(f"Confidence: {result['score']}")
-        print("---")
-    
-    best_result = max(results, key=lambda x: x['score'])
+
     db_response = f"Respuestas de la base de datos:\n"
     for result in results:
         db_response += f"Pregunta: {result['question']}\n"
         db_response += f"Respuesta: {result['answer']}\n"
-        db_response += f"Confianza: {result['score']}\n"
+        # Puntaje de fusión de rangos: mayor es mejor (no es la distancia vectorial)
+        db_response += f"Relevancia (mayor es mejor): {result['rrf_score']:.4f}\n"
         db_response += "---\n"
     return db_response
 
@@ -115,7 +118,8 @@ customer_service_agent = Agent(
 
 def pretty_print_messages(messages) -> None:
     """
-    Prints the messages and tool calls from agents in a formatted manner.
+    Prints the messages and tool calls from agents in a formatted manner. Only the
+    interactive demo loop prints them; the server's turns are traced with spans.
 
     Args:
         messages (List[Dict]): List of messages and tool calls from agents.
@@ -150,42 +154,164 @@ class AgentManager:
         """
         Initializes the AgentManager.
 
+        Only the most recent turns that fit in CONTEXT_MAX_TOKENS are sent to the model.
+        If CONTEXT_SUMMARY_MODEL is set, older turns are folded into a rolling summary
+        with that model. Queries whose best FAQ match is within FAST_PATH_MAX_DISTANCE
+        are answered from the FAQ without calling the agents (0 disables it), and
+        paraphrases of queries already answered are served from the FAQ manager's
+        response cache. Completions go through the process-wide provider client.
+
         Args:
             global_context (Dict[str, Any], optional): Global context for all agents. Defaults to {}.
         """
-        self.swarm = Swarm(
-            client = OpenAI(
-                # base_url="https://api.groq.com/openai/v1",
-                api_key=os.getenv("OPENAI_API_KEY"),
-            ),
-            
+        self.swarm = Swarm(client=get_provider_client().openai)
+        summary_model = os.getenv("CONTEXT_SUMMARY_MODEL")
+        self.context_window = ContextWindow(
+            max_tokens=int(os.getenv("CONTEXT_MAX_TOKENS", "2000")),
+            summarizer=make_chat_summarizer(self.swarm.client, summary_model) if summary_model else None,
         )
         self.messages = []
         self.agent = triage_agent
         self.global_context = global_context
+        self.turn_tokens: List[Dict[str, int]] = []
+        self.faq_manager = None
+        self.fast_path = None
+        if "knowledge_db_file" in global_context:
+            self.faq_manager = get_faq_manager(global_context["knowledge_db_file"])
+            self.fast_path = FastPathRouter(
+                self.faq_manager,
+                max_distance=float(os.getenv("FAST_PATH_MAX_DISTANCE", "0.1")),
+            )
+
+    def reset(self, messages: Optional[List[Dict[str, Any]]] = None, agent: Optional[Agent] = None, summary: str = "", summarized: int = 0):
+        """
+        Replace the conversation state, reusing the Swarm/OpenAI client.
+
+        Args:
+            messages (Optional[List[Dict[str, Any]]], optional): Conversation history. Defaults to an empty history.
+            agent (Optional[Agent], optional): Current agent. Defaults to the triage agent.
+            summary (str, optional): Rolling summary of the older turns. Defaults to "".
+            summarized (int, optional): Number of messages already in the summary. Defaults to 0.
+        """
+        self.messages = messages if messages is not None else []
+        self.agent = agent or triage_agent
+        self.context_window.summary = summary
+        self.context_window.summarized = summarized
+        self.turn_tokens = []
         
-    def run(self, user_query: str, context: Dict[str, Any] = {}):
+    def _answer_directly(self, content: str, sender: str, context_variables: Dict[str, Any], on_token: Optional[Callable[[str], None]]) -> Response:
+        """
+        Answer the current turn with a stored text, without calling the agents.
+
+        Args:
+            content (str): The answer.
+            sender (str): Name shown as the sender of the answer.
+            context_variables (Dict[str, Any]): Context variables of the returned Response.
+            on_token (Optional[Callable[[str], None]]): Streaming callback, if any.
+
+        Returns:
+            Response: The answer from the current agent.
+        """
+        if on_token is not None:
+            on_token(content)
+        self.turn_tokens.append({"turn": len(self.turn_tokens) + 1, "history_messages": len(self.messages), "window_messages": 0, "prompt_tokens": 0, "history_tokens": 0})
+        response = Response(
+            messages=[{"role": "assistant", "content": content, "sender": sender}],
+            agent=self.agent,
+            context_variables=context_variables,
+        )
+        self.messages.append({"role": "assistant", "content": content})
+        return response
+
+    def run(self, user_query: str, context: Dict[str, Any] = {}, on_token: Optional[Callable[[str], None]] = None):
         """
         Runs a user query through the agent system.
 
         Args:
             user_query (str): User's query.
             context (Dict[str, Any], optional): Specific context for this query. Defaults to {}.
+            on_token (Optional[Callable[[str], None]], optional): If given, the completion is
+                streamed and this callback receives each partial assistant text as it arrives.
+                Defaults to None.
 
         Returns:
-            Response: Response from the current agent.
+            Response: Response from the current agent. On the fast path, the stored FAQ
+                answer, with the matched FAQ in context_variables["fast_path"]; from the
+                response cache, the cached answer, with the match in
+                context_variables["response_cache"].
         """
         self.messages.append({"role": "user", "content": user_query})
 
-        response = self.swarm.run(
-            agent=self.agent,
-            messages=self.messages,
-            context_variables=self.global_context or context,
-            stream=False,
-            debug=False,
-        )
+        if self.fast_path:
+            with span("agent.fast_path") as record:
+                match = self.fast_path.route(user_query)
+                record["hit"] = bool(match)
+            metrics.inc("cache_requests_total", cache="fast_path", result="hit" if match else "miss")
+            if match:
+                # Coincidencia casi exacta: se responde con la FAQ sin pasar por los agentes
+                metrics.inc("chat_turns_total", path="fast_path")
+                return self._answer_directly(match["answer"], "FAQFastPath", {"fast_path": match}, on_token)
+
+        cache_key = None
+        retrieval_query = build_retrieval_query(self.messages)
+        retrieval = None
+        if self.faq_manager is not None and self.faq_manager.response_cache.max_entries > 0:
+            with span("agent.response_cache") as record:
+                # Clave de la caché: la recuperación del turno (que search_database reutiliza), el agente actual y,
+                # solo si la búsqueda híbrida ya lo calculó, el embedding de la consulta; sin él se compara el texto
+                version = self.faq_manager.version
+                results = self.faq_manager.search_faq(retrieval_query, k=3)
+                retrieval = {"query": retrieval_query, "version": version, "results": results}
+                embedding = self.faq_manager.query_cache.get_embedding(retrieval_query)
+                record["embedded"] = embedding is not None
+                cache_key = (retrieval_query, embedding, self.agent.name, [result["id"] for result in results])
+                cached = self.faq_manager.response_cache.get(*cache_key)
+                record["hit"] = bool(cached)
+            metrics.inc("cache_requests_total", cache="response", result="hit" if cached else "miss")
+            if cached:
+                metrics.inc("chat_turns_total", path="response_cache")
+                return self._answer_directly(cached["answer"], "ResponseCache", {"response_cache": cached}, on_token)
+
+        with span("agent.context_window") as record:
+            window = self.context_window.build(self.messages)
+            instructions = self.agent.instructions if isinstance(self.agent.instructions, str) else ""
+            self.turn_tokens.append({
+                "turn": len(self.turn_tokens) + 1,
+                "history_messages": len(self.messages),
+                "window_messages": len(window),
+                "prompt_tokens": count_tokens(instructions) + count_message_tokens(window),
+                "history_tokens": count_tokens(instructions) + count_message_tokens(self.messages),
+            })
+            record.update(self.turn_tokens[-1])
+        metrics.inc("chat_tokens_total", self.turn_tokens[-1]["prompt_tokens"], kind="prompt")
+
+        started = time.perf_counter()
+        with span("agent.completion", agent=self.agent.name, stream=on_token is not None) as record:
+            response = self.swarm.run(
+                agent=self.agent,
+                messages=window,
+                context_variables={**(self.global_context or context), "retrieval_query": retrieval_query, "retrieval": retrieval},
+                stream=on_token is not None,
+                debug=False,
+            )
+            if on_token is not None:
+                # Con stream=True Swarm entrega fragmentos y al final {"response": Response}
+                for chunk in response:
+                    if "response" in chunk:
+                        response = chunk["response"]
+                    elif chunk.get("content"):
+                        if "first_token_ms" not in record:
+                            record["first_token_ms"] = round((time.perf_counter() - started) * 1000, 3)
+                        on_token(chunk["content"])
+            record["completion_tokens"] = count_tokens(response.messages[-1]["content"] or "")
+            record["final_agent"] = response.agent.name
+        metrics.inc("chat_tokens_total", record["completion_tokens"], kind="completion")
+        metrics.inc("chat_turns_total", path="agents")
+
+        # Solo se guardan respuestas sin traspaso de agente y de un corpus que no cambió entre tanto
+        if cache_key is not None and response.agent.name == self.agent.name and self.faq_manager.version == version:
+            self.faq_manager.response_cache.put(*cache_key, response.messages[-1]["content"], latency=time.perf_counter() - started)
 
-        pretty_print_messages(response.messages)
         self.messages.extend([{"role": "assistant", "content": response.messages[-1]["content"]}])
         self.agent = response.agent
         return response
@@ -202,13 +328,7 @@ def run_demo_loop(
         stream (bool, optional): Whether to use streaming. Defaults to False.
         debug (bool, optional): Whether to activate debug mode. Defaults to False.
     """
-    client = Swarm(
-        client = OpenAI(
-            # base_url="https://api.groq.com/openai/v1",
-            api_key=os.getenv("OPENAI_API_KEY"),
-        ),
-        
-    )
+    client = Swarm(client=get_provider_client().openai)
     print("Starting Swarm CLI 🐝")
 
     messages = []
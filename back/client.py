@@ -1,8 +1,9 @@
 import os
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Callable, Optional
 from dotenv import load_dotenv
 from back.agents import AgentManager
-from back.database_manager import TicketDatabase
+from back.database_manager import TicketDatabase, get_faq_manager
+from back.metrics import span
 
 load_dotenv()
 
@@ -15,38 +16,106 @@ class BackClient:
 
     Attributes:
         ticket_db (TicketDatabase): An instance of TicketDatabase for managing tickets.
+        faq_manager (FAQManager): The process-wide FAQ index shared with the agents.
         agent_manager (AgentManager): An instance of AgentManager for handling agent interactions.
         user_data (Dict[str, str]): Stores current user information.
 
     Args:
         knowledge_db_file (str): Path to the knowledge database file.
         ticket_db_file (str): Path to the ticket database file.
+        ticket_id_allocator (Optional[Any]): Shared ticket ID allocator (e.g. the MongoDB
+            counter) for the ticket database. Defaults to its SQLite sequence.
     """
 
-    def __init__(self, knowledge_db_file: str, ticket_db_file: str):
-        self.ticket_db = TicketDatabase(ticket_db_file)
+    def __init__(self, knowledge_db_file: str, ticket_db_file: str, ticket_id_allocator: Optional[Any] = None):
+        self.ticket_db = TicketDatabase(ticket_db_file, id_allocator=ticket_id_allocator)
+        # Construye (o reutiliza) el indice FAQ compartido del proceso
+        self.faq_manager = get_faq_manager(knowledge_db_file)
         self.agent_manager = AgentManager(global_context={"knowledge_db_file": knowledge_db_file})
         self.user_data = None
-
-    def set_user_data(self, name: str, email: str, phone: str) -> Dict[str, str]:
+        self.record_tickets = True
+
+    def set_user_data(self, name: str, email: str, phone: str, ticket_id: Optional[str] = None) -> Dict[str, str]:
+        """
+        Set the current user and open their ticket.
+
+        Args:
+            name (str): User name.
+            email (str): User email.
+            phone (str): User phone.
+            ticket_id (Optional[str]): ID of a ticket whose messages the caller persists
+                itself. If given, the conversation is not written to the ticket database.
+
+        Returns:
+            Dict[str, str]: The user data, with its 'ticket_id'.
+        """
         user_data = {"name": name, "email": email, "phone": phone}
-        user_data["ticket_id"] = self.ticket_db.save_ticket(user_data, "Inicio de conversación", "Bienvenido al sistema de atención al cliente.")
+        self.record_tickets = ticket_id is None
+        if ticket_id is None:
+            ticket_id = self.ticket_db.save_ticket(user_data, "Inicio de conversación", "Bienvenido al sistema de atención al cliente.")
+        user_data["ticket_id"] = ticket_id
         self.user_data = user_data
         return user_data
 
     def start_conversation(self):
         content = "¡Hola! Soy tu asistente virtual. ¿En qué puedo ayudarte hoy?"
         self.agent_manager.messages.append({"role": "assistant", "content": content, "sender": "WelcomeAgent"})
-        self.ticket_db.update_ticket(self.user_data["ticket_id"], "Sistema", content)
+        if self.record_tickets:
+            self.ticket_db.update_ticket(self.user_data["ticket_id"], "Sistema", content)
         return self.agent_manager
 
-    def process_user_query(self, user_query: str):
-        self.ticket_db.update_ticket(self.user_data["ticket_id"], "Usuario", user_query)
-        response = self.agent_manager.run(user_query=user_query, context=self.user_data)
-        assistant_response = response.messages[-1]["content"]
-        self.ticket_db.update_ticket(self.user_data["ticket_id"], "Asistente", assistant_response)
+    def process_user_query(self, user_query: str, on_token: Optional[Callable[[str], None]] = None):
+        with span("turn", ticket_id=self.user_data["ticket_id"]) as record:
+            if self.record_tickets:
+                self.ticket_db.update_ticket(self.user_data["ticket_id"], "Usuario", user_query)
+            response = self.agent_manager.run(user_query=user_query, context=self.user_data, on_token=on_token)
+            assistant_response = response.messages[-1]["content"]
+            # Las respuestas directas desde las FAQs o la caché quedan marcadas en el ticket
+            role = "Asistente"
+            if response.context_variables.get("fast_path"):
+                role = "Asistente (FAQ)"
+            elif response.context_variables.get("response_cache"):
+                role = "Asistente (caché)"
+            if self.record_tickets:
+                self.ticket_db.update_ticket(self.user_data["ticket_id"], role, assistant_response)
+            record["role"] = role
         return response
 
+    def export_state(self) -> Dict[str, Any]:
+        """
+        Detach the per-conversation state so it can be restored on another client.
+
+        Returns:
+            Dict[str, Any]: The user data, message history and current agent.
+        """
+        return {
+            "user_data": self.user_data,
+            "messages": self.agent_manager.messages,
+            "agent": self.agent_manager.agent,
+            "summary": self.agent_manager.context_window.summary,
+            "summarized": self.agent_manager.context_window.summarized,
+            "record_tickets": self.record_tickets,
+        }
+
+    def load_state(self, state: Optional[Dict[str, Any]] = None):
+        """
+        Restore a conversation exported with export_state, or clear it if state is None.
+
+        Args:
+            state (Optional[Dict[str, Any]]): State returned by export_state.
+        """
+        state = state or {}
+        self.user_data = state.get("user_data")
+        self.record_tickets = state.get("record_tickets", True)
+        self.agent_manager.reset(state.get("messages"), state.get("agent"), state.get("summary", ""), state.get("summarized", 0))
+
+    def clear_history(self):
+        """
+        Forget the agent history of the current conversation, keeping its user data
+        and ticket.
+        """
+        self.agent_manager.reset()
+
     def get_conversation_history(self):
         return self.agent_manager.messages
 
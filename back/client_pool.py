@@ -0,0 +1,201 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Executor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional
+
+class BackClientPool:
+    """
+    Fixed-size pool of pre-warmed BackClient workers with session affinity.
+
+    Only `size` workers exist and a checkout holds one for the whole request, so at
+    most `size` requests use a client at once; a request waits without holding
+    anything until its session's worker (or any worker) is free, so a busy session
+    never blocks the others. A session stays bound to the worker that served
+    it; when every worker is bound, the least recently used idle session is parked
+    (its state is exported) and its worker is reused, and the parked state is loaded
+    back onto whichever worker serves the session next. Sessions idle for longer
+    than `idle_timeout` are dropped.
+    """
+
+    def __init__(self, factory: Callable[[], Any], size: int = 10, idle_timeout: float = 900.0, executor: Optional[Executor] = None):
+        """
+        Initialize the BackClientPool.
+
+        Args:
+            factory (Callable[[], Any]): Builds a client exposing export_state/load_state.
+            size (int): Number of workers. Defaults to 10.
+            idle_timeout (float): Seconds before an idle session is dropped. Defaults to 900.
+            executor (Optional[Executor]): Executor for the blocking factory calls.
+                Defaults to the event loop's default executor.
+        """
+        self.factory = factory
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.executor = executor
+        self._changed = asyncio.Condition()
+        self._free: List[Any] = []
+        self._bound: "OrderedDict[str, Any]" = OrderedDict()  # Sesión -> cliente, de menos a más reciente
+        self._parked: Dict[str, Dict[str, Any]] = {}
+        self._last_used: Dict[str, float] = {}
+        self._busy: set = set()
+        self._started = False
+        self._start_lock = asyncio.Lock()
+        self.creations = 0
+        self.checkouts = 0
+        self.parks = 0
+        self.evictions = 0
+        self._waits: Deque[float] = deque(maxlen=1000)
+
+    async def start(self):
+        """
+        Build every worker up front (idempotent).
+        """
+        async with self._start_lock:
+            if self._started:
+                return
+            loop = asyncio.get_running_loop()
+            clients = await asyncio.gather(*(loop.run_in_executor(self.executor, self.factory) for _ in range(self.size)))
+            self.creations += len(clients)
+            self._free.extend(clients)
+            self._started = True
+
+    def _evict_idle(self, now: float):
+        """
+        Drop the state of sessions idle for longer than idle_timeout.
+        """
+        for session_id, last_used in list(self._last_used.items()):
+            if now - last_used <= self.idle_timeout:
+                continue
+            client = self._bound.get(session_id)
+            if client is not None and id(client) in self._busy:
+                continue
+            self._drop(session_id)
+            self.evictions += 1
+
+    def _drop(self, session_id: str):
+        """
+        Forget a session, returning its worker (if any) to the free list.
+        """
+        client = self._bound.pop(session_id, None)
+        if client is not None:
+            client.load_state(None)
+            self._free.append(client)
+        self._parked.pop(session_id, None)
+        self._last_used.pop(session_id, None)
+
+    def _take(self, session_id: Optional[str]) -> Optional[Any]:
+        """
+        Pick a worker for a session, or None if the session's worker is busy or
+        every worker is busy.
+        """
+        client = self._bound.get(session_id) if session_id is not None else None
+        if client is not None:
+            if id(client) in self._busy:
+                return None
+            self._bound.move_to_end(session_id)
+        else:
+            if not self._free:
+                # Estacionar la sesión inactiva menos reciente y reutilizar su worker
+                victim = next((sid for sid, bound in self._bound.items() if id(bound) not in self._busy), None)
+                if victim is None:
+                    return None
+                parked = self._bound.pop(victim)
+                self._parked[victim] = parked.export_state()
+                parked.load_state(None)
+                self._free.append(parked)
+                self.parks += 1
+            client = self._free.pop()
+            if session_id is not None:
+                client.load_state(self._parked.pop(session_id, None))
+                self._bound[session_id] = client
+        self._busy.add(id(client))
+        return client
+
+    @asynccontextmanager
+    async def checkout(self, session_id: Optional[str] = None) -> AsyncIterator[Any]:
+        """
+        Borrow a worker for the duration of a request.
+
+        Args:
+            session_id (Optional[str]): Conversation to serve. Requests for the same
+                session run one at a time on the same worker. Without a session the
+                worker is lent without conversation state.
+
+        Yields:
+            The BackClient to use.
+        """
+        await self.start()
+        started = time.perf_counter()
+        async with self._changed:
+            self._evict_idle(time.monotonic())
+            client = self._take(session_id)
+            while client is None:
+                await self._changed.wait()
+                client = self._take(session_id)
+        self._waits.append(time.perf_counter() - started)
+        self.checkouts += 1
+        try:
+            yield client
+        finally:
+            async with self._changed:
+                self._busy.discard(id(client))
+                if session_id is None:
+                    self._free.append(client)
+                else:
+                    self._last_used[session_id] = time.monotonic()
+                self._changed.notify_all()
+
+    def has_session(self, session_id: str) -> bool:
+        """
+        Check whether a session is bound to a worker or parked.
+
+        Args:
+            session_id (str): Conversation ID.
+
+        Returns:
+            bool: True if the pool holds state for the session.
+        """
+        return session_id in self._bound or session_id in self._parked
+
+    async def close_session(self, session_id: str):
+        """
+        Forget a session once its conversation ends, freeing its worker.
+
+        Args:
+            session_id (str): Conversation ID.
+        """
+        async with self._changed:
+            client = self._bound.get(session_id)
+            if client is not None and id(client) in self._busy:
+                return
+            self._drop(session_id)
+            self._changed.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get pool metrics: wait times, utilization and worker/session counts.
+
+        Returns:
+            Dict[str, Any]: Pool metrics.
+        """
+        waits = sorted(self._waits)
+
+        def wait_ms(q: float) -> float:
+            return waits[min(len(waits) - 1, round(q * (len(waits) - 1)))] * 1000 if waits else 0.0
+
+        return {
+            "size": self.size,
+            "busy": len(self._busy),
+            "utilization": len(self._busy) / self.size if self.size else 0.0,
+            "bound_sessions": len(self._bound),
+            "parked_sessions": len(self._parked),
+            "free_workers": len(self._free),
+            "creations": self.creations,
+            "checkouts": self.checkouts,
+            "parks": self.parks,
+            "evictions": self.evictions,
+            "wait_p50_ms": wait_ms(0.5),
+            "wait_p99_ms": wait_ms(0.99),
+        }
@@ -0,0 +1,162 @@
+import math
+from typing import Any, Callable, Dict, List, Optional, Union
+
+MESSAGE_OVERHEAD_TOKENS = 4  # Tokens de formato que agrega cada mensaje del chat
+
+_encoding = None
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens of a text with the cl100k_base encoding, or estimate them
+    (4 characters per token) if tiktoken or its encoding file is unavailable.
+
+    Args:
+        text (str): Text to count.
+
+    Returns:
+        int: Number of tokens.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text or ""))
+    return math.ceil(len(text or "") / 4)
+
+def count_message_tokens(messages: List[Dict[str, Any]]) -> int:
+    """
+    Count the prompt tokens of a list of chat messages.
+
+    Args:
+        messages (List[Dict[str, Any]]): Messages with 'role' and 'content'.
+
+    Returns:
+        int: Number of tokens.
+    """
+    return sum(count_tokens(message.get("content") or "") + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+def build_retrieval_query(messages: Union[str, List[Any], None], max_turns: int = 3, max_chars: int = 500) -> str:
+    """
+    Build a search query from the text of the most recent user turns.
+
+    Args:
+        messages (Union[str, List[Any], None]): A query string, a list of strings, or
+            chat messages (dicts with 'role' and 'content'; only user turns are used).
+        max_turns (int): Number of recent turns to include. Defaults to 3.
+        max_chars (int): Maximum query length; the oldest text is cut first. Defaults to 500.
+
+    Returns:
+        str: The query, most recent turn last.
+    """
+    if not messages:
+        return ""
+    if isinstance(messages, str):
+        turns = [messages]
+    else:
+        turns = []
+        for message in messages:
+            if isinstance(message, dict):
+                if message.get("role", "user") == "user" and isinstance(message.get("content"), str):
+                    turns.append(message["content"])
+            elif isinstance(message, str):
+                turns.append(message)
+    query = " ".join(turn.strip() for turn in turns[-max_turns:] if turn.strip())
+    return query[-max_chars:].lstrip()
+
+class ContextWindow:
+    """
+    Token-budgeted sliding window over a conversation.
+
+    The window keeps the most recent messages that fit in `max_tokens`, starting at a
+    user turn. With a summarizer, the turns that slide out of the window are folded
+    into a rolling summary that is sent as the first message, so each older turn is
+    summarized once instead of being resent on every turn.
+    """
+
+    def __init__(self, max_tokens: int = 2000, summarizer: Optional[Callable[[str, List[Dict[str, Any]]], str]] = None, summary_tokens: int = 300):
+        """
+        Initialize the ContextWindow.
+
+        Args:
+            max_tokens (int): Token budget for the conversation messages. Defaults to 2000.
+            summarizer (Optional[Callable[[str, List[Dict[str, Any]]], str]]): Receives the
+                current summary and the messages leaving the window, and returns the new
+                summary. Without it, old turns are simply dropped.
+            summary_tokens (int): Part of the budget reserved for the summary. Defaults to 300.
+        """
+        self.max_tokens = max_tokens
+        self.summarizer = summarizer
+        self.summary_tokens = summary_tokens
+        self.summary = ""
+        self.summarized = 0  # Mensajes ya incorporados al resumen
+
+    @staticmethod
+    def _window_start(messages: List[Dict[str, Any]], budget: int) -> int:
+        """
+        Index of the first message of the longest recent suffix that fits the budget.
+        The last message is always included, and the suffix starts at a user turn.
+        """
+        start, used = len(messages), 0
+        while start > 0:
+            cost = count_message_tokens([messages[start - 1]])
+            if used + cost > budget and start < len(messages):
+                break
+            start -= 1
+            used += cost
+        while 0 < start < len(messages) - 1 and messages[start].get("role") != "user":
+            start += 1
+        return start
+
+    def build(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Select the messages to send for the next completion.
+
+        Args:
+            messages (List[Dict[str, Any]]): The full conversation, oldest first.
+
+        Returns:
+            List[Dict[str, Any]]: The summary (if any) followed by the most recent messages.
+        """
+        if not self.summarizer:
+            return messages[self._window_start(messages, self.max_tokens):]
+
+        budget = self.max_tokens - self.summary_tokens
+        start = max(self._window_start(messages, budget), self.summarized)
+        if start > self.summarized:
+            # Resumir hasta la mitad del presupuesto, para no llamar al modelo en cada turno
+            start = max(start, self._window_start(messages, budget // 2))
+            self.summary = self.summarizer(self.summary, messages[self.summarized:start])
+            self.summarized = start
+        window = messages[start:]
+        if self.summary:
+            window = [{"role": "system", "content": f"Resumen de la conversación anterior: {self.summary}"}] + window
+        return window
+
+def make_chat_summarizer(client: Any, model: str) -> Callable[[str, List[Dict[str, Any]]], str]:
+    """
+    Build a summarizer that folds old turns into the running summary with a chat model.
+
+    Args:
+        client (Any): OpenAI client.
+        model (str): Chat model name.
+
+    Returns:
+        Callable[[str, List[Dict[str, Any]]], str]: Summarizer for ContextWindow.
+    """
+    def summarize(summary: str, messages: List[Dict[str, Any]]) -> str:
+        transcript = "\n".join(f"{message['role']}: {message.get('content') or ''}" for message in messages)
+        completion = client.chat.completions.create(
+            model=model,
+            messages=[{
+                "role": "user",
+                "content": "Actualiza el resumen de una conversación de atención al cliente con los nuevos mensajes. "
+                           "Conserva datos del cliente, consultas y respuestas dadas. Responde solo con el resumen.\n\n"
+                           f"Resumen actual: {summary or '(vacío)'}\n\nNuevos mensajes:\n{transcript}",
+            }],
+        )
+        return completion.choices[0].message.content.strip()
+    return summarize
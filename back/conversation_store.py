@@ -0,0 +1,132 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import BulkWriteError
+
+DUPLICATE_KEY = 11000  # Código de error de MongoDB para claves únicas repetidas
+
+class ConversationStore:
+    """
+    Per-session chat history in MongoDB.
+
+    Each message is its own document keyed by (session_id, seq), with a unique
+    compound index on both fields, so reads and appends touch only the index range
+    of one session regardless of how many messages are stored in total. A TTL index
+    on 'createdAt' expires old history, and the per-session sequence counters expire
+    with it; the durable transcript of a ticket is kept in its ticket document.
+    """
+
+    def __init__(self, messages_collection: Any, counters_collection: Any, ttl_seconds: int = 7 * 24 * 3600, create_indexes: bool = True):
+        """
+        Initialize the ConversationStore.
+
+        Args:
+            messages_collection (Any): Collection holding one document per message.
+            counters_collection (Any): Collection holding one sequence counter per session.
+            ttl_seconds (int): Seconds a message is kept. Defaults to 7 days.
+            create_indexes (bool): Create the indexes now; pass False to defer the
+                database round-trips and call create_indexes() later. Defaults to True.
+        """
+        self.messages = messages_collection
+        self.counters = counters_collection
+        self.ttl_seconds = ttl_seconds
+        if create_indexes:
+            self.create_indexes()
+
+    def create_indexes(self):
+        """
+        Create the (session_id, seq) and TTL indexes (idempotent).
+        """
+        self.messages.create_index([("session_id", ASCENDING), ("seq", ASCENDING)], unique=True)
+        self.messages.create_index("createdAt", expireAfterSeconds=self.ttl_seconds)
+        self.counters.create_index("updatedAt", expireAfterSeconds=self.ttl_seconds)
+
+    def reserve(self, session_id: str, count: int = 1) -> int:
+        """
+        Atomically reserve a block of sequence numbers for a session.
+
+        Args:
+            session_id (str): Session (ticket) ID.
+            count (int): Number of sequence numbers. Defaults to 1.
+
+        Returns:
+            int: The first reserved sequence number.
+        """
+        counter = self.counters.find_one_and_update(
+            {"_id": session_id},
+            {"$inc": {"seq": count}, "$set": {"updatedAt": datetime.now(timezone.utc)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return counter["seq"] - count + 1
+
+    def insert(self, session_id: str, messages: List[Dict[str, Any]]):
+        """
+        Store messages that already carry a reserved 'seq', in one bulk insert.
+
+        Args:
+            session_id (str): Session (ticket) ID.
+            messages (List[Dict[str, Any]]): Messages with 'role', 'content' and 'seq'.
+        """
+        if not messages:
+            return
+        now = datetime.now(timezone.utc)
+        self.messages.insert_many(
+            [{**message, "session_id": session_id, "createdAt": now} for message in messages],
+            ordered=False,
+        )
+
+    def insert_batch(self, batch: List[Tuple[str, List[Dict[str, Any]]]]):
+        """
+        Store the messages of several sessions in one bulk insert. Messages that are
+        already stored (same session and 'seq') are skipped, so a batch can be retried.
+
+        Args:
+            batch (List[Tuple[str, List[Dict[str, Any]]]]): (session ID, messages with
+                'role', 'content' and 'seq') pairs.
+        """
+        now = datetime.now(timezone.utc)
+        documents = [{**message, "session_id": session_id, "createdAt": now} for session_id, messages in batch for message in messages]
+        if not documents:
+            return
+        try:
+            self.messages.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            # Solo se toleran duplicados de un reintento
+            if any(error.get("code") != DUPLICATE_KEY for error in e.details.get("writeErrors", [])) or e.details.get("writeConcernErrors"):
+                raise
+
+    def append(self, session_id: str, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Number and store messages at the end of a session's history.
+
+        Args:
+            session_id (str): Session (ticket) ID.
+            messages (List[Dict[str, Any]]): Messages with 'role' and 'content'.
+
+        Returns:
+            List[Dict[str, Any]]: The stored messages, including their 'seq'.
+        """
+        if not messages:
+            return []
+        first = self.reserve(session_id, len(messages))
+        stored = [{**message, "seq": first + offset} for offset, message in enumerate(messages)]
+        self.insert(session_id, stored)
+        return stored
+
+    def get_messages(self, session_id: str, since: int = 0) -> List[Dict[str, Any]]:
+        """
+        Get a session's messages after a sequence cursor, oldest first.
+
+        Args:
+            session_id (str): Session (ticket) ID.
+            since (int): Return only messages with a greater 'seq'. Defaults to 0 (all).
+
+        Returns:
+            List[Dict[str, Any]]: The messages with 'role', 'content' and 'seq'.
+        """
+        return list(self.messages.find(
+            {"session_id": session_id, "seq": {"$gt": since}},
+            {"_id": 0, "role": 1, "content": 1, "seq": 1},
+        ).sort("seq", ASCENDING))
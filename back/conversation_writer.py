@@ -0,0 +1,220 @@
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import Executor
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+# (sesión, mensajes con 'seq', campos del ticket, futuro de la escritura)
+PendingWrite = Tuple[str, List[Dict[str, Any]], Dict[str, Any], asyncio.Future]
+
+class ConversationWriter:
+    """
+    Write-behind persistence of chat turns.
+
+    Turns are queued in memory and a background task writes them in batches: the
+    messages of every queued turn go to the ConversationStore (the live view, which
+    expires) in one insert_many, and to the durable transcript in the ticket
+    document, together with the ticket fields they change (description, resolved),
+    in one bulk_write. A burst of turns costs two writes instead of several per
+    message. Each submission returns a future that resolves once its batch is stored;
+    failed batches are retried (the inserts are idempotent on (session_id, seq) and
+    the ticket updates skip the seqs already pushed), and stop() drains the queue
+    before shutdown. Until then, writes are only lost if the process crashes.
+    """
+
+    def __init__(
+        self,
+        conversation_store: Any,
+        tickets_collection: Any,
+        executor: Optional[Executor] = None,
+        max_batch: int = 256,
+        max_delay: float = 0.01,
+        max_pending: int = 10000,
+        retries: int = 3,
+    ):
+        """
+        Initialize the ConversationWriter.
+
+        Args:
+            conversation_store (Any): ConversationStore holding the messages.
+            tickets_collection (Any): Tickets collection, with one document per 'id'
+                and its transcript in 'conversation'.
+            executor (Optional[Executor]): Executor for the blocking writes. Defaults
+                to the event loop's default executor.
+            max_batch (int): Maximum turns per batch. Defaults to 256.
+            max_delay (float): Seconds a batch waits for more turns. Defaults to 0.01.
+            max_pending (int): Queued turns before submit() waits. Defaults to 10000.
+            retries (int): Attempts after a failed batch. Defaults to 3.
+        """
+        self.store = conversation_store
+        self.tickets = tickets_collection
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.retries = retries
+        self._pending: List[PendingWrite] = []
+        self._inflight: List[PendingWrite] = []
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(max_pending)
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self.submitted = 0
+        self.batches = 0
+        self.writes = 0
+        self.failures = 0
+        self._latencies: Deque[float] = deque(maxlen=1000)
+
+    async def start(self):
+        """
+        Start the background writer (idempotent).
+        """
+        if self._task is None:
+            self._closed = False
+            self._task = asyncio.create_task(self._run())
+
+    async def submit(self, session_id: str, messages: List[Dict[str, Any]], ticket_fields: Optional[Dict[str, Any]] = None) -> asyncio.Future:
+        """
+        Queue the messages of a turn and the ticket fields it changes.
+
+        Args:
+            session_id (str): Session (ticket) ID.
+            messages (List[Dict[str, Any]]): Messages with 'role', 'content' and a
+                reserved 'seq'.
+            ticket_fields (Optional[Dict[str, Any]]): Fields to $set on the ticket.
+
+        Returns:
+            asyncio.Future: Resolves to None once stored, or to the write error.
+
+        Raises:
+            RuntimeError: If the writer is not running.
+        """
+        if self._task is None or self._closed:
+            raise RuntimeError("ConversationWriter is not running")
+        await self._slots.acquire()
+        future = asyncio.get_running_loop().create_future()
+        # El error se entrega al que espere el futuro; si nadie lo espera, ya quedó registrado
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._pending.append((session_id, messages, ticket_fields or {}, future))
+        self.submitted += 1
+        self._wakeup.set()
+        return future
+
+    async def flush(self, session_id: Optional[str] = None):
+        """
+        Wait until every turn queued so far is stored (or failed).
+
+        Args:
+            session_id (Optional[str]): Only wait for this session's turns. Defaults to all.
+        """
+        futures = [item[3] for item in self._inflight + self._pending if session_id is None or item[0] == session_id]
+        if futures:
+            await asyncio.gather(*futures, return_exceptions=True)
+
+    async def stop(self):
+        """
+        Stop accepting turns, store the queued ones and stop the background writer.
+        """
+        self._closed = True
+        await self.flush()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _write(self, batch: List[PendingWrite]):
+        """
+        Store a batch: one insert for all the messages and one bulk update for the tickets.
+        """
+        self.store.insert_batch([(session_id, messages) for session_id, messages, _, _ in batch if messages])
+        writes = 1
+        transcripts: Dict[str, List[Dict[str, Any]]] = {}
+        updates: Dict[str, Dict[str, Any]] = {}
+        for session_id, messages, fields, _ in batch:
+            transcripts.setdefault(session_id, []).extend(messages)
+            updates.setdefault(session_id, {}).update(fields)
+        operations = []
+        for session_id, fields in updates.items():
+            messages = transcripts[session_id]
+            update: Dict[str, Any] = {}
+            if fields:
+                update["$set"] = fields
+            if messages:
+                update["$push"] = {"conversation": {"$each": messages}}
+            if not update:
+                continue
+            # Un reintento no vuelve a agregar los mensajes si la actualización ya se aplicó
+            query: Dict[str, Any] = {"id": session_id}
+            if messages:
+                query["conversation.seq"] = {"$nin": [message["seq"] for message in messages]}
+            operations.append(UpdateOne(query, update))
+        if operations:
+            self.tickets.bulk_write(operations, ordered=False)
+            writes += 1
+        self.writes += writes
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            if self.max_delay > 0 and len(self._pending) < self.max_batch:
+                # Esperar un poco para juntar los turnos que lleguen entre tanto
+                await asyncio.sleep(self.max_delay)
+            self._wakeup.clear()
+            batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            if self._pending:
+                self._wakeup.set()
+            if not batch:
+                continue
+            self._inflight = batch
+            started = time.perf_counter()
+            error = None
+            for attempt in range(self.retries + 1):
+                try:
+                    await loop.run_in_executor(self.executor, self._write, batch)
+                    error = None
+                    break
+                except Exception as e:
+                    error = e
+                    print(f"Error al guardar {len(batch)} turnos (intento {attempt + 1}): {e}")
+                    if attempt < self.retries:
+                        await asyncio.sleep(0.1 * 2 ** attempt)
+            self._inflight = []
+            self.batches += 1
+            self._latencies.append(time.perf_counter() - started)
+            if error is not None:
+                self.failures += len(batch)
+            for _, _, _, future in batch:
+                if not future.done():
+                    if error is None:
+                        future.set_result(None)
+                    else:
+                        future.set_exception(error)
+                self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get queue, batching and write latency metrics.
+
+        Returns:
+            Dict[str, Any]: Writer metrics.
+        """
+        latencies = sorted(self._latencies)
+
+        def batch_ms(q: float) -> float:
+            return latencies[min(len(latencies) - 1, round(q * (len(latencies) - 1)))] * 1000 if latencies else 0.0
+
+        return {
+            "pending": len(self._pending) + len(self._inflight),
+            "submitted": self.submitted,
+            "batches": self.batches,
+            "writes": self.writes,
+            "failures": self.failures,
+            "turns_per_batch": (self.submitted - len(self._pending) - len(self._inflight)) / self.batches if self.batches else 0.0,
+            "batch_p50_ms": batch_ms(0.5),
+            "batch_p99_ms": batch_ms(0.99),
+        }
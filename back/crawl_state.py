@@ -0,0 +1,78 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+class CrawlState:
+    """
+    Per-URL record of the last crawl, stored in SQLite.
+
+    For each page it keeps the validators sent back in conditional requests (ETag and
+    Last-Modified), a hash of the normalized page text, the links found on it (so an
+    unchanged page can still be expanded without downloading it) and the IDs of the
+    FAQs extracted from it (so a changed page replaces exactly those FAQs).
+    """
+
+    def __init__(self, database_file: str):
+        """
+        Initialize the CrawlState.
+
+        Args:
+            database_file (str): Path to the SQLite file.
+        """
+        self.database_file = database_file
+        self._local = threading.local()
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, content_hash TEXT NOT NULL, "
+            "links TEXT NOT NULL, faq_ids TEXT NOT NULL, crawled_at TEXT NOT NULL)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.database_file, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the last crawl record of a page.
+
+        Args:
+            url (str): Page URL.
+
+        Returns:
+            Optional[Dict[str, Any]]: The record, or None if the page was never crawled.
+        """
+        row = self._connection().execute("SELECT * FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        record = dict(row)
+        record["links"] = json.loads(record["links"])
+        record["faq_ids"] = json.loads(record["faq_ids"])
+        return record
+
+    def put(self, url: str, content_hash: str, links: List[str], faq_ids: List[str], etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """
+        Store the crawl record of a page, replacing the previous one.
+
+        Args:
+            url (str): Page URL.
+            content_hash (str): Hash of the normalized page text.
+            links (List[str]): Links to follow from the page.
+            faq_ids (List[str]): IDs of the FAQs extracted from the page.
+            etag (Optional[str]): ETag response header.
+            last_modified (Optional[str]): Last-Modified response header.
+        """
+        self._connection().execute(
+            "INSERT OR REPLACE INTO pages (url, etag, last_modified, content_hash, links, faq_ids, crawled_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (url, etag, last_modified, content_hash, json.dumps(links), json.dumps(faq_ids), datetime.now().isoformat()),
+        )
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM pages").fetchone()[0]
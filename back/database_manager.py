@@ -1,221 +1,883 @@
 import json
 import os
-import tempfile
-import shutil
-from typing import Dict, List, Any
+import hashlib
+import sqlite3
+import threading
+from typing import TYPE_CHECKING, Dict, List, Any, Callable, Optional, Tuple
 from uuid import uuid4
-from langchain.schema import Document
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma
-from openai import OpenAI
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from datetime import datetime
+from contextlib import contextmanager
+import numpy as np
+from back.embedding_cache import EmbeddingCache
+from back.knowledge_artifact import KnowledgeArtifact, embedding_model_name
+from back.lexical_index import BM25Index, fold_text, reciprocal_rank_fusion
+from back.metrics import metrics, span
+from back.query_cache import QueryCache
+from back.response_cache import SemanticResponseCache
+from back.vector_store import create_vector_store
+from back.id_allocator import TICKET_SEQUENCE, create_sqlite_sequences, format_ticket_id, next_sqlite_value
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
 
 class FAQManager:
     """
     Manages FAQ data using vector embeddings for efficient searching.
+
+    Each FAQ is split into documents with IDs "<faq_id>:<n>", so additions, edits
+    and deletions only touch the rows of the FAQs that changed. Questions and answers
+    are also kept in a BM25 index; searches fuse the lexical and vector rankings, and
+    skip the embedding call when the lexical match alone is clear.
+
+    With a knowledge artifact built by back.make_db, the index is loaded from it
+    instead: its embedding matrix is memory-mapped and only the FAQs edited after
+    the build are embedded. Unless a backend is chosen explicitly, the numpy store
+    is used then, so every worker searches the same mapped pages instead of copying
+    the vectors into its own Chroma collection.
     """
 
-    def __init__(self, json_file: str):
+    def __init__(self, json_file: str, embeddings: Optional[Any] = None, query_cache: Optional[QueryCache] = None, backend: Optional[str] = None, response_cache: Optional[SemanticResponseCache] = None, artifact_dir: Optional[str] = None):
         """
         Initialize the FAQManager.
 
         Args:
             json_file (str): Path to the JSON file containing FAQ data.
+            embeddings (Optional[Any]): Embedding model to use. Defaults to OpenAI's
+                text-embedding-3-small (through the process-wide provider client)
+                behind a persistent EmbeddingCache stored in EMBEDDING_CACHE_DIR
+                (default: .embedding_cache).
+            query_cache (Optional[QueryCache]): Cache of repeated queries in front of
+                search_faq. Defaults to a new QueryCache.
+            backend (Optional[str]): Vector store backend, "chroma" or "numpy".
+                Defaults to FAQ_VECTOR_BACKEND (default: numpy when a usable
+                knowledge artifact is loaded, chroma otherwise).
+            response_cache (Optional[SemanticResponseCache]): Cache of agent answers
+                grounded on these FAQs, dropped whenever they change. Defaults to one
+                configured by RESPONSE_CACHE_MAX_ENTRIES (default: 2048, 0 disables it),
+                RESPONSE_CACHE_TTL_SECONDS (default: 86400) and
+                RESPONSE_CACHE_MIN_SIMILARITY (default: 0.95).
+            artifact_dir (Optional[str]): Knowledge artifact to load the index from.
+                Defaults to FAQ_ARTIFACT_DIR; if unset or unusable, every FAQ is embedded.
+
+        The lexical ranking answers a search alone when its confidence reaches
+        LEXICAL_MIN_CONFIDENCE (default: 0.3; above 1 every search uses embeddings).
         """
-        self.client = OpenAI(
-            api_key=os.getenv("OPENAI_API_KEY"), # TODO: Cambiar por GROQ_API_KEY
-            # base_url="https://api.groq.com/openai/v1",
-        )
-        self.embeddings = OpenAIEmbeddings(
-            # client=self.client,
-            model="text-embedding-3-small",
-            embedding_ctx_length=8191,  # Longitud máxima del contexto
-            chunk_size=1000,  # Tamaño del chunk para procesamiento por lotes
+        if embeddings is None:
+            from langchain_openai import OpenAIEmbeddings
+            embeddings = EmbeddingCache(
+                OpenAIEmbeddings(
+                    client=self.client.embeddings,  # Mismo pool de conexiones que el chat
+                    model="text-embedding-3-small",
+                    embedding_ctx_length=8191,  # Longitud máxima del contexto
+                    chunk_size=1000,  # Tamaño del chunk para procesamiento por lotes
+                ),
+                cache_dir=os.getenv("EMBEDDING_CACHE_DIR", ".embedding_cache"),
+                max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "100000")),
+            )
+        self.embeddings = embeddings
+        self.query_cache = query_cache or QueryCache()
+        self.response_cache = response_cache or SemanticResponseCache(
+            max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2048")),
+            ttl=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", str(24 * 3600))),
+            min_similarity=float(os.getenv("RESPONSE_CACHE_MIN_SIMILARITY", "0.95")),
         )
+        self.backend = backend or os.getenv("FAQ_VECTOR_BACKEND")
         self.json_adapter = JSONAdapter(json_file)
         self.knowledge_db = None
-        self.persist_directory = tempfile.mkdtemp()  # Crear un directorio temporal
+        self.faqs: Dict[str, Dict[str, str]] = {}
+        self.lexical_index = BM25Index()
+        self.lexical_min_confidence = float(os.getenv("LEXICAL_MIN_CONFIDENCE", "0.3"))
+        self.lexical_searches = 0
+        self.hybrid_searches = 0
+        self._split_ids: Dict[str, List[str]] = {}
+        self.version = 0  # Aumenta con cada cambio del índice
+        self.artifact_dir = os.getenv("FAQ_ARTIFACT_DIR") if artifact_dir is None else artifact_dir
+        self.artifact: Optional[KnowledgeArtifact] = None
+        self._artifact_rows: Dict[str, int] = {}  # FAQs sin cambios desde el artefacto -> fila de su pregunta
+        self._text_splitter = None
+        self._lock = threading.RLock()
         self._initialize_knowledge_db()
 
+    @property
+    def client(self):
+        # Importación diferida: el SDK de OpenAI tarda más en cargarse que el artefacto en abrirse
+        from back.provider_client import get_provider_client
+
+        return get_provider_client().openai
+
+    @property
+    def text_splitter(self):
+        # Importación diferida: LangChain solo se carga si hay que dividir FAQs
+        if self._text_splitter is None:
+            from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+            # Configurar el text splitter con parámetros más apropiados para FAQ
+            self._text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=1000,  # Reducido para mejor manejo de FAQs
+                chunk_overlap=200,  # Aumentado para mejor contexto
+                length_function=len,
+                separators=["\n\n", "\n", " ", ""]
+            )
+        return self._text_splitter
+
     def _initialize_knowledge_db(self):
         """
         Initialize the vector database with FAQ data from the JSON file.
         """
         faqs = self.json_adapter.load_faqs()
-        
+        artifact = self._open_artifact() if self.artifact_dir else None
+        if not self.backend:
+            # Con artefacto, numpy busca sobre la matriz mapeada que comparten los workers; chroma la copiaría en cada uno
+            self.backend = "numpy" if artifact is not None else "chroma"
+        self.knowledge_db = create_vector_store(self.backend, self.embeddings)
+
+        if artifact is not None:
+            self._load_artifact(artifact)
+            # El artefacto puede ser anterior a las últimas ediciones: solo se embeben las FAQs que cambiaron
+            self._apply_changes(faqs)
+            return
+
         if not faqs:
             print("No hay FAQs disponibles para inicializar la base de datos vectorial.")
-            self.knowledge_db = Chroma(
-                embedding_function=self.embeddings,
-                collection_name="faq-collection",
-                persist_directory=self.persist_directory
-            )
             return
 
-        # Crear documentos manteniendo tanto la pregunta como la respuesta en los metadatos
-        documents = []
-        for faq in faqs:
-            # Usamos la respuesta como contenido principal y guardamos ambos en metadata
-            doc = Document(
-                page_content=faq["answer"],
-                metadata={
-                    "question": faq["question"],
-                    "answer": faq["answer"]  # Guardamos la respuesta completa en metadata
-                },
-                id=str(uuid4())  # Agregar un ID único
-            )
-            documents.append(doc)
-
-        # Configurar el text splitter con parámetros más apropiados para FAQ
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,  # Reducido para mejor manejo de FAQs
-            chunk_overlap=200,  # Aumentado para mejor contexto
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""]
-        )
-        
+        self._index_faqs(faqs)
+
+    def _open_artifact(self) -> Optional[KnowledgeArtifact]:
+        """
+        Open the knowledge artifact in artifact_dir.
+
+        Returns:
+            Optional[KnowledgeArtifact]: The artifact, or None if it is missing, corrupt
+                or built with another embedding model.
+        """
+        try:
+            with span("faq.load_artifact"):
+                artifact = KnowledgeArtifact(self.artifact_dir)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"No se pudo abrir el artefacto de conocimiento {self.artifact_dir}: {e}")
+            return None
+        model = embedding_model_name(self.embeddings)
+        if artifact.manifest["model"] != model:
+            print(f"El artefacto {artifact.path} usa el modelo {artifact.manifest['model']}, no {model}: se ignora")
+            return None
+        return artifact
+
+    def _load_artifact(self, artifact: KnowledgeArtifact):
+        """
+        Load the index from an opened knowledge artifact without embedding anything.
+
+        Args:
+            artifact (KnowledgeArtifact): Artifact returned by _open_artifact.
+        """
+        from langchain_core.documents import Document
+
+        faqs = {faq["id"]: faq for faq in artifact.faqs}
+        splits = [
+            Document(id=chunk["id"], page_content=chunk["text"], metadata=self._split_metadata(faqs[chunk["faq_id"]]))
+            for chunk in artifact.chunks
+        ]
+        self.knowledge_db.add_embedded(splits, [doc.id for doc in splits], artifact.embeddings)
+        self.lexical_index.load_state(artifact.lexical_state)
+        self._register(artifact.faqs, splits)
+        self.artifact = artifact
+        self._artifact_rows = {faq["id"]: row for row, faq in enumerate(artifact.faqs)}
+        print(f"Índice cargado del artefacto {artifact.path} ({len(artifact.faqs)} FAQs)")
+
+    @staticmethod
+    def _split_metadata(faq: Dict[str, str]) -> Dict[str, str]:
+        # Guardamos la pregunta y la respuesta completa en metadata; la categoría, normalizada como en el índice BM25
+        return {
+            "faq_id": faq["id"],
+            "question": faq["question"],
+            "answer": faq["answer"],
+            "category": fold_text(faq.get("category", "")),
+        }
+
+    def _split_faqs(self, faqs: List[Dict[str, str]]) -> List["Document"]:
+        """
+        Split FAQs into documents for the vector store.
+
+        Args:
+            faqs (List[Dict[str, str]]): FAQs with their IDs.
+
+        Returns:
+            List[Document]: Splits with IDs "<faq_id>:<n>".
+        """
+        from langchain_core.documents import Document
+
+        # Usamos la respuesta como contenido principal y guardamos ambos en metadata
+        documents = [Document(page_content=faq["answer"], metadata=self._split_metadata(faq)) for faq in faqs]
+
         # Dividir los documentos manteniendo los metadatos
-        all_splits = text_splitter.split_documents(documents)
-        
-        # Asegurarse de que cada split mantenga los metadatos originales
-        for split in all_splits:
-            # Asegurarse de que los metadatos contengan tanto la pregunta como la respuesta
-            if 'question' not in split.metadata or 'answer' not in split.metadata:
-                original_doc = next(d for d in documents if d.metadata['question'] == split.metadata['question'])
-                split.metadata = original_doc.metadata
-            split.id = str(uuid4())  # Asignar un nuevo ID único a cada split
-
-        vector_store = Chroma(
-            collection_name="faq-collection",
-            embedding_function=self.embeddings,
-            persist_directory=self.persist_directory,  # Where to save data locally, remove if not necessary
-        )
+        splits = self.text_splitter.split_documents(documents)
+        counters: Dict[str, int] = {}
+        for split in splits:
+            faq_id = split.metadata["faq_id"]
+            split.id = f"{faq_id}:{counters.get(faq_id, 0)}"
+            counters[faq_id] = counters.get(faq_id, 0) + 1
+        return splits
 
-        # Crear y persistir la base de datos vectorial
-        self.knowledge_db = vector_store.from_documents(
-            documents=all_splits,
-            embedding=self.embeddings,
-            collection_name="faq-collection",
-            persist_directory=self.persist_directory,
-            ids=[doc.id for doc in all_splits]  # Pasar los IDs explícitamente
-        )
+    def _index_faqs(self, faqs: List[Dict[str, str]]):
+        """
+        Embed and insert FAQs into the vector store in one batch.
+
+        Args:
+            faqs (List[Dict[str, str]]): FAQs with their IDs.
+        """
+        with span("faq.index", faqs=len(faqs)):
+            splits = self._split_faqs(faqs)
+            if splits:
+                self.knowledge_db.add_documents(splits, ids=[doc.id for doc in splits])
+        for faq in faqs:
+            self.lexical_index.add(faq["id"], f"{faq['question']} {faq['answer']}", faq.get("category", ""))
+        self._register(faqs, splits)
+
+    def _register(self, faqs: List[Dict[str, str]], splits: List["Document"]):
+        """
+        Record indexed FAQs and the IDs of their splits.
+
+        Args:
+            faqs (List[Dict[str, str]]): FAQs with their IDs.
+            splits (List[Document]): Their splits.
+        """
+        for faq in faqs:
+            self.faqs[faq["id"]] = faq
+            self._split_ids[faq["id"]] = []
+        for split in splits:
+            self._split_ids[split.metadata["faq_id"]].append(split.id)
+        self.version += 1
+
+    def _unindex_faqs(self, faq_ids: List[str]):
+        """
+        Remove the rows of the given FAQs from the vector store.
+
+        Args:
+            faq_ids (List[str]): IDs of the FAQs to remove.
+        """
+        split_ids = [split_id for faq_id in faq_ids for split_id in self._split_ids.pop(faq_id, [])]
+        for faq_id in faq_ids:
+            self.faqs.pop(faq_id, None)
+            self._artifact_rows.pop(faq_id, None)
+            self.lexical_index.remove(faq_id)
+        if split_ids:
+            self.knowledge_db.delete(split_ids)
+        self.version += 1
+
+    def question_vectors(self, faqs: List[Dict[str, str]]) -> np.ndarray:
+        """
+        Get the L2-normalized embeddings of the questions of some FAQs.
+
+        Questions unchanged since the knowledge artifact was built are read from it
+        (without copying when the FAQs are exactly the artifact's, in order); the
+        rest go through the embedding model.
+
+        Args:
+            faqs (List[Dict[str, str]]): FAQs with their IDs.
+
+        Returns:
+            np.ndarray: One row per FAQ.
+        """
+        rows = [self._artifact_rows.get(faq["id"]) for faq in faqs]
+        if self.artifact is not None and rows == list(range(len(self.artifact.faqs))):
+            return self.artifact.questions
+        missing = [i for i, row in enumerate(rows) if row is None]
+        embedded = np.asarray(self.embeddings.embed_documents([faqs[i]["question"] for i in missing]), dtype=np.float32) if missing else None
+        dim = self.artifact.questions.shape[1] if embedded is None else embedded.shape[1]
+        vectors = np.empty((len(faqs), dim), dtype=np.float32)
+        if embedded is not None:
+            vectors[missing] = embedded / np.maximum(np.linalg.norm(embedded, axis=1, keepdims=True), 1e-12)
+        known = [i for i, row in enumerate(rows) if row is not None]
+        if known:
+            vectors[known] = self.artifact.questions[[rows[i] for i in known]]
+        return vectors
+
+    def question_snapshot(self) -> Tuple[int, List[Dict[str, str]], Optional[np.ndarray]]:
+        """
+        Get a consistent view of the FAQ questions and their embeddings.
+
+        The FAQs are read under the index lock; the questions are embedded after
+        releasing it, so callers must compare the version before using the result.
+
+        Returns:
+            Tuple[int, List[Dict[str, str]], Optional[np.ndarray]]: The index version,
+                the FAQs, and the L2-normalized question embeddings (None without FAQs).
+        """
+        with self._lock:
+            version = self.version
+            faqs = list(self.faqs.values())
+        return version, faqs, self.question_vectors(faqs) if faqs else None
+
+    def embed_query(self, query: str) -> List[float]:
+        """
+        Embed a query, reusing the query cache's embedding tier.
+
+        Args:
+            query (str): The query.
+
+        Returns:
+            List[float]: The query embedding.
+        """
+        embedding = self.query_cache.get_embedding(query)
+        metrics.inc("cache_requests_total", cache="query_embedding", result="miss" if embedding is None else "hit")
+        if embedding is None:
+            with span("faq.embed"):
+                embedding = self.embeddings.embed_query(query)
+            self.query_cache.put_embedding(query, embedding)
+        return embedding
+
+    def _lexical_search(self, query: str, candidates: int, category: Optional[str]) -> Tuple[List[Tuple[str, float]], bool]:
+        """
+        Rank FAQs with BM25 and tell whether that ranking is confident on its own.
+        """
+        lexical = self.lexical_index.search(query, k=candidates, category=category)
+        confident = bool(lexical) and self.lexical_index.confidence(query, lexical) >= self.lexical_min_confidence
+        return lexical, confident
 
-    def search_faq(self, query: str, k: int = 3) -> List[Dict[str, Any]]:
+    def _format_results(self, lexical: List[Tuple[str, float]], hits: Optional[List[Tuple["Document", float]]], k: int) -> List[Dict[str, Any]]:
+        """
+        Fuse the BM25 ranking with the vector hits (if the vector search ran) and
+        format the top k FAQs.
+        """
+        rankings = [[faq_id for faq_id, _ in lexical]]
+        distances: Dict[str, float] = {}
+        if hits is not None:
+            # Un FAQ puede tener varias divisiones: se conserva la más cercana
+            for doc, distance in hits:
+                faq_id = doc.metadata['faq_id']
+                distances[faq_id] = min(distance, distances.get(faq_id, distance))
+            rankings.append(sorted(distances, key=distances.get))
+
+        # Formatear los resultados manteniendo la información completa
+        formatted_results = []
+        for faq_id, score in reciprocal_rank_fusion(rankings):
+            faq = self.faqs.get(faq_id)
+            if faq is None:
+                continue
+            result = {"id": faq_id, "question": faq["question"], "answer": faq["answer"], "rrf_score": score}
+            if faq_id in distances:
+                result["distance"] = distances[faq_id]
+            formatted_results.append(result)
+            if len(formatted_results) == k:
+                break
+        return formatted_results
+
+    def search_faq(self, query: str, k: int = 3, category: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Search for FAQs similar to the given query.
 
+        The BM25 and vector rankings are merged with reciprocal rank fusion. If the
+        BM25 ranking is confident on its own it is used without an embedding call,
+        and repeated queries are answered from the query cache.
+
         Args:
             query (str): The search query.
             k (int): Number of results to return. Defaults to 3.
+            category (Optional[str]): Only return FAQs of this category.
 
         Returns:
-            List[Dict[str, Any]]: List of similar FAQs with their scores.
+            List[Dict[str, Any]]: List of similar FAQs with their 'id', 'question',
+                'answer' and fused 'rrf_score' (reciprocal rank fusion; higher is better),
+                plus the vector 'distance' (lower is better) when the vector search ran.
 
         Raises:
             ValueError: If the vector store is not initialized.
         """
-        if not self.knowledge_db:
+        if self.knowledge_db is None:
             raise ValueError("Vector store no inicializado.")
-        
-        results = self.knowledge_db.similarity_search_with_score(query, k=k)
-        
-        # Formatear los resultados manteniendo la información completa
-        formatted_results = []
-        for doc, score in results:
-            formatted_results.append({
-                "question": doc.metadata['question'],
-                "answer": doc.metadata['answer'],  # Usar la respuesta completa de metadata
-                "score": score
-            })
-            
-        return formatted_results
 
-    def add_faq(self, question: str, answer: str):
+        with span("faq.search", k=k) as record:
+            cached = self.query_cache.get_results(query, k, category)
+            metrics.inc("cache_requests_total", cache="query_results", result="miss" if cached is None else "hit")
+            if cached is not None:
+                record["path"] = "cache"
+                return cached
+
+            candidates = max(4 * k, 20)
+            lexical, confident = self._lexical_search(query, candidates, category)
+            if confident:
+                self.lexical_searches += 1
+                hits = None
+            else:
+                self.hybrid_searches += 1
+                hits = self.knowledge_db.search_by_vector(self.embed_query(query), k=candidates, category=category)
+            record["path"] = "lexical" if confident else "hybrid"
+
+            formatted_results = self._format_results(lexical, hits, k)
+            self.query_cache.put_results(query, k, formatted_results, category)
+            return formatted_results
+
+    def search_faq_batch(self, queries: List[str], k: int = 3, category: Optional[str] = None, batch_size: int = 1000) -> List[List[Dict[str, Any]]]:
+        """
+        Search for the FAQs similar to each of several queries.
+
+        Gives the same results as calling search_faq on each query (up to exact
+        distance ties), but the queries that need a vector search are embedded together (one provider call per
+        `batch_size` distinct queries) and scored against the index in one query.
+
+        Args:
+            queries (List[str]): The search queries.
+            k (int): Number of results per query. Defaults to 3.
+            category (Optional[str]): Only return FAQs of this category.
+            batch_size (int): Maximum number of texts per embedding call. Defaults to 1000.
+
+        Returns:
+            List[List[Dict[str, Any]]]: The results of each query, in the format of search_faq.
+
+        Raises:
+            ValueError: If the vector store is not initialized.
+        """
+        if self.knowledge_db is None:
+            raise ValueError("Vector store no inicializado.")
+
+        with span("faq.search_batch", queries=len(queries)):
+            results: List[Optional[List[Dict[str, Any]]]] = [self.query_cache.get_results(query, k, category) for query in queries]
+            candidates = max(4 * k, 20)
+            lexical: Dict[int, List[Tuple[str, float]]] = {}
+            pending: List[int] = []
+            for i, query in enumerate(queries):
+                if results[i] is not None:
+                    continue
+                lexical[i], confident = self._lexical_search(query, candidates, category)
+                if confident:
+                    self.lexical_searches += 1
+                    results[i] = self._format_results(lexical[i], None, k)
+                    self.query_cache.put_results(query, k, results[i], category)
+                else:
+                    pending.append(i)
+
+            if pending:
+                self.hybrid_searches += len(pending)
+                embeddings = {queries[i]: self.query_cache.get_embedding(queries[i]) for i in pending}
+                missing = [query for query, embedding in embeddings.items() if embedding is None]
+                for start in range(0, len(missing), batch_size):
+                    chunk = missing[start:start + batch_size]
+                    for query, embedding in zip(chunk, self.embeddings.embed_documents(chunk)):
+                        embeddings[query] = embedding
+                        self.query_cache.put_embedding(query, embedding)
+
+                all_hits = self.knowledge_db.search_by_vectors([embeddings[queries[i]] for i in pending], k=candidates, category=category)
+                for i, hits in zip(pending, all_hits):
+                    results[i] = self._format_results(lexical[i], hits, k)
+                    self.query_cache.put_results(queries[i], k, results[i], category)
+            return results
+
+    def add_faq(self, question: str, answer: str, category: Optional[str] = None) -> str:
         """
         Add a new FAQ to both the JSON file and the vector database.
 
         Args:
             question (str): The FAQ question.
             answer (str): The FAQ answer.
+            category (Optional[str]): The FAQ category.
+
+        Returns:
+            str: The ID of the new FAQ.
         """
-        # Guardar en JSON
-        self.json_adapter.save_faq(question, answer)
-        
-        # Crear nuevo documento con metadata completa
-        new_doc = Document(
-            page_content=answer,
-            metadata={
-                "question": question,
-                "answer": answer
-            },
-            id=str(uuid4())  # Agregar un ID único
-        )
-        
-        # Dividir el documento
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""]
-        )
-        splits = text_splitter.split_documents([new_doc])
-        
-        # Asegurar que cada split mantenga los metadatos completos
-        for split in splits:
-            split.metadata = new_doc.metadata
-            split.id = str(uuid4())  # Asignar un nuevo ID único a cada split
-            
-        # Añadir a la base de datos vectorial
-        self.knowledge_db.add_documents(documents=splits, ids=[doc.id for doc in splits])
+        faq = {"question": question, "answer": answer}
+        if category:
+            faq["category"] = category
+        return self.add_faqs([faq])[0]
+
+    def add_faqs(self, faqs: List[Dict[str, str]]) -> List[str]:
+        """
+        Add many FAQs with one journal append and one batched embed-and-insert pass.
+
+        Args:
+            faqs (List[Dict[str, str]]): FAQs with 'question', 'answer' and optionally 'category'.
+
+        Returns:
+            List[str]: The IDs of the new FAQs.
+        """
+        with self._lock:
+            records = self.json_adapter.save_faqs(faqs)
+            self._index_faqs(records)
+        self.query_cache.invalidate()
+        self.response_cache.invalidate()
+        return [record["id"] for record in records]
+
+    def update_faq(self, faq_id: str, question: Optional[str] = None, answer: Optional[str] = None, category: Optional[str] = None):
+        """
+        Edit an existing FAQ, re-embedding only its rows.
+
+        Args:
+            faq_id (str): The ID of the FAQ to edit.
+            question (Optional[str]): New question, if it changes.
+            answer (Optional[str]): New answer, if it changes.
+            category (Optional[str]): New category, if it changes.
+
+        Raises:
+            KeyError: If the FAQ does not exist.
+        """
+        with self._lock:
+            if faq_id not in self.faqs:
+                raise KeyError(f"FAQ no encontrada: {faq_id}")
+            faq = dict(self.faqs[faq_id])
+            changes = {"question": question, "answer": answer, "category": category}
+            faq.update({key: value for key, value in changes.items() if value is not None})
+            self.json_adapter.update_faq(faq)
+            self._unindex_faqs([faq_id])
+            self._index_faqs([faq])
+        self.query_cache.invalidate()
+        self.response_cache.invalidate()
+
+    def delete_faq(self, faq_id: str):
+        """
+        Delete an FAQ from both the JSON file and the vector database.
 
-    def __del__(self):
+        Args:
+            faq_id (str): The ID of the FAQ to delete.
+        """
+        with self._lock:
+            self.json_adapter.delete_faqs([faq_id])
+            self._unindex_faqs([faq_id])
+        self.query_cache.invalidate()
+        self.response_cache.invalidate()
+
+    def sync(self) -> Dict[str, int]:
+        """
+        Apply changes written to the knowledge file by other writers, re-embedding
+        only the FAQs that were added or edited.
+
+        Returns:
+            Dict[str, int]: Number of added, updated and deleted FAQs.
+        """
+        faqs = self.json_adapter.load_faqs()
+        with span("faq.sync"), self._lock:
+            counts = self._apply_changes(faqs)
+        if any(counts.values()):
+            self.query_cache.invalidate()
+            self.response_cache.invalidate()
+        return counts
+
+    def _apply_changes(self, faqs: List[Dict[str, str]]) -> Dict[str, int]:
+        """
+        Bring the index to the given FAQs, re-embedding only the added or edited ones.
+
+        Args:
+            faqs (List[Dict[str, str]]): The current FAQs with their IDs.
+
+        Returns:
+            Dict[str, int]: Number of added, updated and deleted FAQs.
+        """
+        current = {faq["id"]: faq for faq in faqs}
+        deleted = [faq_id for faq_id in self.faqs if faq_id not in current]
+        changed = [faq for faq_id, faq in current.items() if self.faqs.get(faq_id) != faq]
+        updated = [faq["id"] for faq in changed if faq["id"] in self.faqs]
+        if deleted or updated:
+            self._unindex_faqs(deleted + updated)
+        if changed:
+            self._index_faqs(changed)
+        return {"added": len(changed) - len(updated), "updated": len(updated), "deleted": len(deleted)}
+
+class FAQIndexRegistry:
+    """
+    Process-wide registry of long-lived FAQManager instances.
+
+    Indexes are keyed by the absolute path of the knowledge file and shared by every
+    caller. When the file changes, the existing index is synced in place instead of
+    being rebuilt.
+    """
+
+    def __init__(self, factory: Optional[Callable[[str], "FAQManager"]] = None):
         """
-        Clean up temporary directory on object deletion.
+        Initialize the FAQIndexRegistry.
+
+        Args:
+            factory (Optional[Callable[[str], FAQManager]]): Builds a manager for a
+                knowledge file path. Defaults to FAQManager.
         """
-        # Check if persist_directory exists before trying to delete it
-        if hasattr(self, 'persist_directory'):
-            shutil.rmtree(self.persist_directory, ignore_errors=True)
+        self.factory = factory or FAQManager
+        self._entries: Dict[str, Tuple[Tuple, FAQManager]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, json_file: str) -> "FAQManager":
+        """
+        Return the shared FAQManager for a knowledge file, building it if needed.
+
+        A cheap stat fingerprint of the snapshot and its journal is checked first;
+        the file is only re-read when the fingerprint changed.
+
+        Args:
+            json_file (str): Path to the JSON file containing FAQ data.
+
+        Returns:
+            FAQManager: The shared manager for the file.
+        """
+        path = os.path.abspath(json_file)
+        fingerprint = JSONAdapter(path).fingerprint()
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry[0] == fingerprint:
+                return entry[1]
+
+            if entry:
+                # El archivo cambió: aplicar solo las FAQs modificadas
+                manager = entry[1]
+                manager.sync()
+            else:
+                manager = self.factory(path)
+            self._entries[path] = (fingerprint, manager)
+            return manager
+
+    def clear(self):
+        """
+        Drop every registered index.
+        """
+        with self._lock:
+            self._entries.clear()
+
+faq_registry = FAQIndexRegistry()
+
+def get_faq_manager(json_file: str) -> FAQManager:
+    """
+    Get the process-wide FAQManager for a knowledge file.
+
+    Args:
+        json_file (str): Path to the JSON file containing FAQ data.
+
+    Returns:
+        FAQManager: The shared manager for the file.
+    """
+    return faq_registry.get(json_file)
 
 class JSONAdapter:
     """
     Adapter for reading and writing FAQ data to a JSON file.
+
+    The JSON file is a snapshot. Additions, edits and deletions are appended to a
+    journal next to it (`<file>.journal`, one JSON entry per line) and folded into
+    the snapshot by compact() once the journal grows past `max_journal_bytes`.
+    Readers hold a shared lock and writers an exclusive one, so readers always see
+    a consistent state.
     """
 
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, max_journal_bytes: int = 1 << 20):
         """
         Initialize the JSONAdapter.
 
         Args:
             file_path (str): Path to the JSON file.
+            max_journal_bytes (int): Journal size that triggers a compaction. Defaults to 1 MiB.
         """
         self.file_path = file_path
+        self.journal_path = f"{file_path}.journal"
+        self.lock_path = f"{file_path}.lock"
+        self.max_journal_bytes = max_journal_bytes
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        """
+        Hold the advisory lock of the knowledge file.
+
+        Args:
+            exclusive (bool): Whether to take the lock for writing.
+        """
+        with open(self.lock_path, "a") as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _assign_ids(faqs: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """
+        Give a stable ID to snapshot FAQs that do not have one yet.
+
+        The ID is derived from the question and answer, with a suffix for duplicates,
+        so every process assigns the same IDs to the same snapshot.
+        """
+        seen = set()
+        for faq in faqs:
+            if not faq.get("id"):
+                base = hashlib.sha1(f"{faq['question']}\0{faq['answer']}".encode("utf-8")).hexdigest()[:12]
+                faq_id, n = base, 1
+                while faq_id in seen:
+                    faq_id, n = f"{base}-{n}", n + 1
+                faq["id"] = faq_id
+            seen.add(faq["id"])
+        return faqs
+
+    def _read_snapshot(self) -> Dict[str, Any]:
+        if not os.path.exists(self.file_path):
+            return {"faq": []}
+        with open(self.file_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _read_journal(self) -> List[Dict[str, Any]]:
+        entries = []
+        if not os.path.exists(self.journal_path):
+            return entries
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue  # Línea incompleta tras una caída durante la escritura
+        return entries
+
+    def _replay(self, faqs: List[Dict[str, str]], entries: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """
+        Apply journal entries on top of the snapshot FAQs.
+
+        Entries are idempotent, so replaying a journal that was already folded into
+        the snapshot gives the same result.
+        """
+        by_id = {faq["id"]: faq for faq in self._assign_ids(faqs)}
+        for entry in entries:
+            if entry["op"] in ("add", "update"):
+                by_id[entry["id"]] = entry["faq"]
+            elif entry["op"] == "delete":
+                by_id.pop(entry["id"], None)
+        return list(by_id.values())
+
+    def _append(self, entries: List[Dict[str, Any]]):
+        """
+        Append entries to the journal with a single write and compact it if it grew too large.
+
+        Args:
+            entries (List[Dict[str, Any]]): Journal entries.
+        """
+        data = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries).encode("utf-8")
+        with self._locked(exclusive=True):
+            fd = os.open(self.journal_path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                size = os.fstat(fd).st_size
+                if size and os.pread(fd, 1, size - 1) != b"\n":
+                    data = b"\n" + data  # No pegar la entrada a una línea incompleta
+                while data:
+                    data = data[os.write(fd, data):]
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            if os.path.getsize(self.journal_path) > self.max_journal_bytes:
+                self._compact()
+
+    def _compact(self):
+        """
+        Fold the journal into the snapshot. The caller must hold the exclusive lock.
+        """
+        database = self._read_snapshot()
+        database['faq'] = self._replay(database.get('faq', []), self._read_journal())
+        tmp_path = f"{self.file_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(database, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.file_path)
+        # Si el proceso cae aquí, el journal se vuelve a aplicar sin efecto
+        open(self.journal_path, 'w').close()
+
+    def compact(self):
+        """
+        Fold the journal into the JSON snapshot.
+        """
+        with self._locked(exclusive=True):
+            self._compact()
 
     def load_faqs(self) -> List[Dict[str, str]]:
         """
         Load FAQs from the JSON file.
 
         Returns:
-            List[Dict[str, str]]: List of FAQ dictionaries.
+            List[Dict[str, str]]: List of FAQ dictionaries, each with its 'id'.
         """
-        with open(self.file_path, 'r') as f:
-            database = json.load(f)
-        return database['faq']
+        with self._locked(exclusive=False):
+            database = self._read_snapshot()
+            entries = self._read_journal()
+        return self._replay(database['faq'], entries)
 
-    def save_faq(self, question: str, answer: str):
+    def fingerprint(self) -> Tuple:
+        """
+        Cheap fingerprint of the snapshot and journal (size and mtime of each).
+
+        Returns:
+            Tuple: A value that changes whenever either file is written.
+        """
+        fingerprint = ()
+        for path in (self.file_path, self.journal_path):
+            try:
+                stat = os.stat(path)
+                fingerprint += (stat.st_size, stat.st_mtime_ns)
+            except FileNotFoundError:
+                fingerprint += (None, None)
+        return fingerprint
+
+    def save_faq(self, question: str, answer: str, category: Optional[str] = None) -> str:
         """
         Save a new FAQ to the JSON file.
 
         Args:
             question (str): The FAQ question.
             answer (str): The FAQ answer.
+            category (Optional[str]): The FAQ category.
+
+        Returns:
+            str: The ID of the new FAQ.
+        """
+        faq = {"question": question, "answer": answer}
+        if category:
+            faq["category"] = category
+        return self.save_faqs([faq])[0]["id"]
+
+    def save_faqs(self, faqs: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """
+        Save many new FAQs with a single journal write.
+
+        Args:
+            faqs (List[Dict[str, str]]): FAQs with 'question', 'answer' and optionally 'category'.
+
+        Returns:
+            List[Dict[str, str]]: The saved FAQs, each with its new 'id'.
+        """
+        records = [{**faq, "id": faq.get("id") or uuid4().hex} for faq in faqs]
+        self._append([{"op": "add", "id": record["id"], "faq": record} for record in records])
+        return records
+
+    def replace_faqs(self, faq_ids: List[str], faqs: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """
+        Delete some FAQs and save new ones with a single journal write.
+
+        Args:
+            faq_ids (List[str]): IDs of the FAQs to delete.
+            faqs (List[Dict[str, str]]): New FAQs with 'question', 'answer' and optionally 'category'.
+
+        Returns:
+            List[Dict[str, str]]: The saved FAQs, each with its new 'id'.
+        """
+        records = [{**faq, "id": faq.get("id") or uuid4().hex} for faq in faqs]
+        entries = [{"op": "delete", "id": faq_id} for faq_id in faq_ids]
+        entries += [{"op": "add", "id": record["id"], "faq": record} for record in records]
+        if entries:
+            self._append(entries)
+        return records
+
+    def update_faq(self, faq: Dict[str, str]):
+        """
+        Replace an existing FAQ.
+
+        Args:
+            faq (Dict[str, str]): The full FAQ, including its 'id'.
+        """
+        self._append([{"op": "update", "id": faq["id"], "faq": faq}])
+
+    def delete_faqs(self, faq_ids: List[str]):
+        """
+        Delete FAQs by ID.
+
+        Args:
+            faq_ids (List[str]): IDs of the FAQs to delete.
         """
-        with open(self.file_path, 'r+') as f:
-            database = json.load(f)
-            database['faq'].append({"question": question, "answer": answer})
-            f.seek(0)
-            f.truncate()
-            json.dump(database, f, indent=2)
+        self._append([{"op": "delete", "id": faq_id} for faq_id in faq_ids])
 
     def get_all_faqs(self) -> List[Dict[str, str]]:
         """
@@ -228,17 +890,144 @@ class JSONAdapter:
 
 class TicketDatabase:
     """
-    Manages ticket data in a JSON file.
+    Manages ticket data in an embedded SQLite database.
+
+    Tickets are indexed by their ID and each conversation message is its own row, so
+    appending a message is a single insert instead of a whole-file rewrite. The
+    database runs in WAL mode and every write is a transaction, so parallel workers
+    never lose or tear writes. Ticket IDs come from a locked sequence, so they are
+    unique under concurrency, or from a shared allocator (the MongoDB counter) so
+    they never collide with the tickets allocated elsewhere. A legacy JSON ticket
+    file is migrated on first use.
     """
 
-    def __init__(self, database_file: str):
+    def __init__(self, database_file: str, id_allocator: Optional[Any] = None):
         """
         Initialize the TicketDatabase.
 
         Args:
-            database_file (str): Path to the JSON file containing ticket data.
+            database_file (str): Path to the ticket database. A ".json" path is treated as
+                a legacy file: tickets are stored in a ".sqlite3" file next to it and the
+                JSON tickets are imported the first time.
+            id_allocator (Optional[Any]): Allocator with allocate() and advance_to(),
+                e.g. a MongoTicketIdAllocator. Its counter is moved past the SQLite
+                sequence and every new ticket takes its ID from it. Defaults to the
+                SQLite sequence.
         """
         self.database_file = database_file
+        self.id_allocator = id_allocator
+        root, ext = os.path.splitext(database_file)
+        self.sqlite_file = f"{root}.sqlite3" if ext == ".json" else database_file
+        self._local = threading.local()
+        self._initialize()
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Get the SQLite connection of the current thread.
+
+        Returns:
+            sqlite3.Connection: Connection in autocommit mode; transactions are explicit.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.sqlite_file, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Run a write transaction, holding the database write lock from the start.
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _initialize(self):
+        """
+        Create the schema and migrate the legacy JSON tickets if the database is empty.
+        """
+        with self._transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tickets ("
+                "id TEXT PRIMARY KEY, user_data TEXT NOT NULL, created_at TEXT NOT NULL, "
+                "resolved INTEGER NOT NULL DEFAULT 0)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "id INTEGER PRIMARY KEY, ticket_id TEXT NOT NULL, role TEXT NOT NULL, content TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS messages_ticket ON messages (ticket_id, id)")
+
+            is_empty = conn.execute("SELECT 1 FROM tickets LIMIT 1").fetchone() is None
+            if is_empty and self.sqlite_file != self.database_file and os.path.exists(self.database_file):
+                with open(self.database_file, 'r') as f:
+                    self._import_tickets(conn, json.load(f).get('tickets', []))
+            create_sqlite_sequences(conn)
+            last_value = conn.execute("SELECT value FROM sequences WHERE name = ?", (TICKET_SEQUENCE,)).fetchone()[0]
+        if self.id_allocator is not None:
+            # Una sola secuencia: el contador compartido no repite los IDs ya usados en SQLite
+            self.id_allocator.advance_to(last_value)
+
+    @staticmethod
+    def _import_tickets(conn: sqlite3.Connection, tickets: List[Dict[str, Any]]):
+        """
+        Insert tickets in the legacy JSON format.
+
+        Args:
+            conn (sqlite3.Connection): Connection inside a transaction.
+            tickets (List[Dict[str, Any]]): Tickets with their conversations.
+        """
+        conn.executemany(
+            "INSERT OR IGNORE INTO tickets (id, user_data, created_at, resolved) VALUES (?, ?, ?, ?)",
+            [(t['id'], json.dumps(t['user_data']), t.get('createdAt', ""), int(t.get('resolved', False))) for t in tickets],
+        )
+        conn.executemany(
+            "INSERT INTO messages (ticket_id, role, content) VALUES (?, ?, ?)",
+            [(t['id'], m['role'], m['content']) for t in tickets for m in t.get('conversation', [])],
+        )
+
+    def _load_tickets(self, rows: List[sqlite3.Row]) -> List[Dict[str, Any]]:
+        """
+        Build ticket dictionaries (legacy JSON format) from ticket rows.
+
+        Args:
+            rows (List[sqlite3.Row]): Rows of the tickets table.
+
+        Returns:
+            List[Dict[str, Any]]: Tickets with their conversations.
+        """
+        tickets = {
+            row['id']: {
+                "id": row['id'],
+                "user_data": json.loads(row['user_data']),
+                "conversation": [],
+                "createdAt": row['created_at'],
+                "resolved": bool(row['resolved']),
+            }
+            for row in rows
+        }
+        if not tickets:
+            return []
+        if len(tickets) == 1:
+            messages = self._connection().execute(
+                "SELECT ticket_id, role, content FROM messages WHERE ticket_id = ? ORDER BY id", tuple(tickets)
+            )
+        else:
+            messages = self._connection().execute("SELECT ticket_id, role, content FROM messages ORDER BY ticket_id, id")
+        for message in messages:
+            ticket = tickets.get(message['ticket_id'])
+            if ticket is not None:
+                ticket['conversation'].append({"role": message['role'], "content": message['content']})
+        return list(tickets.values())
 
     def save_ticket(self, user_data: Dict[str, str], query: str, response: str) -> str:
         """
@@ -252,22 +1041,19 @@ class TicketDatabase:
         Returns:
             str: The generated ticket ID.
         """
-        with open(self.database_file, 'r+') as f:
-            database = json.load(f)
-            ticket_id = f"TICKET-{len(database['tickets']) + 1:04d}"
-            database['tickets'].append({
-                "id": ticket_id,
-                "user_data": user_data,
-                "conversation": [
-                    {"role": "system", "content": query},
-                    {"role": "assistant", "content": response}
-                ],
-                "createdAt": datetime.now().isoformat(),
-                "resolved": False
-            })
-            f.seek(0)
-            f.truncate()
-            json.dump(database, f, indent=2)
+        # El ID compartido se pide fuera de la transacción para no retener el bloqueo de escritura
+        ticket_id = self.id_allocator.allocate() if self.id_allocator is not None else None
+        with span("ticket.save"), self._transaction() as conn:
+            if ticket_id is None:
+                ticket_id = format_ticket_id(next_sqlite_value(conn))
+            conn.execute(
+                "INSERT INTO tickets (id, user_data, created_at, resolved) VALUES (?, ?, ?, 0)",
+                (ticket_id, json.dumps(user_data), datetime.now().isoformat()),
+            )
+            conn.executemany(
+                "INSERT INTO messages (ticket_id, role, content) VALUES (?, ?, ?)",
+                [(ticket_id, "system", query), (ticket_id, "assistant", response)],
+            )
         return ticket_id
 
     def update_ticket(self, ticket_id: str, role: str, content: str):
@@ -279,15 +1065,13 @@ class TicketDatabase:
             role (str): The role of the message sender (e.g., 'user' or 'assistant').
             content (str): The content of the message.
         """
-        with open(self.database_file, 'r+') as f:
-            database = json.load(f)
-            for ticket in database['tickets']:
-                if ticket['id'] == ticket_id:
-                    ticket['conversation'].append({"role": role, "content": content})
-                    break
-            f.seek(0)
-            f.truncate()
-            json.dump(database, f, indent=2)
+        with span("ticket.update"), self._transaction() as conn:
+            # Igual que antes: si el ticket no existe no se guarda nada
+            conn.execute(
+                "INSERT INTO messages (ticket_id, role, content) "
+                "SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM tickets WHERE id = ?)",
+                (ticket_id, role, content, ticket_id),
+            )
 
     def get_ticket(self, ticket_id: str) -> Dict[str, Any]:
         """
@@ -299,12 +1083,10 @@ class TicketDatabase:
         Returns:
             Dict[str, Any]: The ticket data, or None if not found.
         """
-        with open(self.database_file, 'r') as f:
-            database = json.load(f)
-        for ticket in database['tickets']:
-            if ticket['id'] == ticket_id:
-                return ticket
-        return None
+        with span("ticket.read"):
+            rows = self._connection().execute("SELECT * FROM tickets WHERE id = ?", (ticket_id,)).fetchall()
+            tickets = self._load_tickets(rows)
+        return tickets[0] if tickets else None
 
     def get_all_tickets(self) -> List[Dict[str, Any]]:
         """
@@ -313,9 +1095,9 @@ class TicketDatabase:
         Returns:
             List[Dict[str, Any]]: List of all ticket dictionaries.
         """
-        with open(self.database_file, 'r') as f:
-            database = json.load(f)
-        return database['tickets']
+        with span("ticket.read"):
+            rows = self._connection().execute("SELECT * FROM tickets ORDER BY rowid").fetchall()
+            return self._load_tickets(rows)
 
     def resolve_ticket(self, ticket_id: str):
         """
@@ -324,12 +1106,5 @@ class TicketDatabase:
         Args:
             ticket_id (str): The ID of the ticket to resolve.
         """
-        with open(self.database_file, 'r+') as f:
-            database = json.load(f)
-            for ticket in database['tickets']:
-                if ticket['id'] == ticket_id:
-                    ticket['resolved'] = True
-                    break
-            f.seek(0)
-            f.truncate()
-            json.dump(database, f, indent=2)
+        with self._transaction() as conn:
+            conn.execute("UPDATE tickets SET resolved = 1 WHERE id = ?", (ticket_id,))
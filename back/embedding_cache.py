@@ -0,0 +1,339 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize a text for cache keys (Unicode NFC, trimmed, collapsed whitespace).
+
+    Args:
+        text (str): Text to normalize.
+
+    Returns:
+        str: The normalized text.
+    """
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+class EmbeddingCache(Embeddings):
+    """
+    Persistent, content-addressed cache in front of an embedding model.
+
+    Vectors are stored on disk in a memory-mapped float32 matrix. Two parallel
+    uint64 arrays hold the key of each row (the first 8 bytes of
+    sha256(model + normalized text)) and its last-use clock, which drives LRU
+    eviction once the cache holds `max_entries` rows. Only misses are sent to the
+    wrapped provider.
+
+    A shared generation counter, bumped by every write, tells a process whether
+    another one wrote since its last look; it is checked before every lookup and
+    write, and only when it moved is the key index rebuilt from disk, so a vector
+    embedded by one process is a hit in the others and is never stored twice. The maps are shared with the other processes through the page cache, so
+    writes are visible at once and are flushed to disk at most every
+    `flush_interval` seconds.
+    """
+
+    def __init__(self, embeddings: Any, cache_dir: str, model: Optional[str] = None, max_entries: int = 100_000, flush_interval: float = 1.0):
+        """
+        Initialize the EmbeddingCache.
+
+        Args:
+            embeddings (Any): Embedding model to wrap (embed_documents/embed_query).
+            cache_dir (str): Directory holding the cache files.
+            model (Optional[str]): Model name used in the cache key. Defaults to the
+                `model` attribute of the wrapped embeddings.
+            max_entries (int): Maximum number of cached vectors. Defaults to 100000.
+            flush_interval (float): Minimum seconds between flushes of the cache
+                files to disk; 0 flushes after every write. Defaults to 1.
+        """
+        self.embeddings = embeddings
+        self.model = model or getattr(embeddings, "model", type(embeddings).__name__)
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        name = re.sub(r"[^\w.-]", "_", self.model)
+        os.makedirs(cache_dir, exist_ok=True)
+        self._meta_path = os.path.join(cache_dir, f"{name}.meta.json")
+        self._vectors_path = os.path.join(cache_dir, f"{name}.f32")
+        self._keys_path = os.path.join(cache_dir, f"{name}.keys")
+        self._clock_path = os.path.join(cache_dir, f"{name}.clock")
+        self._lock_path = os.path.join(cache_dir, f"{name}.lock")
+        self._generation_path = os.path.join(cache_dir, f"{name}.gen")
+
+        self._lock = threading.RLock()
+        self._rows: Dict[int, int] = {}
+        self._free: List[int] = []
+        self._clock = 0
+        self._generation = 0
+        self._last_flush = time.monotonic()
+        self._dirty = False
+        self.dim = None
+        self.capacity = 0
+        self._vectors = None
+        self._keys = None
+        self._last_used = None
+        self._shared_generation = None
+        self._load()
+
+    def _key(self, text: str) -> int:
+        digest = hashlib.sha256(f"{self.model}\0{normalize_text(text)}".encode("utf-8")).digest()
+        return int.from_bytes(digest[:8], "little") or 1  # 0 marca filas libres
+
+    @contextmanager
+    def _file_lock(self):
+        """
+        Hold an exclusive advisory lock on the cache files (shared across processes).
+        """
+        with open(self._lock_path, "a") as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _map(self):
+        """
+        Memory-map the cache files for the current dimension and capacity.
+        """
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dim))
+        self._keys = np.memmap(self._keys_path, dtype=np.uint64, mode="r+", shape=(self.capacity,))
+        self._last_used = np.memmap(self._clock_path, dtype=np.uint64, mode="r+", shape=(self.capacity,))
+        if self._shared_generation is None:
+            with open(self._generation_path, "ab") as f:
+                f.truncate(8)
+            self._shared_generation = np.memmap(self._generation_path, dtype=np.uint64, mode="r+", shape=(1,))
+
+    def _load(self):
+        """
+        Load the on-disk cache, if any, and rebuild the in-memory key index.
+        """
+        if not os.path.exists(self._meta_path):
+            return
+        with open(self._meta_path, "r") as f:
+            meta = json.load(f)
+        self.dim, self.capacity = meta["dim"], meta["capacity"]
+        self._map()
+        self._reindex()
+
+    def _reindex(self):
+        self._generation = int(self._shared_generation[0])
+        occupied = np.nonzero(self._keys)[0]
+        self._rows = dict(zip(self._keys[occupied].tolist(), occupied.tolist()))
+        self._free = np.nonzero(self._keys == 0)[0].tolist()
+        self._clock = int(self._last_used.max()) if self.capacity else 0
+
+    def _resize(self, capacity: int):
+        """
+        Grow the cache files to a new capacity (new rows are zero-filled, i.e. free).
+
+        Args:
+            capacity (int): New number of rows.
+        """
+        for path, row_bytes in ((self._vectors_path, self.dim * 4), (self._keys_path, 8), (self._clock_path, 8)):
+            with open(path, "ab") as f:
+                f.truncate(capacity * row_bytes)
+        self._free.extend(range(self.capacity, capacity))
+        self.capacity = capacity
+        tmp_path = f"{self._meta_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"model": self.model, "dim": self.dim, "capacity": capacity}, f)
+        os.replace(tmp_path, self._meta_path)
+        self._map()
+
+    def _sync_from_disk(self):
+        """
+        Pick up rows written by other processes sharing the cache directory. The
+        key index is only rebuilt if the shared generation moved since this
+        process last read or wrote the cache.
+        """
+        if self._shared_generation is None:
+            self._load()
+            return
+        if int(self._shared_generation[0]) == self._generation:
+            return
+        with open(self._meta_path, "r") as f:
+            meta = json.load(f)
+        if meta["capacity"] != self.capacity:
+            self.dim, self.capacity = meta["dim"], meta["capacity"]
+            self._map()
+        self._reindex()
+
+    def _allocate(self, count: int) -> np.ndarray:
+        """
+        Return `count` free rows, growing the files or evicting the least recently used rows.
+
+        Args:
+            count (int): Number of rows needed.
+
+        Returns:
+            np.ndarray: Row indexes to write.
+        """
+        if len(self._free) < count and self.capacity < self.max_entries:
+            self._resize(min(self.max_entries, max(self.capacity * 2, self.capacity + count, 1024)))
+        free = np.asarray(self._free[:count], dtype=np.int64)
+        del self._free[:count]
+        if len(free) >= count:
+            return free
+
+        needed = count - len(free)
+        occupied = np.nonzero(self._keys)[0]
+        victims = occupied[np.argpartition(self._last_used[occupied], needed - 1)[:needed]]
+        for key in self._keys[victims].tolist():
+            self._rows.pop(key, None)
+        self._keys[victims] = 0
+        self.evictions += needed
+        return np.concatenate([free, victims])
+
+    def _store(self, keys: List[int], vectors: List[List[float]]):
+        """
+        Write new vectors to the cache.
+
+        Args:
+            keys (List[int]): Cache keys of the vectors.
+            vectors (List[List[float]]): Vectors returned by the provider.
+        """
+        keys, vectors = keys[:self.max_entries], vectors[:self.max_entries]
+        if not keys:
+            return
+        with self._file_lock():
+            self._sync_from_disk()
+            # Otro proceso pudo guardar algunos de estos vectores desde la consulta
+            new = [(key, vector) for key, vector in zip(keys, vectors) if key not in self._rows]
+            if not new:
+                return
+            keys, vectors = [key for key, _ in new], [vector for _, vector in new]
+            if self.dim is None:
+                self.dim = len(vectors[0])
+                self._resize(min(self.max_entries, max(1024, len(keys))))
+            rows = self._allocate(len(keys))
+            self._clock += 1
+            # Escribir vectores antes que las claves: una fila nunca apunta a un vector incompleto
+            self._vectors[rows] = np.asarray(vectors, dtype=np.float32)
+            self._last_used[rows] = self._clock
+            self._keys[rows] = np.asarray(keys, dtype=np.uint64)
+            for key, row in zip(keys, rows.tolist()):
+                self._rows[key] = row
+            # Avisar a los otros procesos; esta escritura ya está en el índice propio
+            self._generation += 1
+            self._shared_generation[0] = self._generation
+            self._dirty = True
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                self.flush()
+
+    def flush(self):
+        """
+        Write the pending cache changes to disk.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            self._vectors.flush()
+            self._keys.flush()
+            self._last_used.flush()
+            self._shared_generation.flush()
+            self._dirty = False
+            self._last_flush = time.monotonic()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed a list of texts, calling the provider only for cache misses.
+
+        Args:
+            texts (List[str]): Texts to embed.
+
+        Returns:
+            List[List[float]]: One vector per text.
+        """
+        keys = [self._key(text) for text in texts]
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        pending: Dict[int, List[int]] = {}
+
+        with self._lock:
+            self._sync_from_disk()
+            self._clock += 1
+            for i, key in enumerate(keys):
+                row = self._rows.get(key)
+                if row is not None and int(self._keys[row]) == key:
+                    self._last_used[row] = self._clock
+                    results[i] = self._vectors[row].tolist()
+                    self.hits += 1
+                else:
+                    pending.setdefault(key, []).append(i)
+            # Textos repetidos en el mismo lote solo se piden una vez al proveedor
+            self.misses += len(pending)
+            self.hits += sum(len(positions) - 1 for positions in pending.values())
+
+        if pending:
+            miss_keys = list(pending)
+            vectors = self.embeddings.embed_documents([texts[pending[key][0]] for key in miss_keys])
+            with self._lock:
+                self._store(miss_keys, vectors)
+            for key, vector in zip(miss_keys, vectors):
+                for i in pending[key]:
+                    results[i] = list(vector)
+        return results
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a single query text, calling the provider only on a cache miss.
+
+        Args:
+            text (str): Text to embed.
+
+        Returns:
+            List[float]: The embedding vector.
+        """
+        key = self._key(text)
+        with self._lock:
+            self._sync_from_disk()
+            row = self._rows.get(key)
+            if row is not None and int(self._keys[row]) == key:
+                self._clock += 1
+                self._last_used[row] = self._clock
+                self.hits += 1
+                return self._vectors[row].tolist()
+            self.misses += 1
+
+        vector = self.embeddings.embed_query(text)
+        with self._lock:
+            self._store([key], [vector])
+        return list(vector)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache hit/miss statistics.
+
+        Returns:
+            Dict[str, Any]: Hits, misses, hit rate, evictions and current size.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "model": self.model,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._rows),
+                "capacity": self.capacity,
+                "max_entries": self.max_entries,
+            }
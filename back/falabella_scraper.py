@@ -1,24 +1,18 @@
 import re
-from typing import List, Tuple
-from urllib.parse import urljoin
+import asyncio
+import hashlib
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
 import json
 from pathlib import Path
 
-import requests
-from bs4 import BeautifulSoup, NavigableString
-from langchain.agents import AgentType, initialize_agent, create_react_agent
-from langchain.chat_models import ChatOpenAI
-from langchain_mistralai import ChatMistralAI
-
-
-
-from langchain.schema import HumanMessage, SystemMessage
-from langchain.tools import Tool
-from langchain_core.tools import tool
-
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+import httpx
+from bs4 import BeautifulSoup
 from dotenv import load_dotenv
-from typing import Annotated, List
+from back.crawl_state import CrawlState
+from back.database_manager import JSONAdapter
+from back.embedding_cache import normalize_text
 
 
 import os
@@ -28,86 +22,310 @@ load_dotenv()
 # TODO: Añadir funcionalidades de OpenAI Swarm o implementacion con Mistral
 # TODO: Arreglar warnings de LangChain en _s xd
 
+class HostRateLimiter:
+    """
+    Spaces out requests to the same host to at most `rate` per second.
+    """
+
+    def __init__(self, rate: float):
+        """
+        Initialize the HostRateLimiter.
+
+        Args:
+            rate (float): Maximum requests per second and host (0 disables the limit).
+        """
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot: Dict[str, float] = {}
+        self._lock = asyncio.Lock()
+
+    async def wait(self, url: str):
+        """
+        Wait for the next free slot of the URL's host.
+
+        Args:
+            url (str): URL about to be fetched.
+        """
+        if not self.interval:
+            return
+        host = urlparse(url).netloc
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
 class FAQScraper:
-    def __init__(self, base_url: str, model: str):
+    """
+    Crawls a site breadth-first and extracts question-answer pairs from each page with an LLM.
+
+    Pages are fetched by `concurrency` async workers over one pooled HTTP client, with
+    a per-host rate limit. Fetched pages go to a separate pool of `llm_workers`
+    extraction workers, and every page's FAQs are written to `knowledge_db` as soon
+    as they are extracted.
+
+    With a `crawl_state`, pages are requested conditionally (ETag/Last-Modified) and
+    hashed; unchanged pages are not sent to the LLM, and a changed page replaces only
+    the FAQs it produced in the previous crawl.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        model: str,
+        llm: Optional[Any] = None,
+        concurrency: int = 8,
+        llm_workers: int = 4,
+        rate_limit: float = 5.0,
+        timeout: float = 10.0,
+        knowledge_db: Optional[JSONAdapter] = None,
+        crawl_state: Optional[CrawlState] = None,
+    ):
+        """
+        Initialize the FAQScraper.
+
+        Args:
+            base_url (str): Only links under this prefix are followed.
+            model (str): Mistral model name, used when no llm is given.
+            llm (Optional[Any]): Chat model with ainvoke. Defaults to ChatMistralAI.
+            concurrency (int): Concurrent page fetches. Defaults to 8.
+            llm_workers (int): Concurrent LLM extractions. Defaults to 4.
+            rate_limit (float): Maximum requests per second and host. Defaults to 5.
+            timeout (float): HTTP timeout in seconds. Defaults to 10.
+            knowledge_db (Optional[JSONAdapter]): Knowledge store that receives each page's
+                FAQs as soon as they are extracted.
+            crawl_state (Optional[CrawlState]): Record of the previous crawl, used to skip
+                unchanged pages and to replace the FAQs of changed ones.
+        """
         self.base_url = base_url
         self.visited_urls = set()
+        # Profundidad más corta conocida de cada URL y enlaces de las ya descargadas
+        self._depths: Dict[str, int] = {}
+        self._links: Dict[str, List[str]] = {}
         self.results = []
+        self.concurrency = concurrency
+        self.llm_workers = llm_workers
+        self.rate_limiter = HostRateLimiter(rate_limit)
+        self.timeout = timeout
+        self.knowledge_db = knowledge_db
+        self.crawl_state = crawl_state
+        self.pages = 0
+        self.unchanged = 0
+        self.errors = 0
 
-        # Initialize LangChain agent
         self.model = model
-        self.llm = ChatMistralAI(temperature=0, model=self.model)
+        if llm is None:
+            from langchain_mistralai import ChatMistralAI
+            self.llm = ChatMistralAI(temperature=0, model=self.model)
+            self.group_llm = ChatMistralAI(temperature=0.1, model=self.model)
+        else:
+            self.llm = self.group_llm = llm
 
     def scrape(self, start_url: str, max_depth: int = 2) -> List[dict]:
-        self._scrape_recursive(start_url, max_depth)
-        return self.results
-    
+        return asyncio.run(self.ascrape(start_url, max_depth))
+
     def scrape_page(self, url: str) -> List[dict]:
-        self._scrape_recursive(url, max_depth=0)
+        return self.scrape(url, max_depth=0)
+
+    async def ascrape(self, start_url: str, max_depth: int = 2) -> List[dict]:
+        """
+        Crawl from start_url up to max_depth links away and extract the FAQs of every page.
+
+        Args:
+            start_url (str): First page to fetch (depth 0).
+            max_depth (int): Maximum link depth to follow. Defaults to 2.
+
+        Returns:
+            List[dict]: Every extracted question-answer pair.
+        """
+        frontier: asyncio.Queue = asyncio.Queue()
+        pages: asyncio.Queue = asyncio.Queue(maxsize=self.llm_workers * 4)
+        self._enqueue(frontier, start_url, 0, max_depth)
+
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        async with httpx.AsyncClient(timeout=self.timeout, limits=limits, follow_redirects=True) as http:
+            fetchers = [asyncio.create_task(self._fetch_worker(http, frontier, pages, max_depth)) for _ in range(self.concurrency)]
+            extractors = [asyncio.create_task(self._extract_worker(pages)) for _ in range(self.llm_workers)]
+            try:
+                await frontier.join()
+                await pages.join()
+            finally:
+                for task in fetchers + extractors:
+                    task.cancel()
+                await asyncio.gather(*fetchers, *extractors, return_exceptions=True)
         return self.results
-    
-    def _extract_relevant_text(self, text_content: str, topic: str) -> str:
-        relevant_text = self.llm.invoke(f"Extrae del siguiente texto el contenido relacionado con el tema específico '{topic}', solamente entrega el contenido relevante  \n\n{text_content}").content
-        return relevant_text
-    
-
-    def _scrape_recursive(self, url: str, max_depth: int = 2, current_depth: int = 0):
-        if url in self.visited_urls:
+
+    def _enqueue(self, frontier: asyncio.Queue, url: str, depth: int, max_depth: int):
+        """
+        Queue a URL at a link depth, or lower the depth of a URL already queued.
+
+        A URL is fetched once, at the shortest depth it was reached by. The fetch
+        workers run concurrently, so a page may first be found through a longer path;
+        a shorter path found later lowers its depth, and if the page was already
+        fetched its links are followed again from the new depth.
+
+        Args:
+            frontier (asyncio.Queue): Queue of URLs to fetch.
+            url (str): URL found.
+            depth (int): Link depth of the path that found it.
+            max_depth (int): Maximum link depth to follow.
+        """
+        known = self._depths.get(url)
+        if known is not None and known <= depth:
             return
+        self._depths[url] = depth
+        if known is None:
+            # Se marca como visitada al encolar para no repetir URLs pendientes
+            self.visited_urls.add(url)
+            frontier.put_nowait(url)
+            return
+        # Camino más corto: si ya se descargó, sus enlaces se siguen desde la nueva profundidad
+        links = self._links.get(url)
+        if links is not None and depth < max_depth:
+            for link in links:
+                self._enqueue(frontier, link, depth + 1, max_depth)
+
+    async def _fetch_worker(self, http: httpx.AsyncClient, frontier: asyncio.Queue, pages: asyncio.Queue, max_depth: int):
+        while True:
+            url = await frontier.get()
+            try:
+                previous = self.crawl_state.get(url) if self.crawl_state is not None else None
+                headers = {}
+                if previous and previous["etag"]:
+                    headers["If-None-Match"] = previous["etag"]
+                if previous and previous["last_modified"]:
+                    headers["If-Modified-Since"] = previous["last_modified"]
 
-        self.visited_urls.add(url)
-        print(f"Scraping URL: {url}")
-        response = requests.get(url, timeout=10)  # Add a 30-second timeout
-        soup = BeautifulSoup(response.text, 'html.parser')
+                await self.rate_limiter.wait(url)
+                print(f"Scraping URL: {url}")
+                response = await http.get(url, headers=headers)
+                self.pages += 1
+                if response.status_code == 304 and previous:
+                    page = None
+                    links = previous["links"]
+                else:
+                    response.raise_for_status()
+                    text_content, links = await asyncio.to_thread(self._parse_page, url, response.text)
+                    page = {
+                        "url": url,
+                        "text": text_content,
+                        "links": links,
+                        "content_hash": hashlib.sha256(normalize_text(text_content).encode("utf-8")).hexdigest(),
+                        "etag": response.headers.get("etag"),
+                        "last_modified": response.headers.get("last-modified"),
+                        "previous_faq_ids": previous["faq_ids"] if previous else [],
+                    }
+                    if previous and previous["content_hash"] == page["content_hash"]:
+                        # Mismo contenido: solo se actualizan los validadores, sin llamar al LLM
+                        self.crawl_state.put(url, page["content_hash"], links, previous["faq_ids"], page["etag"], page["last_modified"])
+                        page = None
+                if page is None:
+                    self.unchanged += 1
+                # La profundidad se lee al terminar la descarga: pudo bajar mientras tanto
+                self._links[url] = links
+                depth = self._depths[url]
+                if depth < max_depth:
+                    for link in links:
+                        self._enqueue(frontier, link, depth + 1, max_depth)
+                if page is not None:
+                    await pages.put(page)
+            except Exception as e:
+                self.errors += 1
+                print(f"Error scraping url {url}: {e}")
+            finally:
+                frontier.task_done()
 
-        # Extract text content
+    def _parse_page(self, url: str, html: str) -> Tuple[str, List[str]]:
+        """
+        Extract the text of a page and the links to follow.
+
+        Args:
+            url (str): URL of the page.
+            html (str): Page HTML.
+
+        Returns:
+            Tuple[str, List[str]]: The text content and the absolute URLs under base_url.
+        """
+        soup = BeautifulSoup(html, 'html.parser')
         text_content = soup.get_text(separator='\n', strip=True)
+        links = []
+        for link in soup.find_all('a', href=True):
+            href = link['href'].split('?')[0].split('#')[0]
+            full_url = urljoin(url, href)
+            if full_url.startswith(self.base_url):
+                links.append(full_url)
+        return text_content, links
+
+    async def _extract_worker(self, pages: asyncio.Queue):
+        while True:
+            page = await pages.get()
+            try:
+                question_answer_list = await self._extract_faqs(page["url"], page["text"])
+                if question_answer_list is None:
+                    self.errors += 1  # Sin registrar la página, para reintentarla en el próximo recorrido
+                    continue
+                self.results.extend(question_answer_list)
+                await asyncio.to_thread(self._store_page, page, question_answer_list)
+            except Exception as e:
+                self.errors += 1
+                print(f"Error extracting FAQs from url {page['url']}: {e}")
+            finally:
+                pages.task_done()
+
+    def _store_page(self, page: Dict[str, Any], question_answer_list: List[dict]):
+        """
+        Replace the page's previous FAQs in the knowledge store and record the crawl.
+
+        Args:
+            page (Dict[str, Any]): Fetched page with its validators and previous FAQ IDs.
+            question_answer_list (List[dict]): FAQs extracted from the page.
+        """
+        records = question_answer_list
+        if self.knowledge_db is not None:
+            records = self.knowledge_db.replace_faqs(page["previous_faq_ids"], question_answer_list)
+        if self.crawl_state is not None:
+            self.crawl_state.put(
+                page["url"], page["content_hash"], page["links"], [record.get("id") for record in records if record.get("id")],
+                page["etag"], page["last_modified"],
+            )
+
+    async def _extract_faqs(self, url: str, text_content: str) -> Optional[List[dict]]:
         topic = text_content.split('\n')[0].split('|')[0].strip()
 
-        # Use LangChain agent to group text
-        relevant_text = self.llm.invoke(f"Extrae del siguiente texto el contenido relacionado con el siguiente tema: {topic}, solamente entrega el texto  \n\n{text_content}").content
+        relevant_text = (await self.llm.ainvoke(f"Extrae del siguiente texto el contenido relacionado con el siguiente tema: {topic}, solamente entrega el texto  \n\n{text_content}")).content
         question_answer_list = []
         try:
-            question_answer_list = self._group_text(relevant_text)
+            question_answer_list = await self._group_text(relevant_text)
         except Exception:
             try:
-                question_answer_list = self._group_text(relevant_text)
+                question_answer_list = await self._group_text(relevant_text)
             except Exception as e:
                 print(f"Error grouping text from url {url}: {e}")
-        
+                return None
+
         for qa in question_answer_list:
             qa["category"] = topic
-        
-        self.results.extend(question_answer_list)
-
-        # Find and follow links
-        if current_depth >= max_depth:
-            return
-        
-        for link in soup.find_all('a', href=True):
-            href = link['href'].split('?')[0]
-            full_url = urljoin(url, href)
-            if full_url.startswith(self.base_url) and full_url not in self.visited_urls:
-                self._scrape_recursive(full_url, current_depth + 1, max_depth)
+            qa["url"] = url
+        return question_answer_list
 
     def to_json(self, filename: str) -> None:
-        db_knowledge = {"faq": []}
-        if Path(filename).exists():
-            db_knowledge = json.loads(Path(filename).read_text())
-            
-        db_knowledge["faq"].extend(self.results)
-        Path(filename).write_text(json.dumps(db_knowledge, indent=2, ensure_ascii=False))
+        # Reemplaza las FAQs anteriores de las mismas páginas en una sola escritura del journal
+        knowledge_db = JSONAdapter(filename)
+        urls = {qa["url"] for qa in self.results}
+        previous_ids = [faq["id"] for faq in knowledge_db.load_faqs() if faq.get("url") in urls]
+        knowledge_db.replace_faqs(previous_ids, self.results)
 
 
     # @tool("Agrupar texto en formato pregunta-respuesta")
-    def _group_text(self, text: str) -> List[dict]:
+    async def _group_text(self, text: str) -> List[dict]:
         """
         Agrupa texto en una lista de objetos JSON con formato question-answer
         """
-        llm = ChatMistralAI(temperature=0.1, model=self.model)
+        # Importación diferida: LangChain solo se carga al extraer FAQs
+        from langchain_core.prompts import ChatPromptTemplate
+
         prompt = ChatPromptTemplate.from_messages([("system", "Del siguiente texto, para cada punto escribe una pregunta respondida por el texto. Luego entrega una lista de objetos JSON con atributos 'question' y 'answer'. Donde 'question' es la pregunta y 'answer' es la respuesta tomada tal como aparece en el texto. A continuación, el texto (recuerda responder con un fragmento de código markdown de un blob json con una única acción, y NADA más): \n\n {text}")])
-        chain = prompt | llm
-        grouped_text = chain.invoke({"text": text})
+        grouped_text = await self.group_llm.ainvoke(prompt.format_messages(text=text))
         parsed_qas = "".join(grouped_text.content.split('\n')[1:-1])
         question_answer_list = json.loads(parsed_qas)
         return question_answer_list
@@ -116,12 +334,16 @@ class FAQScraper:
 def main():
     start_url = "https://www.falabella.com/falabella-cl/page/contactanos"
 
+    # Las FAQs se guardan en la base de conocimientos a medida que se extraen; las
+    # páginas sin cambios desde el último recorrido no se vuelven a procesar
+    knowledge_file = str(Path(__file__).parent.parent / "db_knowledge.json")
     scraper = FAQScraper(
         base_url="https://www.falabella.com/falabella-cl/page/",
-        model="mistral-large-latest")
+        model="mistral-large-latest",
+        knowledge_db=JSONAdapter(knowledge_file),
+        crawl_state=CrawlState(f"{knowledge_file}.crawl.sqlite3"))
 
     scraper.scrape(start_url, max_depth=2)
-    scraper.to_json("../db_knowledge.json")
 
 if __name__ == "__main__":
     main()
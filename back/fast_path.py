@@ -0,0 +1,95 @@
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+class FastPathRouter:
+    """
+    Answers a user query straight from the FAQs when it is a near-exact match of a
+    stored question.
+
+    The router keeps an L2-normalized matrix with the embedding of every FAQ question
+    (the vector index embeds the answers, so its scores are never near-exact for a
+    question). The query is scored against all questions with one matrix-vector
+    product; if the closest question is within `max_distance`, its answer is returned
+    and the agents (two chat completions) are skipped. Otherwise the caller falls
+    through to the agents. The matrix is rebuilt when the FAQ index changes; the
+    question embeddings come from the manager (its knowledge artifact, or the
+    embedding cache).
+    """
+
+    def __init__(self, faq_manager: Any, max_distance: float = 0.1):
+        """
+        Initialize the FastPathRouter.
+
+        Args:
+            faq_manager (Any): FAQManager whose FAQs and embeddings are used.
+            max_distance (float): Highest distance answered directly (0 disables the fast
+                path). Distances are squared L2 between normalized embeddings, i.e.
+                2 - 2 * cosine similarity. Defaults to 0.1.
+        """
+        self.faq_manager = faq_manager
+        self.max_distance = max_distance
+        self.hits = 0
+        self.misses = 0
+        self._faqs: List[Dict[str, str]] = []
+        self._questions = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        """
+        Rebuild the question matrix if the FAQ index changed since the last build.
+        The questions are embedded without holding the router lock; a result is only
+        installed if no newer version was installed meanwhile.
+        """
+        with self._lock:
+            current = self._version
+        if self.faq_manager.version == current:
+            return
+        version, faqs, vectors = self.faq_manager.question_snapshot()
+        with self._lock:
+            if self._version is None or version > self._version:
+                self._faqs, self._questions, self._version = faqs, vectors, version
+
+    def route(self, query: str) -> Optional[Dict[str, Any]]:
+        """
+        Look for an FAQ that answers the query directly.
+
+        Args:
+            query (str): User query.
+
+        Returns:
+            Optional[Dict[str, Any]]: The matched FAQ ('question', 'answer', 'score'), with
+                'score' the query-question distance, or None if the query must go to the agents.
+        """
+        if self.max_distance <= 0 or not query.strip():
+            return None
+        match = None
+        self._refresh()
+        with self._lock:
+            faqs, questions = self._faqs, self._questions
+        if questions is not None:
+            query_vector = np.asarray(self.faq_manager.embed_query(query), dtype=np.float32)
+            query_vector /= max(float(np.linalg.norm(query_vector)), 1e-12)
+            distances = 2.0 - 2.0 * (questions @ query_vector)
+            best = int(np.argmin(distances))
+            if distances[best] <= self.max_distance:
+                match = {"question": faqs[best]["question"], "answer": faqs[best]["answer"], "score": float(distances[best])}
+        with self._lock:
+            if match:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return match
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the fraction of queries answered on the fast path.
+
+        Returns:
+            Dict[str, Any]: Hits, misses and hit rate.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
@@ -0,0 +1,132 @@
+import re
+import sqlite3
+from typing import Any, Optional
+
+from pymongo import DESCENDING, ReturnDocument
+
+TICKET_SEQUENCE = "tickets"
+
+def format_ticket_id(value: int) -> str:
+    """
+    Format a sequence value as a ticket ID.
+
+    Args:
+        value (int): Sequence value.
+
+    Returns:
+        str: The ticket ID, e.g. "TICKET-0042".
+    """
+    return f"TICKET-{value:04d}"
+
+def parse_ticket_id(ticket_id: str) -> int:
+    """
+    Extract the sequence value of a ticket ID.
+
+    Args:
+        ticket_id (str): Ticket ID, e.g. "TICKET-0042".
+
+    Returns:
+        int: The sequence value, or 0 if the ID has another format.
+    """
+    match = re.fullmatch(r"TICKET-(\d+)", ticket_id or "")
+    return int(match.group(1)) if match else 0
+
+def create_sqlite_sequences(conn: sqlite3.Connection):
+    """
+    Create the sequences table and seed the ticket sequence from existing tickets.
+
+    Must run inside a write transaction, after the tickets table exists.
+
+    Args:
+        conn (sqlite3.Connection): Connection inside a transaction.
+    """
+    conn.execute("CREATE TABLE IF NOT EXISTS sequences (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    conn.execute(
+        "INSERT OR IGNORE INTO sequences (name, value) "
+        "SELECT ?, COALESCE(MAX(CAST(SUBSTR(id, 8) AS INTEGER)), 0) FROM tickets WHERE id LIKE 'TICKET-%'",
+        (TICKET_SEQUENCE,),
+    )
+
+def next_sqlite_value(conn: sqlite3.Connection, name: str = TICKET_SEQUENCE, count: int = 1) -> int:
+    """
+    Atomically advance a SQLite sequence.
+
+    Must run inside a write transaction (BEGIN IMMEDIATE), which serializes
+    allocations across threads and processes.
+
+    Args:
+        conn (sqlite3.Connection): Connection inside a transaction.
+        name (str): Sequence name. Defaults to the ticket sequence.
+        count (int): Number of values to reserve. Defaults to 1.
+
+    Returns:
+        int: The last reserved value.
+    """
+    return conn.execute(
+        "INSERT INTO sequences (name, value) VALUES (?, ?) "
+        "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value RETURNING value",
+        (name, count),
+    ).fetchone()[0]
+
+class MongoTicketIdAllocator:
+    """
+    Allocates ticket IDs from an atomic counter document in MongoDB.
+
+    Each allocation is a single find_one_and_update with $inc on the counter, so it
+    is O(1) and unique across every worker sharing the database. When MongoDB is
+    configured it is the only ticket sequence: TicketDatabase takes its IDs from it
+    too, after moving the counter past the SQLite sequence.
+    """
+
+    def __init__(self, counters_collection: Any, tickets_collection: Optional[Any] = None, name: str = TICKET_SEQUENCE):
+        """
+        Initialize the MongoTicketIdAllocator.
+
+        Args:
+            counters_collection (Any): Collection holding the counter documents.
+            tickets_collection (Optional[Any]): Tickets collection used to seed the
+                counter past the existing IDs.
+            name (str): Counter name. Defaults to the ticket sequence.
+        """
+        self.counters = counters_collection
+        self.name = name
+        if tickets_collection is not None:
+            self.seed(tickets_collection)
+
+    def seed(self, tickets_collection: Any):
+        """
+        Move the counter past the highest existing ticket ID (idempotent).
+
+        Reads a single ticket through the 'id' index. IDs are zero-padded to four
+        digits, so their text order is their numeric order up to TICKET-9999; past
+        that, the counter is already ahead of the tickets it allocated and $max keeps it.
+
+        Args:
+            tickets_collection (Any): Tickets collection.
+        """
+        highest = tickets_collection.find({"id": {"$regex": "^TICKET-"}}, {"id": 1, "_id": 0}).sort("id", DESCENDING).limit(1)
+        self.advance_to(max((parse_ticket_id(doc.get("id")) for doc in highest), default=0))
+
+    def advance_to(self, value: int):
+        """
+        Move the counter to at least the given value (idempotent).
+
+        Args:
+            value (int): Highest sequence value already in use elsewhere.
+        """
+        self.counters.update_one({"_id": self.name}, {"$max": {"seq": value}}, upsert=True)
+
+    def allocate(self) -> str:
+        """
+        Allocate a new, unique ticket ID.
+
+        Returns:
+            str: The ticket ID.
+        """
+        counter = self.counters.find_one_and_update(
+            {"_id": self.name},
+            {"$inc": {"seq": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return format_ticket_id(counter["seq"])
@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, List
+
+import numpy as np
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"  # Nombre de la última versión publicada en el directorio de salida
+FILES = ("faqs.json", "chunks.json", "embeddings.npy", "questions.npy", "lexical.json")
+
+def corpus_digest(faqs: List[Dict[str, str]]) -> str:
+    """
+    Hash a set of FAQ records independently of their order.
+
+    Args:
+        faqs (List[Dict[str, str]]): FAQs with their IDs.
+
+    Returns:
+        str: Hex SHA-256 of the canonical JSON of the records.
+    """
+    canonical = json.dumps(sorted(faqs, key=lambda faq: faq["id"]), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def embedding_model_name(embeddings: Any) -> str:
+    """
+    Name of the model behind an embeddings object, as recorded in the manifest.
+
+    Args:
+        embeddings (Any): Embedding model (or an EmbeddingCache wrapping one).
+
+    Returns:
+        str: Its `model` attribute, or its class name.
+    """
+    return getattr(embeddings, "model", None) or type(embeddings).__name__
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def resolve_artifact(path: str) -> str:
+    """
+    Find the artifact version a path refers to.
+
+    Args:
+        path (str): A version directory, or an output directory of write_artifact
+            (its current version is used).
+
+    Returns:
+        str: The version directory.
+
+    Raises:
+        FileNotFoundError: If the path holds no artifact.
+    """
+    if os.path.exists(os.path.join(path, MANIFEST_FILE)):
+        return path
+    current = os.path.join(path, CURRENT_FILE)
+    if os.path.exists(current):
+        with open(current, "r", encoding="utf-8") as f:
+            return os.path.join(path, f.read().strip())
+    raise FileNotFoundError(f"No hay un artefacto de conocimiento en {path}")
+
+def write_artifact(out_dir: str, faqs: List[Dict[str, str]], chunks: List[Dict[str, str]], embeddings: np.ndarray, questions: np.ndarray, lexical_state: Dict[str, Any], model: str) -> str:
+    """
+    Write a new artifact version and make it the current one.
+
+    The files are written to a staging directory, which is renamed to
+    `v<format>-<hash>` once complete, and the CURRENT pointer is replaced last, so
+    readers never see a partial version. Older versions are left in place for the
+    processes that still have them mapped.
+
+    Args:
+        out_dir (str): Output directory.
+        faqs (List[Dict[str, str]]): Normalized FAQ records.
+        chunks (List[Dict[str, str]]): Splits with 'id', 'faq_id' and 'text', in
+            the order of the `embeddings` rows.
+        embeddings (np.ndarray): L2-normalized split embeddings.
+        questions (np.ndarray): L2-normalized question embeddings, in the order of `faqs`.
+        lexical_state (Dict[str, Any]): BM25Index.export_state() of the FAQs.
+        model (str): Name of the embedding model.
+
+    Returns:
+        str: The version directory.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".build-", dir=out_dir)
+    try:
+        for name, data in (("faqs.json", faqs), ("chunks.json", chunks), ("lexical.json", lexical_state)):
+            with open(os.path.join(staging, name), "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+        for name, matrix in (("embeddings.npy", embeddings), ("questions.npy", questions)):
+            np.save(os.path.join(staging, name), np.ascontiguousarray(matrix, dtype=np.float32))
+
+        manifest = {
+            "format_version": FORMAT_VERSION,
+            "source_sha256": corpus_digest(faqs),
+            "model": model,
+            "dim": int(embeddings.shape[1]) if embeddings.ndim == 2 else 0,
+            "faqs": len(faqs),
+            "chunks": len(chunks),
+            "files": {name: _file_sha256(os.path.join(staging, name)) for name in FILES},
+        }
+        # El hash del manifiesto identifica el contenido; la fecha queda fuera para que sea reproducible
+        manifest["artifact_sha256"] = hashlib.sha256(json.dumps(manifest, sort_keys=True).encode("utf-8")).hexdigest()
+        manifest["created_at"] = datetime.now().isoformat()
+        with open(os.path.join(staging, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        version = f"v{FORMAT_VERSION}-{manifest['artifact_sha256'][:12]}"
+        target = os.path.join(out_dir, version)
+        if os.path.exists(target):
+            shutil.rmtree(staging)  # Misma versión ya publicada
+        else:
+            os.rename(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    pointer = os.path.join(out_dir, f"{CURRENT_FILE}.tmp")
+    with open(pointer, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(pointer, os.path.join(out_dir, CURRENT_FILE))
+    return target
+
+class KnowledgeArtifact:
+    """
+    Read-only view of a knowledge artifact built by back.make_db.
+
+    The FAQ records, splits and BM25 state are small JSON files read on open. The
+    embedding matrices are memory-mapped read-only, so opening costs a few
+    milliseconds regardless of the corpus size and every process that opens the
+    same version shares its pages through the OS page cache.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open an artifact.
+
+        Args:
+            path (str): A version directory, or an output directory of write_artifact.
+
+        Raises:
+            FileNotFoundError: If the path holds no artifact.
+            ValueError: If the artifact has another format version or is inconsistent.
+        """
+        self.path = resolve_artifact(path)
+        with open(os.path.join(self.path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            self.manifest: Dict[str, Any] = json.load(f)
+        if self.manifest.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Versión de artefacto no soportada: {self.manifest.get('format_version')}")
+
+        self.faqs: List[Dict[str, str]] = self._read_json("faqs.json")
+        self.chunks: List[Dict[str, str]] = self._read_json("chunks.json")
+        self.lexical_state: Dict[str, Any] = self._read_json("lexical.json")
+        self.embeddings = np.load(os.path.join(self.path, "embeddings.npy"), mmap_mode="r")
+        self.questions = np.load(os.path.join(self.path, "questions.npy"), mmap_mode="r")
+        if self.embeddings.shape[0] != len(self.chunks) or self.questions.shape[0] != len(self.faqs):
+            raise ValueError(f"Artefacto inconsistente en {self.path}")
+
+    def _read_json(self, name: str) -> Any:
+        with open(os.path.join(self.path, name), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def verify(self):
+        """
+        Check every file against the hashes in the manifest (reads the whole artifact).
+
+        Raises:
+            ValueError: If a file was modified or the records do not match their hash.
+        """
+        for name, expected in self.manifest["files"].items():
+            if _file_sha256(os.path.join(self.path, name)) != expected:
+                raise ValueError(f"{name} no coincide con el manifiesto de {self.path}")
+        if corpus_digest(self.faqs) != self.manifest["source_sha256"]:
+            raise ValueError(f"Las FAQs no coinciden con el manifiesto de {self.path}")
@@ -0,0 +1,209 @@
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Palabras vacías frecuentes en las consultas, sin tildes
+STOPWORDS = frozenset("""
+a al algo como con cual cuales cuando de del donde e el ella en es esta este esto hay la las le les lo los
+me mi mis o para pero por puedo que se si sin su sus te tengo tu tus un una uno y ya yo
+""".split())
+
+def fold_text(text: str) -> str:
+    """
+    Lowercase a text and strip its accents.
+
+    Args:
+        text (str): Text to fold.
+
+    Returns:
+        str: The folded text.
+    """
+    decomposed = unicodedata.normalize("NFKD", (text or "").lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split a text into accent-folded word tokens, dropping stopwords.
+
+    Args:
+        text (str): Text to tokenize.
+
+    Returns:
+        List[str]: The tokens, in order.
+    """
+    return [token for token in re.findall(r"\w+", fold_text(text)) if token not in STOPWORDS]
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Merge several rankings by summing 1 / (k + rank) for each document.
+
+    Args:
+        rankings (Sequence[Sequence[str]]): Document IDs of each ranking, best first.
+        k (int): Rank offset that damps the weight of the top positions. Defaults to 60.
+
+    Returns:
+        List[Tuple[str, float]]: Document IDs with their fused score, best first.
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+class BM25Index:
+    """
+    In-memory BM25 inverted index with incremental updates.
+
+    Each term maps to the documents containing it and the term frequency, so a query
+    only touches the postings of its own terms. Documents carry an optional category
+    used as a pre-filter.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+        Initialize the BM25Index.
+
+        Args:
+            k1 (float): Term frequency saturation. Defaults to 1.5.
+            b (float): Document length normalization. Defaults to 0.75.
+        """
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._terms: Dict[str, List[str]] = {}
+        self._categories: Dict[str, str] = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def add(self, doc_id: str, text: str, category: str = ""):
+        """
+        Index a document, replacing it if the ID is already indexed.
+
+        Args:
+            doc_id (str): Document ID.
+            text (str): Text to index.
+            category (str): Document category. Defaults to "".
+        """
+        counts = Counter(tokenize(text))
+        with self._lock:
+            self.remove(doc_id)
+            for term, count in counts.items():
+                self._postings.setdefault(term, {})[doc_id] = count
+            self._terms[doc_id] = list(counts)
+            self._lengths[doc_id] = sum(counts.values())
+            self._categories[doc_id] = fold_text(category)
+            self._total_length += self._lengths[doc_id]
+
+    def remove(self, doc_id: str):
+        """
+        Remove a document from the index (no-op if it is not indexed).
+
+        Args:
+            doc_id (str): Document ID.
+        """
+        with self._lock:
+            for term in self._terms.pop(doc_id, []):
+                postings = self._postings[term]
+                del postings[doc_id]
+                if not postings:
+                    del self._postings[term]
+            self._total_length -= self._lengths.pop(doc_id, 0)
+            self._categories.pop(doc_id, None)
+
+    def export_state(self) -> Dict[str, Any]:
+        """
+        Get the index contents as JSON-serializable data.
+
+        Returns:
+            Dict[str, Any]: Parameters, postings, lengths and categories.
+        """
+        with self._lock:
+            return {
+                "k1": self.k1,
+                "b": self.b,
+                "postings": {term: dict(postings) for term, postings in self._postings.items()},
+                "lengths": dict(self._lengths),
+                "categories": dict(self._categories),
+            }
+
+    def load_state(self, state: Dict[str, Any]):
+        """
+        Replace the index contents with data from export_state().
+
+        Args:
+            state (Dict[str, Any]): The exported state.
+        """
+        terms: Dict[str, List[str]] = {doc_id: [] for doc_id in state["lengths"]}
+        for term, postings in state["postings"].items():
+            for doc_id in postings:
+                terms[doc_id].append(term)
+        with self._lock:
+            self.k1 = state["k1"]
+            self.b = state["b"]
+            self._postings = state["postings"]
+            self._lengths = state["lengths"]
+            self._terms = terms
+            self._categories = state["categories"]
+            self._total_length = sum(self._lengths.values())
+
+    def _idf(self, term: str) -> float:
+        frequency = len(self._postings.get(term, ()))
+        return math.log(1 + (len(self._lengths) - frequency + 0.5) / (frequency + 0.5))
+
+    def search(self, query: str, k: int = 3, category: Optional[str] = None) -> List[Tuple[str, float]]:
+        """
+        Rank the documents containing any of the query terms.
+
+        Args:
+            query (str): Search query.
+            k (int): Number of results. Defaults to 3.
+            category (Optional[str]): Only return documents of this category.
+
+        Returns:
+            List[Tuple[str, float]]: Document IDs with their BM25 score, best first.
+        """
+        terms = set(tokenize(query))
+        wanted = fold_text(category) if category else None
+        scores: Dict[str, float] = {}
+        with self._lock:
+            if not self._lengths:
+                return []
+            average_length = self._total_length / len(self._lengths)
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = self._idf(term)
+                for doc_id, count in postings.items():
+                    if wanted is not None and self._categories[doc_id] != wanted:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / average_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * count * (self.k1 + 1) / (count + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def confidence(self, query: str, results: List[Tuple[str, float]], min_margin: float = 2.0) -> float:
+        """
+        How clearly the top lexical result answers the query.
+
+        Args:
+            query (str): Search query.
+            results (List[Tuple[str, float]]): Results of search() for the query.
+            min_margin (float): Minimum ratio between the first and second scores;
+                below it the result is ambiguous. Defaults to 2.0.
+
+        Returns:
+            float: The top score relative to the best score the query terms could reach
+                (between 0 and 1), or 0 if there are no results or the top one is ambiguous.
+        """
+        if not results or (len(results) > 1 and results[0][1] < min_margin * results[1][1]):
+            return 0.0
+        with self._lock:
+            ceiling = sum(self._idf(term) * (self.k1 + 1) for term in set(tokenize(query)))
+        return min(results[0][1] / ceiling, 1.0) if ceiling else 0.0
+
+    def __len__(self) -> int:
+        return len(self._lengths)
@@ -1,40 +1,74 @@
+import argparse
 import os
-import json
-from pathlib import Path
-from langchain.schema import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.embeddings import OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma
+import sys
+import time
+from typing import Any, Optional
+
 from dotenv import load_dotenv
 
+from back.database_manager import FAQManager
+from back.knowledge_artifact import KnowledgeArtifact, embedding_model_name, write_artifact
+from back.response_cache import SemanticResponseCache
+
 load_dotenv()
 
-### Ingest code - you may need to run this the first time
+DEFAULT_ARTIFACT_DIR = "knowledge_artifact"
 
-# Load output from gpt crawler
-path_to_json = Path(__file__).parent.parent / "db_knowledge.json"
-data = json.loads(Path(path_to_json).read_text())
-data = data["faq"]
-docs = [
-    Document(
-        page_content=dict_["question"],
-        metadata={"answer": dict_["answer"]},
-    )
-    for dict_ in data
-]
+def build_artifact(json_file: str, out_dir: str, embeddings: Optional[Any] = None) -> str:
+    """
+    Embed a knowledge file and write it as a new knowledge artifact version.
 
-embedding_model = OpenAIEmbeddings(openai_api_key=os.getenv("OPENAI_API_KEY"))
+    The index is built by the same FAQManager that serves the searches (numpy
+    backend), so the splits, vectors and BM25 state match what a server would build.
+
+    Args:
+        json_file (str): Path to the JSON file containing FAQ data.
+        out_dir (str): Output directory of the artifact versions.
+        embeddings (Optional[Any]): Embedding model. Defaults to the FAQManager one.
+
+    Returns:
+        str: The version directory.
+    """
+    manager = FAQManager(json_file, embeddings=embeddings, backend="numpy", artifact_dir="", response_cache=SemanticResponseCache(max_entries=0))
+    store = manager.knowledge_db
+    faqs = list(manager.faqs.values())
+    chunks = [{"id": doc_id, "faq_id": doc.metadata["faq_id"], "text": doc.page_content} for doc_id, doc in zip(store.ids, store.documents)]
+    return write_artifact(
+        out_dir,
+        faqs,
+        chunks,
+        store.matrix[:store.size],
+        manager.question_vectors(faqs),
+        manager.lexical_index.export_state(),
+        embedding_model_name(manager.embeddings),
+    )
 
-# Split
-text_splitter = RecursiveCharacterTextSplitter(chunk_size=1800, chunk_overlap=100)
-all_splits = text_splitter.split_documents(docs)
+def main():
+    """
+    Build the knowledge artifact, or verify the current one.
+    """
+    parser = argparse.ArgumentParser(description="Build the knowledge artifact loaded by FAQManager")
+    parser.add_argument("json_file", nargs="?", default="db_knowledge.json", help="Knowledge file (default: db_knowledge.json)")
+    parser.add_argument("--out", default=os.getenv("FAQ_ARTIFACT_DIR") or DEFAULT_ARTIFACT_DIR, help=f"Output directory (default: FAQ_ARTIFACT_DIR or {DEFAULT_ARTIFACT_DIR})")
+    parser.add_argument("--verify", action="store_true", help="Check the current artifact against its manifest instead of building one")
+    args = parser.parse_args()
 
+    if args.verify:
+        try:
+            artifact = KnowledgeArtifact(args.out)
+            artifact.verify()
+        except (OSError, ValueError) as e:
+            print(f"Artefacto inválido: {e}")
+            sys.exit(1)
+        print(f"Artefacto {artifact.path} válido ({artifact.manifest['artifact_sha256']})")
+        return
 
-vectorstore = Chroma.from_documents(
-    documents=docs,
-    collection_name="rag-faq",
-    embedding=embedding_model
-)
+    if not os.path.exists(args.json_file):
+        parser.error(f"No existe el archivo {args.json_file}")
+    started = time.perf_counter()
+    artifact = KnowledgeArtifact(build_artifact(args.json_file, args.out))
+    manifest = artifact.manifest
+    print(f"Artefacto {artifact.path}: {manifest['faqs']} FAQs, {manifest['chunks']} divisiones, modelo {manifest['model']} ({time.perf_counter() - started:.1f} s)")
 
-print("DB Done!")
-retriever = vectorstore.as_retriever(search_kwargs={"5": 10})
\ No newline at end of file
+if __name__ == "__main__":
+    main()
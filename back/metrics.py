@@ -0,0 +1,215 @@
+import bisect
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Límites (segundos) de los buckets de latencia
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+DESCRIPTIONS = {
+    "chat_stage_duration_seconds": "Duration of each stage of the chat pipeline.",
+    "chat_turns_total": "Chat turns by the path that answered them.",
+    "chat_tokens_total": "Estimated prompt and completion tokens sent to and received from the chat model.",
+    "cache_requests_total": "Cache lookups by cache and result.",
+    "provider_requests_total": "Requests to the model provider by endpoint and final status.",
+    "provider_retries_total": "Retried provider requests by endpoint and reason.",
+    "provider_request_duration_seconds": "Provider request duration until the response headers, retries included.",
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _labels(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def _format_labels(labels: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+class MetricsRegistry:
+    """
+    Process-wide counters and latency histograms, rendered in the Prometheus text
+    exposition format.
+
+    Updates take one lock and a few dictionary operations, so they are cheap enough
+    to leave on in production. Collectors add gauges computed at scrape time from
+    the stats() of other components (pool, caches).
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        """
+        Initialize the MetricsRegistry.
+
+        Args:
+            buckets (Tuple[float, ...]): Upper bounds of the histogram buckets, in seconds.
+        """
+        self.buckets = buckets
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, List[float]]] = {}
+        self._collectors: List[Tuple[str, Callable[[], Dict[str, Any]]]] = []
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any):
+        """
+        Increase a counter.
+
+        Args:
+            name (str): Metric name.
+            value (float): Amount to add. Defaults to 1.
+            **labels: Label values.
+        """
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, seconds: float, **labels: Any):
+        """
+        Record a duration in a histogram.
+
+        Args:
+            name (str): Metric name.
+            seconds (float): Observed duration.
+            **labels: Label values.
+        """
+        key = _labels(labels)
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            # Conteos por bucket (no acumulados), y al final suma y total
+            values = series.get(key)
+            if values is None:
+                values = series[key] = [0.0] * (len(self.buckets) + 3)
+            values[index] += 1
+            values[-2] += seconds
+            values[-1] += 1
+
+    def register_collector(self, prefix: str, collect: Callable[[], Dict[str, Any]]):
+        """
+        Export the numeric values of a stats() function as gauges named '<prefix>_<key>'.
+
+        Args:
+            prefix (str): Metric name prefix.
+            collect (Callable[[], Dict[str, Any]]): Returns the current stats.
+        """
+        with self._lock:
+            self._collectors = [(p, c) for p, c in self._collectors if p != prefix] + [(prefix, collect)]
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: The exposition text.
+        """
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {name: {key: list(values) for key, values in series.items()} for name, series in self._histograms.items()}
+            collectors = list(self._collectors)
+
+        lines = []
+        for name, series in sorted(counters.items()):
+            lines += [f"# HELP {name} {DESCRIPTIONS.get(name, name)}", f"# TYPE {name} counter"]
+            lines += [f"{name}{_format_labels(key)} {value}" for key, value in sorted(series.items())]
+        for name, series in sorted(histograms.items()):
+            lines += [f"# HELP {name} {DESCRIPTIONS.get(name, name)}", f"# TYPE {name} histogram"]
+            for key, values in sorted(series.items()):
+                cumulative = 0.0
+                for bound, count in zip(self.buckets, values):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', repr(bound)))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(key, ('le', '+Inf'))} {values[-1]}")
+                lines.append(f"{name}_sum{_format_labels(key)} {values[-2]}")
+                lines.append(f"{name}_count{_format_labels(key)} {values[-1]}")
+        for prefix, collect in collectors:
+            try:
+                stats = collect()
+            except Exception as e:
+                print(f"Error al recolectar métricas de {prefix}: {e}")
+                continue
+            for key, value in sorted(stats.items()):
+                if isinstance(value, (int, float)):
+                    lines += [f"# TYPE {prefix}_{key} gauge", f"{prefix}_{key} {float(value)}"]
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """
+        Drop every recorded counter and histogram (collectors are kept).
+        """
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+metrics = MetricsRegistry()
+
+_trace: contextvars.ContextVar = contextvars.ContextVar("trace", default=None)
+_parent: contextvars.ContextVar = contextvars.ContextVar("span_parent", default=None)
+_trace_lock = threading.Lock()
+
+def _write_trace(trace: Dict[str, Any]):
+    """
+    Append a finished trace as one JSON line to TRACE_LOG_FILE ("-" for stderr).
+    """
+    destination = os.getenv("TRACE_LOG_FILE")
+    line = json.dumps(trace, ensure_ascii=False, default=str)
+    with _trace_lock:
+        if destination == "-":
+            print(line, file=sys.stderr)
+        else:
+            with open(destination, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+@contextmanager
+def span(stage: str, **attributes: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Time a stage of the chat pipeline.
+
+    The duration goes to the 'chat_stage_duration_seconds' histogram. If TRACE_LOG_FILE
+    is set, the outermost span also collects every nested span (including those run
+    in worker threads with a copied context) and writes them as one JSON trace line.
+
+    Args:
+        stage (str): Stage name, e.g. "faq.search".
+        **attributes: Attributes recorded in the trace.
+
+    Yields:
+        Dict[str, Any]: The span record; callers can add attributes to it.
+    """
+    trace = _trace.get()
+    trace_token = None
+    if trace is None and os.getenv("TRACE_LOG_FILE"):
+        trace = {"trace_id": uuid.uuid4().hex, "root": stage, "started_at": time.time(), "t0": time.perf_counter(), "spans": []}
+        trace_token = _trace.set(trace)
+    record = {"stage": stage, **attributes}
+    parent_token = _parent.set(stage)
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException:
+        record["error"] = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        _parent.reset(parent_token)
+        metrics.observe("chat_stage_duration_seconds", elapsed, stage=stage)
+        if trace is not None:
+            record["parent"] = _parent.get()
+            record["start_ms"] = round((start - trace["t0"]) * 1000, 3)
+            record["duration_ms"] = round(elapsed * 1000, 3)
+            trace["spans"].append(record)
+        if trace_token is not None:
+            _trace.reset(trace_token)
+            trace.pop("t0")
+            trace["duration_ms"] = record["duration_ms"]
+            try:
+                _write_trace(trace)
+            except OSError as e:
+                print(f"Error al escribir la traza: {e}")
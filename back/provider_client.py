@@ -0,0 +1,315 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import httpx
+
+from back.metrics import metrics
+
+# Respuestas que vale la pena reintentar (las mismas que reintenta el SDK de OpenAI)
+RETRY_STATUSES = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+# Errores de transporte reintentables; RemoteProtocolError aparece cuando el proveedor cierra una conexión keep-alive inactiva
+RETRY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.ReadTimeout, httpx.RemoteProtocolError, httpx.PoolTimeout)
+
+class FinishedStreamDrain(httpx.SyncByteStream):
+    """
+    Event-stream body that returns its connection to the pool once the stream ended.
+
+    The OpenAI SDK closes a streamed response as soon as it reads the `[DONE]` event,
+    before the end of the chunked body, and httpcore then drops the connection
+    instead of reusing it. If the last bytes read are the `[DONE]` event, close()
+    reads the few bytes left first.
+    """
+
+    def __init__(self, stream: httpx.SyncByteStream):
+        self._stream = stream
+        self._chunks = None
+        self._tail = b""
+
+    def __iter__(self):
+        if self._chunks is None:
+            self._chunks = iter(self._stream)
+        for chunk in self._chunks:
+            self._tail = (self._tail + chunk)[-16:]
+            yield chunk
+
+    def close(self):
+        if self._chunks is not None and self._tail.rstrip().endswith(b"[DONE]"):
+            try:
+                for _ in self._chunks:
+                    pass
+            except httpx.HTTPError:
+                pass  # La conexión se cierra igual
+        self._stream.close()
+
+class RetryingTransport(httpx.BaseTransport):
+    """
+    Pooled HTTP transport with a retry/backoff policy and pool metrics.
+
+    Wraps one httpx.HTTPTransport, so every request shares its keep-alive
+    connections. Connection errors and retryable statuses are retried up to
+    `max_retries` times, waiting `backoff * 2**attempt` seconds (with jitter, capped
+    at `max_backoff`) or the provider's Retry-After. Connection setups and TLS
+    handshakes are counted through the httpcore trace extension, and finished
+    event streams are drained so that streamed completions reuse their connection.
+    """
+
+    def __init__(self, limits: httpx.Limits, max_retries: int = 2, backoff: float = 0.5, max_backoff: float = 8.0):
+        """
+        Initialize the RetryingTransport.
+
+        Args:
+            limits (httpx.Limits): Connection pool limits.
+            max_retries (int): Retries after the first attempt. Defaults to 2.
+            backoff (float): Base delay in seconds. Defaults to 0.5.
+            max_backoff (float): Longest delay in seconds. Defaults to 8.
+        """
+        self.limits = limits
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._transport = httpx.HTTPTransport(limits=limits)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+        self._latencies: Deque[float] = deque(maxlen=1000)
+
+    def _trace(self, event: str, info: Dict[str, Any]):
+        if event == "connection.connect_tcp.complete":
+            with self._lock:
+                self.connections_opened += 1
+        elif event == "connection.start_tls.complete":
+            with self._lock:
+                self.tls_handshakes += 1
+
+    def _delay(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass  # Fecha HTTP: se usa el backoff normal
+        return min(self.backoff * 2 ** attempt, self.max_backoff) * random.uniform(0.5, 1.0)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        endpoint = request.url.path.rsplit("/v1/", 1)[-1]
+        parent_trace = request.extensions.get("trace")
+
+        def trace(event: str, info: Dict[str, Any]):
+            self._trace(event, info)
+            if parent_trace is not None:
+                parent_trace(event, info)
+
+        request.extensions["trace"] = trace
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        started = time.perf_counter()
+        try:
+            for attempt in range(self.max_retries + 1):
+                response, reason = None, None
+                try:
+                    response = self._transport.handle_request(request)
+                    if response.status_code not in RETRY_STATUSES:
+                        break
+                    reason = str(response.status_code)
+                except RETRY_ERRORS as e:
+                    reason = type(e).__name__
+                    if attempt == self.max_retries:
+                        raise
+                if attempt == self.max_retries:
+                    break
+                delay = self._delay(attempt, response)
+                if response is not None:
+                    response.close()
+                with self._lock:
+                    self.retries += 1
+                metrics.inc("provider_retries_total", endpoint=endpoint, reason=reason)
+                time.sleep(delay)
+            metrics.inc("provider_requests_total", endpoint=endpoint, status=response.status_code)
+            if response.headers.get("content-type", "").startswith("text/event-stream"):
+                response = httpx.Response(response.status_code, headers=response.headers, stream=FinishedStreamDrain(response.stream), extensions=response.extensions)
+            return response
+        except Exception:
+            with self._lock:
+                self.failures += 1
+            metrics.inc("provider_requests_total", endpoint=endpoint, status="error")
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.observe("provider_request_duration_seconds", elapsed, endpoint=endpoint)
+            with self._lock:
+                self.in_flight -= 1
+                self._latencies.append(elapsed)
+
+    def close(self):
+        self._transport.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get request, retry and connection pool metrics.
+
+        Returns:
+            Dict[str, Any]: Transport metrics. 'utilization' is the fraction of
+                `max_connections` busy with a request.
+        """
+        # httpx no expone el pool: se leen las conexiones de httpcore
+        pool = getattr(self._transport, "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+        with self._lock:
+            latencies = sorted(self._latencies)
+
+            def latency_ms(q: float) -> float:
+                return latencies[min(len(latencies) - 1, round(q * (len(latencies) - 1)))] * 1000 if latencies else 0.0
+
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "failures": self.failures,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "max_connections": self.limits.max_connections,
+                "utilization": self.in_flight / self.limits.max_connections if self.limits.max_connections else 0.0,
+                "connections_open": len(connections),
+                "connections_idle": sum(1 for connection in connections if connection.is_idle()),
+                "connections_opened": self.connections_opened,
+                "tls_handshakes": self.tls_handshakes,
+                "request_p50_ms": latency_ms(0.5),
+                "request_p99_ms": latency_ms(0.99),
+            }
+
+class ProviderClient:
+    """
+    OpenAI client over one tuned keep-alive connection pool.
+
+    Chat completions (Swarm, the context summarizer) and embeddings share the same
+    `openai` client, so a process opens and handshakes a connection once and keeps
+    reusing it. Retries are done by the transport, not by the SDK, so the same
+    policy applies to every call.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        max_connections: int = 64,
+        max_keepalive_connections: int = 32,
+        keepalive_expiry: float = 60.0,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 60.0,
+        max_retries: int = 2,
+        backoff: float = 0.5,
+        max_backoff: float = 8.0,
+    ):
+        """
+        Initialize the ProviderClient.
+
+        Args:
+            api_key (Optional[str]): Provider API key. Defaults to OPENAI_API_KEY.
+            base_url (Optional[str]): Provider URL. Defaults to OPENAI_BASE_URL or the OpenAI API.
+            max_connections (int): Maximum open connections. Defaults to 64.
+            max_keepalive_connections (int): Idle connections kept open. Defaults to 32.
+            keepalive_expiry (float): Seconds an idle connection is kept. Defaults to 60.
+            connect_timeout (float): Seconds to open a connection. Defaults to 5.
+            read_timeout (float): Seconds to wait for response data. Defaults to 60.
+            max_retries (int): Retries after the first attempt. Defaults to 2.
+            backoff (float): Base retry delay in seconds. Defaults to 0.5.
+            max_backoff (float): Longest retry delay in seconds. Defaults to 8.
+        """
+        from openai import OpenAI
+
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections, keepalive_expiry=keepalive_expiry)
+        timeout = httpx.Timeout(read_timeout, connect=connect_timeout, pool=connect_timeout)
+        self.transport = RetryingTransport(limits, max_retries=max_retries, backoff=backoff, max_backoff=max_backoff)
+        self.http = httpx.Client(transport=self.transport, timeout=timeout)
+        self.openai = OpenAI(api_key=api_key, base_url=base_url, http_client=self.http, timeout=timeout, max_retries=0)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get request, retry and connection pool metrics.
+
+        Returns:
+            Dict[str, Any]: Transport metrics.
+        """
+        return self.transport.stats()
+
+    def close(self):
+        """
+        Close the pooled connections.
+        """
+        self.http.close()
+
+_clients: Dict[Tuple[Optional[str], Optional[str]], ProviderClient] = {}
+_clients_lock = threading.Lock()
+
+def get_provider_client() -> ProviderClient:
+    """
+    Get the process-wide provider client for the current OPENAI_API_KEY and
+    OPENAI_BASE_URL, creating it on first use.
+
+    The pool is configured by PROVIDER_MAX_CONNECTIONS (default: 64),
+    PROVIDER_MAX_KEEPALIVE_CONNECTIONS (default: 32), PROVIDER_KEEPALIVE_EXPIRY
+    (default: 60), PROVIDER_CONNECT_TIMEOUT (default: 5), PROVIDER_READ_TIMEOUT
+    (default: 60), PROVIDER_MAX_RETRIES (default: 2), PROVIDER_RETRY_BACKOFF
+    (default: 0.5) and PROVIDER_RETRY_MAX_BACKOFF (default: 8).
+
+    Returns:
+        ProviderClient: The shared client.
+    """
+    key = (os.getenv("OPENAI_API_KEY"), os.getenv("OPENAI_BASE_URL"))
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = ProviderClient(
+                api_key=key[0],
+                base_url=key[1],
+                max_connections=int(os.getenv("PROVIDER_MAX_CONNECTIONS", "64")),
+                max_keepalive_connections=int(os.getenv("PROVIDER_MAX_KEEPALIVE_CONNECTIONS", "32")),
+                keepalive_expiry=float(os.getenv("PROVIDER_KEEPALIVE_EXPIRY", "60")),
+                connect_timeout=float(os.getenv("PROVIDER_CONNECT_TIMEOUT", "5")),
+                read_timeout=float(os.getenv("PROVIDER_READ_TIMEOUT", "60")),
+                max_retries=int(os.getenv("PROVIDER_MAX_RETRIES", "2")),
+                backoff=float(os.getenv("PROVIDER_RETRY_BACKOFF", "0.5")),
+                max_backoff=float(os.getenv("PROVIDER_RETRY_MAX_BACKOFF", "8")),
+            )
+        return client
+
+def provider_stats() -> Dict[str, Any]:
+    """
+    Get the metrics of every provider client, added together.
+
+    Returns:
+        Dict[str, Any]: Transport metrics, plus the number of 'clients'.
+    """
+    with _clients_lock:
+        clients = list(_clients.values())
+    totals: Dict[str, Any] = {"clients": len(clients)}
+    for client in clients:
+        for key, value in client.stats().items():
+            if key.startswith("request_p"):
+                totals[key] = max(totals.get(key, 0.0), value)
+            else:
+                totals[key] = totals.get(key, 0) + value
+    if totals.get("max_connections"):
+        totals["utilization"] = totals["in_flight"] / totals["max_connections"]
+    return totals
+
+def close_provider_clients():
+    """
+    Close every provider client (at shutdown).
+    """
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
@@ -0,0 +1,155 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from back.embedding_cache import normalize_text
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a user query for exact-match lookups (case folded, without surrounding
+    punctuation such as '¿' or '?').
+
+    Args:
+        query (str): User query.
+
+    Returns:
+        str: The normalized query.
+    """
+    return normalize_text(query).casefold().strip("¿?¡!.,;: ")
+
+class QueryCache:
+    """
+    Two-tier cache in front of FAQManager.search_faq.
+
+    The first tier maps a normalized query and k to the stored top-k results and is
+    invalidated whenever the FAQ corpus changes. The second tier is an LRU of query
+    embeddings with a TTL; embeddings do not depend on the corpus, so it survives
+    corpus changes and only saves the provider call.
+    """
+
+    def __init__(self, max_results: int = 1024, max_embeddings: int = 4096, embedding_ttl: float = 3600.0):
+        """
+        Initialize the QueryCache.
+
+        Args:
+            max_results (int): Maximum number of cached result lists. Defaults to 1024.
+            max_embeddings (int): Maximum number of cached query embeddings. Defaults to 4096.
+            embedding_ttl (float): Seconds a query embedding stays valid. Defaults to 3600.
+        """
+        self.max_results = max_results
+        self.max_embeddings = max_embeddings
+        self.embedding_ttl = embedding_ttl
+        self._results: "OrderedDict[Tuple[str, int, Optional[str]], List[Dict[str, Any]]]" = OrderedDict()
+        self._embeddings: "OrderedDict[str, Tuple[List[float], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.result_hits = 0
+        self.embedding_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get_results(self, query: str, k: int, category: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Look up stored results for a query (first tier).
+
+        Args:
+            query (str): User query.
+            k (int): Number of results requested.
+            category (Optional[str]): Category filter of the search, if any.
+
+        Returns:
+            Optional[List[Dict[str, Any]]]: A copy of the stored results, or None.
+        """
+        key = (normalize_query(query), k, category)
+        with self._lock:
+            results = self._results.get(key)
+            if results is None:
+                return None
+            self._results.move_to_end(key)
+            self.result_hits += 1
+            return [dict(result) for result in results]
+
+    def put_results(self, query: str, k: int, results: List[Dict[str, Any]], category: Optional[str] = None):
+        """
+        Store the results for a query (first tier).
+
+        Args:
+            query (str): User query.
+            k (int): Number of results requested.
+            results (List[Dict[str, Any]]): Results returned by the search.
+            category (Optional[str]): Category filter of the search, if any.
+        """
+        key = (normalize_query(query), k, category)
+        with self._lock:
+            self._results[key] = [dict(result) for result in results]
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+
+    def get_embedding(self, query: str) -> Optional[List[float]]:
+        """
+        Look up the embedding of a query (second tier).
+
+        Args:
+            query (str): User query.
+
+        Returns:
+            Optional[List[float]]: The cached embedding, or None if missing or expired.
+        """
+        key = normalize_text(query)
+        with self._lock:
+            entry = self._embeddings.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                self._embeddings.pop(key, None)
+                self.misses += 1
+                return None
+            self._embeddings.move_to_end(key)
+            self.embedding_hits += 1
+            return entry[0]
+
+    def put_embedding(self, query: str, embedding: List[float]):
+        """
+        Store the embedding of a query (second tier).
+
+        Args:
+            query (str): User query.
+            embedding (List[float]): The query embedding.
+        """
+        key = normalize_text(query)
+        with self._lock:
+            self._embeddings[key] = (embedding, time.monotonic() + self.embedding_ttl)
+            self._embeddings.move_to_end(key)
+            while len(self._embeddings) > self.max_embeddings:
+                self._embeddings.popitem(last=False)
+
+    def invalidate(self):
+        """
+        Drop every stored result list after a change in the FAQ corpus.
+        """
+        with self._lock:
+            self._results.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get hit-rate counters and the provider calls saved per hour.
+
+        Returns:
+            Dict[str, Any]: Cache counters.
+        """
+        with self._lock:
+            lookups = self.result_hits + self.embedding_hits + self.misses
+            saved = self.result_hits + self.embedding_hits
+            hours = max((time.time() - self.started_at) / 3600, 1e-9)
+            return {
+                "result_hits": self.result_hits,
+                "embedding_hits": self.embedding_hits,
+                "misses": self.misses,
+                "hit_rate": saved / lookups if lookups else 0.0,
+                "provider_calls_saved": saved,
+                "provider_calls_saved_per_hour": saved / hours,
+                "invalidations": self.invalidations,
+                "cached_results": len(self._results),
+                "cached_embeddings": len(self._embeddings),
+            }
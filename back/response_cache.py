@@ -0,0 +1,171 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from back.query_cache import normalize_query
+
+class SemanticResponseCache:
+    """
+    Cache of agent answers shared across sessions, looked up by meaning.
+
+    An entry is keyed by the agent that answered and the IDs of the FAQs retrieved
+    for the query, and holds the normalized query and, when the retrieval embedded
+    it, its L2-normalized embedding. A lookup only considers entries with the same
+    agent and FAQ IDs: the same normalized query always matches, and with an
+    embedding the nearest entry matches if its cosine similarity reaches
+    `min_similarity`, so paraphrases of a question already answered skip the LLM.
+    Queries the lexical search answered on its own are looked up without embedding. Entries expire after `ttl` seconds,
+    the least recently used entry is evicted past `max_entries`, and everything is
+    dropped when the FAQ corpus changes.
+    """
+
+    def __init__(self, max_entries: int = 2048, ttl: float = 24 * 3600.0, min_similarity: float = 0.95):
+        """
+        Initialize the SemanticResponseCache.
+
+        Args:
+            max_entries (int): Maximum number of cached answers (0 disables the cache).
+                Defaults to 2048.
+            ttl (float): Seconds an answer stays valid. Defaults to 24 hours.
+            min_similarity (float): Lowest query cosine similarity served from the cache.
+                Defaults to 0.95.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.min_similarity = min_similarity
+        # Orden LRU de las entradas, y por clave (agente, IDs de FAQ) sus (consulta, embedding o None, respuesta, expira, latencia)
+        self._order: "OrderedDict[int, Tuple[str, Tuple[str, ...]]]" = OrderedDict()
+        self._buckets: Dict[Tuple[str, Tuple[str, ...]], Dict[int, Tuple[str, Optional[np.ndarray], str, float, float]]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.seconds_saved = 0.0
+        self._lookups: Deque[float] = deque(maxlen=1000)
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _remove(self, entry_id: int):
+        key = self._order.pop(entry_id)
+        bucket = self._buckets[key]
+        del bucket[entry_id]
+        if not bucket:
+            del self._buckets[key]
+
+    def get(self, query: str, embedding: Optional[Sequence[float]], agent: str, faq_ids: Sequence[str]) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached answer for a query.
+
+        Args:
+            query (str): The query.
+            embedding (Optional[Sequence[float]]): Embedding of the query, or None to
+                match the same normalized query only.
+            agent (str): Name of the agent that would answer.
+            faq_ids (Sequence[str]): IDs of the FAQs retrieved for the query.
+
+        Returns:
+            Optional[Dict[str, Any]]: The cached 'answer' with its 'similarity', or None.
+        """
+        if self.max_entries <= 0:
+            return None
+        started = time.perf_counter()
+        key = (agent, tuple(sorted(faq_ids)))
+        query_key = normalize_query(query)
+        query_vector = self._normalize(embedding) if embedding is not None else None
+        now = time.monotonic()
+        with self._lock:
+            best_id, best_similarity = None, self.min_similarity
+            for entry_id, (entry_query, vector, _, expires, _) in list(self._buckets.get(key, {}).items()):
+                if expires < now:
+                    self._remove(entry_id)
+                    self.expirations += 1
+                    continue
+                if entry_query == query_key:
+                    similarity = 1.0
+                elif query_vector is not None and vector is not None:
+                    similarity = float(vector @ query_vector)
+                else:
+                    continue
+                if similarity >= best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+            if best_id is None:
+                self.misses += 1
+                match = None
+            else:
+                self._order.move_to_end(best_id)
+                _, _, answer, _, latency = self._buckets[key][best_id]
+                self.hits += 1
+                self.seconds_saved += latency
+                match = {"answer": answer, "similarity": best_similarity}
+            self._lookups.append(time.perf_counter() - started)
+            return match
+
+    def put(self, query: str, embedding: Optional[Sequence[float]], agent: str, faq_ids: Sequence[str], answer: str, latency: float = 0.0):
+        """
+        Store an answer produced by the agents.
+
+        Args:
+            query (str): The query.
+            embedding (Optional[Sequence[float]]): Embedding of the query, or None if
+                the retrieval did not embed it.
+            agent (str): Name of the agent that answered.
+            faq_ids (Sequence[str]): IDs of the FAQs retrieved for the query.
+            answer (str): The answer.
+            latency (float): Seconds the agents took to answer, counted as saved on each hit.
+        """
+        if self.max_entries <= 0 or not answer:
+            return
+        key = (agent, tuple(sorted(faq_ids)))
+        with self._lock:
+            self._order[self._next_id] = key
+            vector = self._normalize(embedding) if embedding is not None else None
+            self._buckets.setdefault(key, {})[self._next_id] = (normalize_query(query), vector, answer, time.monotonic() + self.ttl, latency)
+            self._next_id += 1
+            while len(self._order) > self.max_entries:
+                self._remove(next(iter(self._order)))
+                self.evictions += 1
+
+    def invalidate(self):
+        """
+        Drop every cached answer after a change in the FAQ corpus.
+        """
+        with self._lock:
+            self._order.clear()
+            self._buckets.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get hit-rate, eviction and lookup latency metrics.
+
+        Returns:
+            Dict[str, Any]: Cache metrics.
+        """
+        with self._lock:
+            lookups = sorted(self._lookups)
+            total = self.hits + self.misses
+
+            def lookup_ms(q: float) -> float:
+                return lookups[min(len(lookups) - 1, round(q * (len(lookups) - 1)))] * 1000 if lookups else 0.0
+
+            return {
+                "entries": len(self._order),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "seconds_saved": self.seconds_saved,
+                "lookup_p50_ms": lookup_ms(0.5),
+                "lookup_p99_ms": lookup_ms(0.99),
+            }
@@ -0,0 +1,144 @@
+import base64
+import binascii
+import json
+from typing import Any, Dict, List, Optional
+
+from pymongo import ASCENDING, DESCENDING
+
+# Orden del listado: más recientes primero, con el ID como desempate
+SORT = [("createdAt", DESCENDING), ("id", DESCENDING)]
+
+# Resumen del ticket: sin la conversación embebida (solo se lee su primer mensaje)
+SUMMARY_PROJECTION = {"_id": 0, "id": 1, "user_data.name": 1, "createdAt": 1, "resolved": 1, "description": 1, "conversation": {"$slice": 1}}
+
+def encode_cursor(ticket: Dict[str, Any]) -> str:
+    """
+    Build the opaque cursor that resumes a listing after a ticket.
+
+    Args:
+        ticket (Dict[str, Any]): Last ticket of a page, with 'createdAt' and 'id'.
+
+    Returns:
+        str: URL-safe cursor.
+    """
+    raw = json.dumps([ticket.get("createdAt", ""), ticket["id"]]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> List[str]:
+    """
+    Parse a cursor built by encode_cursor.
+
+    Args:
+        cursor (str): The cursor.
+
+    Returns:
+        List[str]: The 'createdAt' and 'id' of the last ticket of the previous page.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, ticket_id = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(created_at, str) or not isinstance(ticket_id, str):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return [created_at, ticket_id]
+
+class TicketListing:
+    """
+    Paginated, server-sorted listing of the dashboard tickets in MongoDB.
+
+    Pages are ordered by (createdAt, id) descending and continue from a cursor with
+    the sort key of the last ticket returned (keyset pagination), so every page is an
+    index range scan regardless of how deep it is. The listing projects a summary
+    without the conversation; the full conversation of one ticket is read on demand
+    from the transcript in its document (or from the ConversationStore for tickets
+    stored without one).
+    """
+
+    def __init__(self, collection: Any, conversation_store: Any = None, create_indexes: bool = True):
+        """
+        Initialize the TicketListing.
+
+        Args:
+            collection (Any): Tickets collection.
+            conversation_store (Any): ConversationStore with the messages of tickets
+                whose document has no transcript. Without it, only the transcripts
+                embedded in the ticket documents are read.
+            create_indexes (bool): Create the indexes now; pass False to defer the
+                database round-trips and call create_indexes() later. Defaults to True.
+        """
+        self.collection = collection
+        self.conversation_store = conversation_store
+        if create_indexes:
+            self.create_indexes()
+
+    def create_indexes(self):
+        """
+        Create the listing indexes (idempotent): (resolved, createdAt, id) for the
+        filtered listing and (createdAt, id) for the unfiltered one.
+        """
+        self.collection.create_index([("resolved", ASCENDING), ("createdAt", DESCENDING), ("id", DESCENDING)])
+        self.collection.create_index([("createdAt", DESCENDING), ("id", DESCENDING)])
+
+    @staticmethod
+    def _summary(ticket: Dict[str, Any]) -> Dict[str, Any]:
+        conversation = ticket.get("conversation") or []
+        return {
+            "id": str(ticket["id"]),
+            "title": f"Consulta de {ticket.get('user_data', {}).get('name', '')}",
+            "description": ticket.get("description") or (conversation[0]["content"] if conversation else "Sin descripción"),
+            "createdAt": str(ticket.get("createdAt", "Fecha no disponible")),
+            "resolved": bool(ticket.get("resolved", False)),
+        }
+
+    def list_page(self, resolved: Optional[bool] = None, cursor: Optional[str] = None, limit: int = 50) -> Dict[str, Any]:
+        """
+        Get one page of ticket summaries, most recent first.
+
+        Args:
+            resolved (Optional[bool]): Only list resolved (True) or open (False) tickets.
+                Defaults to all.
+            cursor (Optional[str]): 'next_cursor' of the previous page. Defaults to the
+                first page.
+            limit (int): Page size. Defaults to 50.
+
+        Returns:
+            Dict[str, Any]: The 'tickets' of the page and the 'next_cursor' of the next
+                one (None on the last page).
+
+        Raises:
+            ValueError: If the cursor is malformed.
+        """
+        query: Dict[str, Any] = {}
+        if resolved is not None:
+            query["resolved"] = resolved
+        if cursor:
+            created_at, ticket_id = decode_cursor(cursor)
+            query["$or"] = [
+                {"createdAt": {"$lt": created_at}},
+                {"createdAt": created_at, "id": {"$lt": ticket_id}},
+            ]
+        # Un documento extra indica si hay otra página
+        tickets = list(self.collection.find(query, SUMMARY_PROJECTION).sort(SORT).limit(limit + 1))
+        next_cursor = encode_cursor(tickets[limit - 1]) if len(tickets) > limit else None
+        return {"tickets": [self._summary(ticket) for ticket in tickets[:limit]], "next_cursor": next_cursor}
+
+    def get_conversation(self, ticket_id: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get the full conversation of one ticket.
+
+        Args:
+            ticket_id (str): Ticket ID.
+
+        Returns:
+            Optional[List[Dict[str, Any]]]: The messages, or None if the ticket does not exist.
+        """
+        ticket = self.collection.find_one({"id": ticket_id}, {"_id": 0, "conversation": 1})
+        if ticket is None:
+            return None
+        if ticket.get("conversation") or self.conversation_store is None:
+            return ticket.get("conversation", [])
+        return self.conversation_store.get_messages(ticket_id)
@@ -0,0 +1,339 @@
+import shutil
+import tempfile
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Type
+
+import numpy as np
+
+from back.lexical_index import fold_text
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+class ChromaVectorStore:
+    """
+    Vector store backed by a Chroma collection in a temporary directory.
+
+    Scores are Chroma's default squared L2 distances (lower is better).
+    """
+
+    def __init__(self, embeddings: Any):
+        """
+        Initialize the ChromaVectorStore.
+
+        Args:
+            embeddings (Any): Embedding model used to embed documents.
+        """
+        # Importación diferida: Chroma solo se carga si se usa este backend
+        from langchain_community.vectorstores import Chroma
+
+        self.embeddings = embeddings
+        self.persist_directory = tempfile.mkdtemp()  # Crear un directorio temporal
+        self.db = Chroma(
+            collection_name="faq-collection",
+            embedding_function=self.embeddings,
+            persist_directory=self.persist_directory,  # Where to save data locally, remove if not necessary
+        )
+
+    def add_documents(self, documents: List["Document"], ids: List[str]):
+        """
+        Embed and add documents to the store.
+
+        Args:
+            documents (List[Document]): Documents to add.
+            ids (List[str]): One unique ID per document.
+        """
+        self.db.add_documents(documents=documents, ids=ids)
+
+    def add_embedded(self, documents: List["Document"], ids: List[str], vectors: np.ndarray):
+        """
+        Add documents with precomputed embeddings (copied into the collection).
+
+        Args:
+            documents (List[Document]): Documents to add.
+            ids (List[str]): One unique ID per document.
+            vectors (np.ndarray): One embedding per document.
+        """
+        if documents:
+            self.db._collection.upsert(
+                ids=ids,
+                embeddings=np.asarray(vectors, dtype=np.float32).tolist(),
+                metadatas=[doc.metadata for doc in documents],
+                documents=[doc.page_content for doc in documents],
+            )
+
+    def delete(self, ids: List[str]):
+        """
+        Delete documents by ID.
+
+        Args:
+            ids (List[str]): IDs of the documents to delete.
+        """
+        self.db.delete(ids=ids)
+
+    def search_by_vector(self, embedding: List[float], k: int, category: Optional[str] = None) -> List[Tuple["Document", float]]:
+        """
+        Find the k documents closest to a query embedding.
+
+        Args:
+            embedding (List[float]): Query embedding.
+            k (int): Number of results.
+            category (Optional[str]): Only consider documents with this 'category' metadata
+                (folded with fold_text, like the metadata FAQManager stores).
+
+        Returns:
+            List[Tuple[Document, float]]: Documents with their distance.
+        """
+        return self.db.similarity_search_by_vector_with_relevance_scores(embedding, k=k, filter={"category": fold_text(category)} if category else None)
+
+    def search_by_vectors(self, embeddings: List[List[float]], k: int, category: Optional[str] = None) -> List[List[Tuple["Document", float]]]:
+        """
+        Find the k closest documents for each of several query embeddings in one query.
+
+        Args:
+            embeddings (List[List[float]]): Query embeddings.
+            k (int): Number of results per query.
+            category (Optional[str]): Only consider documents with this 'category' metadata
+                (folded with fold_text, like the metadata FAQManager stores).
+
+        Returns:
+            List[List[Tuple[Document, float]]]: Results for each query.
+        """
+        if not embeddings:
+            return []
+        results = self.db._collection.query(
+            query_embeddings=embeddings,
+            n_results=k,
+            where={"category": fold_text(category)} if category else None,
+            include=["documents", "metadatas", "distances"],
+        )
+        from langchain_core.documents import Document
+        return [
+            [
+                (Document(page_content=content, metadata=metadata or {}, id=doc_id), distance)
+                for doc_id, content, metadata, distance in zip(ids, contents, metadatas, distances)
+            ]
+            for ids, contents, metadatas, distances in zip(results["ids"], results["documents"], results["metadatas"], results["distances"])
+        ]
+
+    def __len__(self) -> int:
+        return self.db._collection.count()
+
+    def __del__(self):
+        """
+        Clean up temporary directory on object deletion.
+        """
+        if hasattr(self, 'persist_directory'):
+            shutil.rmtree(self.persist_directory, ignore_errors=True)
+
+class NumpyVectorStore:
+    """
+    In-memory brute-force vector store for small corpora.
+
+    All embeddings live in one contiguous, L2-normalized float32 matrix. A query is
+    scored with a single matrix-vector product and the top k are selected with
+    argpartition. Scores are reported as squared L2 distances between the normalized
+    vectors (2 - 2 * cosine), the same scale as ChromaVectorStore. Precomputed
+    embeddings loaded into an empty store are used in place, so a memory-mapped
+    matrix is only copied into memory on the first change.
+    """
+
+    def __init__(self, embeddings: Any, dim: Optional[int] = None):
+        """
+        Initialize the NumpyVectorStore.
+
+        Args:
+            embeddings (Any): Embedding model used to embed documents.
+            dim (Optional[int]): Embedding dimension. Inferred from the first batch if omitted.
+        """
+        self.embeddings = embeddings
+        self.documents: List["Document"] = []
+        self.ids: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self.size = 0
+        self.matrix = np.zeros((0, dim or 0), dtype=np.float32)
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _reserve(self, rows: int, dim: int):
+        """
+        Make room for `rows` more vectors, doubling the matrix capacity when needed.
+
+        Args:
+            rows (int): Number of rows to add.
+            dim (int): Embedding dimension.
+        """
+        needed = self.size + rows
+        self._make_writable()
+        if self.matrix.shape[1] != dim:
+            if self.size:
+                raise ValueError(f"Dimensión de embedding inconsistente: {dim} != {self.matrix.shape[1]}")
+            self.matrix = np.zeros((0, dim), dtype=np.float32)
+        if needed > self.matrix.shape[0]:
+            grown = np.zeros((max(needed, 2 * self.matrix.shape[0], 64), dim), dtype=np.float32)
+            grown[:self.size] = self.matrix[:self.size]
+            self.matrix = grown
+
+    def _make_writable(self):
+        """
+        Copy a read-only (memory-mapped) matrix into memory before changing it.
+        """
+        if not self.matrix.flags.writeable:
+            self.matrix = np.array(self.matrix[:self.size])
+
+    def add_documents(self, documents: List["Document"], ids: List[str]):
+        """
+        Embed and add documents to the store.
+
+        Args:
+            documents (List[Document]): Documents to add.
+            ids (List[str]): One unique ID per document.
+        """
+        if not documents:
+            return
+        vectors = np.asarray(self.embeddings.embed_documents([doc.page_content for doc in documents]), dtype=np.float32)
+        self.add_embedded(documents, ids, self._normalize(vectors))
+
+    def add_embedded(self, documents: List["Document"], ids: List[str], vectors: np.ndarray):
+        """
+        Add documents with precomputed embeddings.
+
+        Args:
+            documents (List[Document]): Documents to add.
+            ids (List[str]): One unique ID per document.
+            vectors (np.ndarray): L2-normalized float32 embeddings, one row per document.
+                If the store is empty the array is used without copying.
+        """
+        if not documents:
+            return
+        with self._lock:
+            self.delete([doc_id for doc_id in ids if doc_id in self.positions])  # Mismo efecto que el upsert de Chroma
+            if self.size == 0:
+                # Sin copia: las páginas de una matriz mapeada se comparten entre procesos
+                self.matrix = vectors
+            else:
+                self._reserve(len(documents), vectors.shape[1])
+                self.matrix[self.size:self.size + len(documents)] = vectors
+            for offset, doc_id in enumerate(ids):
+                self.positions[doc_id] = self.size + offset
+            self.size += len(documents)
+            self.documents.extend(documents)
+            self.ids.extend(ids)
+
+    def delete(self, ids: List[str]):
+        """
+        Delete documents by ID, moving the last row into each freed slot.
+
+        Args:
+            ids (List[str]): IDs of the documents to delete.
+        """
+        with self._lock:
+            if any(doc_id in self.positions for doc_id in ids):
+                self._make_writable()
+            for doc_id in ids:
+                row = self.positions.pop(doc_id, None)
+                if row is None:
+                    continue
+                last = self.size - 1
+                if row != last:
+                    self.matrix[row] = self.matrix[last]
+                    self.documents[row] = self.documents[last]
+                    self.ids[row] = self.ids[last]
+                    self.positions[self.ids[row]] = row
+                self.documents.pop()
+                self.ids.pop()
+                self.size -= 1
+
+    def _top_k(self, scores: np.ndarray, k: int) -> np.ndarray:
+        """
+        Indexes of the k highest scores along the last axis, best first.
+        """
+        if k < scores.shape[-1]:
+            top = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+        else:
+            top = np.broadcast_to(np.arange(scores.shape[-1]), scores.shape[:-1] + (scores.shape[-1],))
+        order = np.argsort(-np.take_along_axis(scores, top, axis=-1), axis=-1, kind="stable")
+        return np.take_along_axis(top, order, axis=-1)
+
+    def search_by_vector(self, embedding: List[float], k: int, category: Optional[str] = None) -> List[Tuple["Document", float]]:
+        """
+        Find the k documents closest to a query embedding.
+
+        Args:
+            embedding (List[float]): Query embedding.
+            k (int): Number of results.
+            category (Optional[str]): Only consider documents with this 'category' metadata
+                (folded with fold_text, like the metadata FAQManager stores).
+
+        Returns:
+            List[Tuple[Document, float]]: Documents with their distance.
+        """
+        return self.search_by_vectors([embedding], k, category)[0]
+
+    def search_by_vectors(self, embeddings: List[List[float]], k: int, category: Optional[str] = None) -> List[List[Tuple["Document", float]]]:
+        """
+        Find the k closest documents for each of several query embeddings with one
+        matrix product.
+
+        Args:
+            embeddings (List[List[float]]): Query embeddings.
+            k (int): Number of results per query.
+            category (Optional[str]): Only consider documents with this 'category' metadata
+                (folded with fold_text, like the metadata FAQManager stores).
+
+        Returns:
+            List[List[Tuple[Document, float]]]: Results for each query.
+        """
+        if not embeddings:
+            return []
+        queries = self._normalize(np.asarray(embeddings, dtype=np.float32))
+        with self._lock:
+            if self.size == 0 or k <= 0:
+                return [[] for _ in embeddings]
+            similarities = queries @ self.matrix[:self.size].T
+            if category:
+                # Prefiltro: las filas de otras categorías nunca entran al top k
+                wanted = fold_text(category)
+                allowed = np.fromiter((doc.metadata.get("category") == wanted for doc in self.documents), dtype=bool, count=self.size)
+                similarities[:, ~allowed] = -np.inf
+                k = min(k, int(allowed.sum()))
+            k = min(k, self.size)
+            if k <= 0:
+                return [[] for _ in embeddings]
+            top = self._top_k(similarities, k)
+            distances = 2.0 - 2.0 * np.take_along_axis(similarities, top, axis=-1)
+            return [
+                [(self.documents[i], float(distance)) for i, distance in zip(rows.tolist(), row_distances.tolist())]
+                for rows, row_distances in zip(top, distances)
+            ]
+
+    def __len__(self) -> int:
+        return self.size
+
+VECTOR_STORES: Dict[str, Type] = {
+    "chroma": ChromaVectorStore,
+    "numpy": NumpyVectorStore,
+}
+
+def create_vector_store(backend: str, embeddings: Any):
+    """
+    Create a vector store for the given backend name.
+
+    Args:
+        backend (str): One of the keys of VECTOR_STORES.
+        embeddings (Any): Embedding model used to embed documents.
+
+    Returns:
+        The vector store instance.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    if backend not in VECTOR_STORES:
+        raise ValueError(f"Backend de vectores desconocido: {backend}. Opciones: {', '.join(VECTOR_STORES)}")
+    return VECTOR_STORES[backend](embeddings)
@@ -0,0 +1,1043 @@
+import os
+import sys
+import json
+import time
+import argparse
+import random
+import threading
+import asyncio
+import functools
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Add the current directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from back.conversation_store import ConversationStore
+from back.conversation_writer import ConversationWriter
+from back.context_window import ContextWindow, count_message_tokens
+from back.crawl_state import CrawlState
+from back.database_manager import FAQManager, FAQIndexRegistry, JSONAdapter, TicketDatabase
+from back.embedding_cache import EmbeddingCache
+from back.fast_path import FastPathRouter
+from back.query_cache import QueryCache
+from back.response_cache import SemanticResponseCache
+from back.id_allocator import MongoTicketIdAllocator
+from back.make_db import build_artifact
+from back.metrics import metrics, span
+from back.falabella_scraper import FAQScraper
+from back.ticket_listing import TicketListing
+from back.provider_client import ProviderClient
+from bench.stubs import HashEmbeddings, StubChatCompletionServer, StubChatLLM, serve_fixture_site
+from bench.fixtures import (
+    CountingCollection, labeled_queries, load_queries, measure_import_time, mongo_database, paraphrase_traffic,
+    percentile, report, rss_bytes, run_concurrently, time_call, time_calls, work_directory,
+)
+
+KNOWLEDGE_DB_FILE = "db_knowledge.json"
+
+def bench_faq_registry(knowledge_db_file: str = KNOWLEDGE_DB_FILE, queries: int = 20) -> Dict[str, Dict[str, float]]:
+    """
+    Compare per-query cost of rebuilding FAQManager on each search against the shared registry.
+
+    Args:
+        knowledge_db_file (str): Path to the knowledge database file.
+        queries (int): Number of queries to run on each path.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Metrics for the rebuild and registry paths.
+    """
+    embeddings = HashEmbeddings()
+    query_list = load_queries(knowledge_db_file, queries)
+    results = {}
+
+    # Comportamiento anterior: un FAQManager nuevo por cada llamada a search_database
+    embeddings.reset()
+    _, latencies = time_calls(lambda query: FAQManager(knowledge_db_file, embeddings=embeddings).search_faq(query, k=3), query_list)
+    results["rebuild"] = report("rebuild per query", latencies, embedded_texts_per_query=embeddings.texts / len(query_list))
+
+    registry = FAQIndexRegistry(factory=lambda path: FAQManager(path, embeddings=embeddings))
+    _, build_time = time_call(lambda: registry.get(knowledge_db_file))
+
+    embeddings.reset()
+    _, latencies = time_calls(lambda query: registry.get(knowledge_db_file).search_faq(query, k=3), query_list)
+    results["registry"] = report("shared registry", latencies, build_s=build_time, embedded_texts_per_query=embeddings.texts / len(query_list))
+    return results
+
+def bench_embedding_cache(knowledge_db_file: str = KNOWLEDGE_DB_FILE, latency: float = 0.05, prefill: int = 50000, misses: int = 500) -> Dict[str, Dict[str, float]]:
+    """
+    Measure FAQ index build time and provider calls on a cold and a warm embedding
+    cache, and the cache's own cost per miss once it holds many vectors.
+
+    Args:
+        knowledge_db_file (str): Path to the knowledge database file.
+        latency (float): Simulated provider latency per call in seconds.
+        prefill (int): Vectors cached before timing the misses.
+        misses (int): Number of timed misses.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Metrics for the cold and warm builds and the misses.
+    """
+    provider = HashEmbeddings(latency=latency)
+    results = {}
+    with work_directory() as cache_dir:
+        for name in ("cold", "warm"):
+            # Un EmbeddingCache nuevo simula el reinicio del proceso
+            cache = EmbeddingCache(provider, cache_dir=cache_dir)
+            provider.reset()
+            _, elapsed = time_call(lambda: FAQManager(knowledge_db_file, embeddings=cache))
+            stats = cache.stats()
+            results[name] = report(f"{name} build", [elapsed], provider_texts=provider.texts, hits=stats["hits"], misses=stats["misses"])
+
+        # Costo propio de un fallo (sin la latencia del proveedor) con la caché ya poblada
+        cache = EmbeddingCache(HashEmbeddings(), cache_dir=os.path.join(cache_dir, "misses"))
+        cache.embed_documents([f"texto {i}" for i in range(prefill)])
+        _, latencies = time_calls(cache.embed_query, [f"consulta {i}" for i in range(misses)])
+        results["miss"] = report(f"miss with {prefill} cached vectors", latencies, entries=cache.stats()["entries"])
+    return results
+
+def bench_query_cache(knowledge_db_file: str = KNOWLEDGE_DB_FILE, queries: int = 500, distinct: int = 30) -> Dict[str, Dict[str, float]]:
+    """
+    Replay skewed repeated traffic with and without the query cache in front of search_faq.
+
+    Args:
+        knowledge_db_file (str): Path to the knowledge database file.
+        queries (int): Number of queries to replay.
+        distinct (int): Number of distinct questions in the traffic.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Metrics for the uncached and cached paths.
+    """
+    embeddings = HashEmbeddings()
+    manager = FAQManager(knowledge_db_file, embeddings=embeddings)
+    rng = random.Random(0)
+    questions = load_queries(knowledge_db_file, distinct)
+    # Trafico sesgado: pocas preguntas concentran la mayoria, con variantes de mayusculas y signos
+    traffic = [rng.choice(questions[:max(1, distinct // 5)] if rng.random() < 0.8 else questions) for _ in range(queries)]
+    traffic = [query.lower().strip("¿?") if rng.random() < 0.3 else query for query in traffic]
+    results = {}
+
+    embeddings.reset()
+    _, latencies = time_calls(lambda query: manager.knowledge_db.search_by_vector(embeddings.embed_query(query), k=3), traffic)
+    results["uncached"] = report("uncached", latencies, provider_calls=embeddings.calls)
+
+    embeddings.reset()
+    _, latencies = time_calls(lambda query: manager.search_faq(query, k=3), traffic)
+    stats = manager.query_cache.stats()
+    results["cached"] = report("query cache", latencies, provider_calls=embeddings.calls, hit_rate=stats["hit_rate"], result_hits=stats["result_hits"], embedding_hits=stats["embedding_hits"])
+    return results
+
+def bench_fast_path(knowledge_db_file: str = KNOWLEDGE_DB_FILE, queries: int = 200, llm_latency: float = float(os.environ.get("BENCH_LLM_LATENCY", "1.2"))) -> Dict[str, Dict[str, float]]:
+    """
+    Offline evaluation of the confidence-gated fast path: replay exact FAQ questions,
+    paraphrases and off-topic queries at several distance thresholds and report the
+    fraction of turns answered without the agents, how often that answer is the right
+    FAQ, and the latency saved against two agent completions of `llm_latency` seconds.
+
+    Args:
+        knowledge_db_file (str): Path to the knowledge database file.
+        queries (int): Number of FAQ-derived queries.
+        llm_latency (float): Seconds per agent chat completion (BENCH_LLM_LATENCY).
+
+    Returns:
+        Dict[str, Dict[str, float]]: Metrics for each threshold.
+    """
+    manager = FAQManager(knowledge_db_file, embeddings=HashEmbeddings())
+    rng = random.Random(0)
+    questions = load_queries(knowledge_db_file, queries)
+    traffic = paraphrase_traffic(questions, rng)
+    off_topic = ["¿Quién ganó el partido de ayer?", "Recomiéndame una película", "¿Qué hora es en Tokio?", "Cuéntame un chiste", "¿Cuánto es 2 + 2?"]
+    traffic += [(query, None) for query in off_topic * max(1, len(questions) // 20)]
+
+    results = {}
+    for threshold in (0.05, 0.1, 0.2, 0.3):
+        router = FastPathRouter(manager, max_distance=threshold)
+        matches, latencies = time_calls(router.route, [query for query, _ in traffic])
+        correct = sum(bool(match) and match["question"] == expected for match, (_, expected) in zip(matches, traffic))
+        stats = router.stats()
+        saved = stats["hits"] * 2 * llm_latency - sum(latencies)  # Las consultas que no califican pagan la búsqueda extra
+        results[f"{threshold}"] = report(
+            f"fast path max_distance={threshold}", latencies,
+            fast_path_rate=stats["hit_rate"], precision=correct / stats["hits"] if stats["hits"] else 0.0,
+            saved_s_per_turn=saved / len(traffic),
+        )
+    return results
+
+def bench_response_cache(knowledge_db_file: str = KNOWLEDGE_DB_FILE, queries: int = 200, repeats: int = 5, llm_latency: float = float(os.environ.get("BENCH_LLM_LATENCY", "1.2"))) -> Dict[str, Dict[str, float]]:
+    """
+    Offline evaluation of the semantic response cache: replay FAQ questions asked
+    `repeats` times across sessions (each time verbatim or as a simple paraphrase)
+    through the same lookup the agent manager does, at several similarity
+    thresholds, and report the hit rate, whether hits return the answer given for
+    the same question, the lookup overhead and the latency saved against two agent
+    completions of `llm_latency` seconds. Checks that add_faq empties the cache.
+
+    Args:
+        knowledge_db_file (str): Path to the knowledge database file.
+        queries (int): Number of distinct FAQ questions.
+        repeats (int): Times each question is asked.
+        llm_latency (float): Seconds per agent chat completion (BENCH_LLM_LATENCY).
+
+    Returns:
+        Dict[str, Dict[str, float]]: Metrics for each threshold.
+    """
+    with work_directory() as work_dir:
+        knowledge_copy = os.path.join(work_dir, "knowledge.json")
+        shutil.copy(knowledge_db_file, knowledge_copy)
+        manager = FAQManager(knowledge_copy, embeddings=HashEmbeddings(), backend="numpy")
+        return _replay_response_cache(manager, load_queries(knowledge_db_file, queries), repeats, llm_latency)
+
+def _replay_response_cache(manager: FAQManager, questions: List[str], repeats: int, llm_latency: float) -> Dict[str, Dict[str, float]]:
+    rng = random.Random(0)
+    traffic = [pair for _ in range(repeats) for pair in paraphrase_traffic(questions, rng)]
+    rng.shuffle(traffic)
+
+    results = {}
+    for threshold in (0.9, 0.95, 0.98):
+        manager.response_cache = SemanticResponseCache(min_similarity=threshold)
+
+        def lookup(query: str) -> Tuple[Tuple[Any, ...], Optional[Dict[str, Any]]]:
+            faq_ids = [result["id"] for result in manager.search_faq(query, k=3)]
+            key = (query, manager.embed_query(query), "TriageAgent", faq_ids)
+            return key, manager.response_cache.get(*key)
+
+        latencies, correct = [], 0
+        for query, expected in traffic:
+            (key, cached), elapsed = time_call(lambda: lookup(query))
+            latencies.append(elapsed)
+            if cached:
+                correct += cached["answer"] == f"respuesta a {expected}"
+            else:
+                manager.response_cache.put(*key, f"respuesta a {expected}", latency=2 * llm_latency)
+        stats = manager.response_cache.stats()
+        saved = stats["seconds_saved"] - sum(latencies)  # Los fallos pagan la búsqueda extra
+        results[f"{threshold}"] = report(
+            f"response cache min_similarity={threshold}", latencies,
+            hit_rate=stats["hit_rate"], precision=correct / stats["hits"] if stats["hits"] else 0.0,
+            saved_s_per_turn=saved / len(traffic), entries=stats["entries"],
+        )
+
+    manager.add_faq("¿Pregunta agregada por el benchmark?", "Respuesta agregada por el benchmark.")
+    results["invalidation"] = {"entries_after_add_faq": manager.response_cache.stats()["entries"]}
+    print(f"entries after add_faq: {results['invalidation']['entries_after_add_faq']}")
+    return results
+
+def bench_hybrid_retrieval(knowledge_db_file: str = KNOWLEDGE_DB_FILE, embed_latency: float = float(os.environ.get("BENCH_EMBED_LATENCY", "0.02"))) -> Dict[str, Dict[str, float]]:
+    """
+    Recall@k and latency of vector-only, BM25-only and hybrid retrieval over the FAQs.
+
+    The queries come from labeled_queries: every FAQ question verbatim, a paraphrase
+    of it, and a keyword query made of the words that only appear in that FAQ (codes,
+    phone numbers, names such as "WhatsApp"); the expected result is the source FAQ. Query embeddings pay `embed_latency` seconds
+    of simulated provider latency.
+
+    Args:
+        knowledge_db_file (str): Path to the knowledge database file.
+        embed_latency (float): Seconds per query embedding call (BENCH_EMBED_LATENCY).
+
+    Returns:
+        Dict[str, Dict[str, float]]: Metrics per retrieval mode and query kind.
+    """
+    embeddings = HashEmbeddings()
+    manager = FAQManager(knowledge_db_file, embeddings=embeddings, backend="numpy")
+    embeddings.latency = embed_latency
+    traffic = labeled_queries(manager)
+
+    def vector_search(query: str) -> List[str]:
+        ranked = []
+        for doc, _ in manager.knowledge_db.search_by_vector(manager.embeddings.embed_query(query), k=12):
+            if doc.metadata["faq_id"] not in ranked:
+                ranked.append(doc.metadata["faq_id"])
+        return ranked
+
+    def hybrid_search(min_confidence: float) -> Callable[[str], List[str]]:
+        def search(query: str) -> List[str]:
+            manager.lexical_min_confidence = min_confidence
+            manager.query_cache = QueryCache()  # Sin resultados ni embeddings de corridas anteriores
+            return [result["id"] for result in manager.search_faq(query, k=3)]
+        return search
+
+    modes = {
+        "vector": vector_search,
+        "bm25": lambda query: [faq_id for faq_id, _ in manager.lexical_index.search(query, k=3)],
+        "hybrid": hybrid_search(float("inf")),
+        "hybrid+lexical_only": hybrid_search(float(os.environ.get("LEXICAL_MIN_CONFIDENCE", "0.3"))),
+    }
+    results = {}
+    for mode, search in modes.items():
+        for kind in ("verbatim", "paraphrase", "keyword", "all"):
+            queries = [item for item in traffic if kind in ("all", item[0])]
+            calls, lexical_searches = embeddings.calls, manager.lexical_searches
+            rankings, latencies = time_calls(search, [query for _, query, _ in queries])
+            at_1 = sum(ranked[:1] == [expected] for ranked, (_, _, expected) in zip(rankings, queries))
+            at_3 = sum(expected in ranked[:3] for ranked, (_, _, expected) in zip(rankings, queries))
+            results[f"{mode}/{kind}"] = report(
+                f"{mode} {kind} ({len(queries)} queries)", latencies,
+                recall_at_1=at_1 / len(queries), recall_at_3=at_3 / len(queries),
+                embed_calls_per_query=(embeddings.calls - calls) / len(queries),
+                lexical_only_rate=(manager.lexical_searches - lexical_searches) / len(queries),
+            )
+    return results
+
+def bench_search_batch(knowledge_db_file: str = KNOWLEDGE_DB_FILE, queries: int = 3000, embed_latency: float = float(os.environ.get("BENCH_EMBED_LATENCY", "0.02"))) -> Dict[str, Dict[str, float]]:
+    """
+    Throughput of search_faq_batch against a loop over search_faq on distinct
+    queries (FAQ questions with random words dropped), with `embed_latency` seconds
+    of simulated provider latency per embedding call, and the fraction of queries for
+    which both return the same FAQs (they can differ only on exact distance ties).
+
+    Args:
+        knowledge_db_file (str): Path to the knowledge database file.
+        queries (int): Number of queries.
+        embed_latency (float): Seconds per embedding call (BENCH_EMBED_LATENCY).
+
+    Returns:
+        Dict[str, Dict[str, float]]: Metrics for the loop and the batch.
+    """
+    embeddings = HashEmbeddings()
+    manager = FAQManager(knowledge_db_file, embeddings=embeddings, backend="numpy")
+    embeddings.latency = embed_latency
+    rng = random.Random(0)
+    questions = [faq["question"] for faq in manager.faqs.values()]
+    traffic = []
+    while len(traffic) < queries:
+        words = rng.choice(questions).strip("¿?").split()
+        traffic.append(" ".join(word for word in words if rng.random() < 0.8) or words[0])
+
+    results, ranked = {}, {}
+    for name in ("loop", "batch"):
+        manager.query_cache = QueryCache()
+        calls = embeddings.calls
+        if name == "loop":
+            found, elapsed = time_call(lambda: [manager.search_faq(query, k=3) for query in traffic])
+        else:
+            found, elapsed = time_call(lambda: manager.search_faq_batch(traffic, k=3))
+        ranked[name] = [[result["id"] for result in query_results] for query_results in found]
+        results[name] = report(
+            f"search_faq {name} ({len(traffic)} queries)", [elapsed / len(traffic)] * len(traffic),
+            queries_per_s=len(traffic) / elapsed, provider_calls=embeddings.calls - calls,
+        )
+    results["batch"]["agreement"] = sum(a == b for a, b in zip(ranked["loop"], ranked["batch"])) / len(traffic)
+    print(f"agreement with loop: {results['batch']['agreement']:.4f}")
+    return results
+
+def bench_vector_store(knowledge_db_file: str = KNOWLEDGE_DB_FILE, queries: int = 200) -> Dict[str, Dict[str, float]]:
+    """
+    Compare build time, memory and query latency of the Chroma and NumPy vector store backends.
+
+    Args:
+        knowledge_db_file (str): Path to the knowledge database file.
+        queries (int): Number of queries to time on each backend.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Metrics per backend.
+    """
+    embeddings = HashEmbeddings()
+    query_list = load_queries(knowledge_db_file, queries)
+    query_list = (query_list * (queries // len(query_list) + 1))[:queries]
+    # Embeddings de consulta precalculados: solo se mide el backend
+    query_vectors = embeddings.embed_documents(query_list)
+    results = {}
+
+    for backend in ("chroma", "numpy"):
+        memory = rss_bytes()
+        manager, build_time = time_call(lambda: FAQManager(knowledge_db_file, embeddings=embeddings, backend=backend))
+        memory = rss_bytes() - memory
+
+        _, latencies = time_calls(lambda vector: manager.knowledge_db.search_by_vector(vector, k=3), query_vectors)
+        _, batch_time = time_call(lambda: manager.knowledge_db.search_by_vectors(query_vectors, k=3))
+        results[backend] = report(backend, latencies, build_s=build_time, rss_delta_mb=memory / 2**20, batch_ms_per_query=batch_time * 1000 / len(query_vectors))
+    return results
+
+def bench_knowledge_store(knowledge_db_file: str = KNOWLEDGE_DB_FILE, adds: int = 50, bulk: int = 2000) -> Dict[str, Dict[str, float]]:
+    """
+    Compare single FAQ additions through a full-file rewrite against the journal, and
+    time a bulk import.
+
+    Args:
+        knowledge_db_file (str): Path to the knowledge database file (copied, never modified).
+        adds (int): Number of single additions to time.
+        bulk (int): Number of FAQs in the bulk import.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Metrics for the rewrite, journal and bulk paths.
+    """
+    results = {}
+    with work_directory() as work_dir:
+        rewrite_file = os.path.join(work_dir, "rewrite.json")
+        journal_file = os.path.join(work_dir, "journal.json")
+        shutil.copy(knowledge_db_file, rewrite_file)
+        shutil.copy(knowledge_db_file, journal_file)
+
+        # Comportamiento anterior de JSONAdapter.save_faq: reescribir el archivo completo
+        def rewrite(i: int):
+            with open(rewrite_file, 'r+') as f:
+                database = json.load(f)
+                database['faq'].append({"question": f"Pregunta {i}", "answer": f"Respuesta {i}"})
+                f.seek(0)
+                f.truncate()
+                json.dump(database, f, indent=2)
+        _, latencies = time_calls(rewrite, range(adds))
+        results["rewrite"] = report("full rewrite per add", latencies)
+
+        adapter = JSONAdapter(journal_file)
+        _, latencies = time_calls(lambda i: adapter.save_faq(f"Pregunta {i}", f"Respuesta {i}"), range(adds))
+        results["journal"] = report("journal append per add", latencies)
+
+        embeddings = HashEmbeddings()
+        manager = FAQManager(journal_file, embeddings=embeddings, backend="numpy")
+        faqs = [{"question": f"Pregunta importada {i}", "answer": f"Respuesta importada número {i}", "category": "Importación"} for i in range(bulk)]
+        embeddings.reset()
+        _, elapsed = time_call(lambda: manager.add_faqs(faqs))
+        results["bulk"] = report(f"bulk import of {bulk}", [elapsed], provider_calls=embeddings.calls, faqs=len(manager.faqs))
+    return results
+
+def bench_ticket_store(tickets: int = 2000, messages: int = 10, updates: int = 200, workers: int = 8) -> Dict[str, Dict[str, float]]:
+    """
+    Compare update_ticket latency of the legacy whole-file JSON rewrite against the
+    SQLite ticket store with a large ticket history, and check concurrent appends.
+
+    Args:
+        tickets (int): Number of tickets in the history.
+        messages (int): Messages per ticket in the history.
+        updates (int): Number of appended messages to time.
+        workers (int): Threads appending concurrently.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Metrics for the JSON and SQLite paths.
+    """
+    results = {}
+    with work_directory() as work_dir:
+        json_file = os.path.join(work_dir, "db_tickets.json")
+        history = [
+            {
+                "id": f"TICKET-{i + 1:04d}",
+                "user_data": {"name": "Juan", "email": "juan@example.com", "phone": "123"},
+                "conversation": [{"role": "Usuario", "content": f"Mensaje {j}"} for j in range(messages)],
+                "createdAt": "2024-10-27T00:00:00",
+                "resolved": False,
+            }
+            for i in range(tickets)
+        ]
+        with open(json_file, "w") as f:
+            json.dump({"tickets": history}, f, indent=2)
+        ticket_id = history[-1]["id"]
+
+        # Comportamiento anterior de TicketDatabase.update_ticket
+        def rewrite(i: int):
+            with open(json_file, 'r+') as f:
+                database = json.load(f)
+                for ticket in database['tickets']:
+                    if ticket['id'] == ticket_id:
+                        ticket['conversation'].append({"role": "Usuario", "content": f"Nuevo {i}"})
+                        break
+                f.seek(0)
+                f.truncate()
+                json.dump(database, f, indent=2)
+        _, latencies = time_calls(rewrite, range(updates))
+        results["json"] = report("json rewrite", latencies)
+
+        ticket_db, migration_time = time_call(lambda: TicketDatabase(json_file))
+        _, latencies = time_calls(lambda i: ticket_db.update_ticket(ticket_id, "Usuario", f"Nuevo {i}"), range(updates))
+
+        before = len(ticket_db.get_ticket(ticket_id)["conversation"])
+        appends = workers * (updates // workers)
+        _, concurrent_time = time_call(lambda: run_concurrently(lambda: ticket_db.update_ticket(ticket_id, "Usuario", "Concurrente"), appends, workers))
+        lost = before + appends - len(ticket_db.get_ticket(ticket_id)["conversation"])
+        results["sqlite"] = report("sqlite", latencies, migration_s=migration_time, concurrent_writes_per_s=appends / concurrent_time, lost_messages=lost)
+    return results
+
+def bench_ticket_ids(conversations: int = 400, workers: int = 32) -> Dict[str, Dict[str, float]]:
+    """
+    Open many conversations concurrently and check that ticket IDs are unique and that
+    allocation latency stays flat as the number of tickets grows.
+
+    Args:
+        conversations (int): Number of conversations to open.
+        workers (int): Concurrent threads.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Metrics for the SQLite and MongoDB allocators.
+    """
+    results = {}
+    quarter = max(1, conversations // 4)
+
+    def allocation_report(name: str, ids: List[str], latencies: List[float]) -> Dict[str, float]:
+        return report(
+            name, latencies, unique_ids=len(set(ids)), duplicates=len(ids) - len(set(ids)),
+            first_quarter_p50_ms=percentile(latencies[:quarter], 50) * 1000, last_quarter_p50_ms=percentile(latencies[-quarter:], 50) * 1000,
+        )
+
+    with work_directory() as work_dir:
+        ticket_db = TicketDatabase(os.path.join(work_dir, "db_tickets.sqlite3"))
+        user_data = {"name": "Juan", "email": "juan@example.com", "phone": "123"}
+        ids, latencies = run_concurrently(lambda: ticket_db.save_ticket(user_data, "Inicio de conversación", "Bienvenido"), conversations, workers)
+        results["sqlite"] = allocation_report("sqlite save_ticket", ids, latencies)
+
+        db, label = mongo_database("bench-ticket-ids")
+        allocator = MongoTicketIdAllocator(db["counters"], db["tickets"])
+        allocate = allocator.allocate
+        if label == "mongomock":
+            # mongomock no es atómico entre hilos: la unicidad solo es significativa con mongod
+            lock = threading.Lock()
+            def allocate():
+                with lock:
+                    return allocator.allocate()
+        ids, latencies = run_concurrently(allocate, conversations, workers)
+        results["mongo"] = allocation_report(f"{label} allocate", ids, latencies)
+    return results
+
+def bench_ticket_listing(tickets: int = int(os.environ.get("BENCH_TICKETS", "5000")), messages_per_ticket: int = 20, page_size: int = 50) -> Dict[str, Dict[str, float]]:
+    """
+    Compare the old dashboard listing (every ticket with its full conversation,
+    serialized through json_util) against the first page and a deep page of the
+    cursor-paginated summary listing.
+
+    Args:
+        tickets (int): Number of tickets stored (BENCH_TICKETS).
+        messages_per_ticket (int): Messages per conversation.
+        page_size (int): Tickets per page.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Latency and response size per listing.
+    """
+    from bson import json_util
+
+    db, label = mongo_database("bench-ticket-listing")
+    collection = db["tickets"]
+    rng = random.Random(0)
+    collection.insert_many([{
+        "id": f"TICKET-{i:06d}",
+        "user_data": {"name": f"Cliente {i}", "email": f"c{i}@example.com", "phone": "123"},
+        "createdAt": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:00:00",
+        "resolved": rng.random() < 0.7,
+        "conversation": [{"role": "user" if j % 2 == 0 else "assistant", "content": f"Mensaje {j} del ticket {i} " * 8} for j in range(messages_per_ticket)],
+    } for i in range(tickets)])
+    listing = TicketListing(collection)
+
+    def full_dump() -> str:
+        return json_util.dumps(list(collection.find()))
+
+    def deep_page() -> str:
+        page = listing.list_page(limit=page_size)
+        for _ in range(min(10, tickets // page_size - 1)):
+            page = listing.list_page(cursor=page["next_cursor"], limit=page_size)
+        return json.dumps(page)
+
+    results = {}
+    for name, run in (
+        ("full dump", full_dump),
+        ("first page", lambda: json.dumps(listing.list_page(limit=page_size))),
+        ("first open page", lambda: json.dumps(listing.list_page(resolved=False, limit=page_size))),
+        ("11th page (walked)", deep_page),
+    ):
+        responses, latencies = time_calls(lambda _: run(), range(3))
+        results[name] = report(f"{label} {name} ({tickets} tickets)", latencies, response_kb=len(responses[-1]) / 1024)
+    return results
+
+def bench_conversation_store(messages_per_session: int = 50, operations: int = 200, workers: int = 16) -> Dict[str, Dict[str, float]]:
+    """
+    Grow the conversation store to increasing total sizes and check that appending a
+    user/assistant pair and reading one session's history stay flat. The sizes come
+    from BENCH_CONVERSATION_SIZES (comma separated); millions of messages need a real
+    mongod at MONGO_URI, since mongomock scans instead of using the indexes.
+
+    Args:
+        messages_per_session (int): Messages stored per session when filling.
+        operations (int): Appends and reads measured at each size.
+        workers (int): Concurrent threads.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Append and read metrics for each size.
+    """
+    db, label = mongo_database("bench-conversations")
+    default_sizes = "10000,100000,1000000" if label == "mongod" else "500,2000"
+    sizes = [int(size) for size in os.environ.get("BENCH_CONVERSATION_SIZES", default_sizes).split(",")]
+    store = ConversationStore(db["conversations"], db["conversation_counters"])
+    if label == "mongomock":
+        workers = 1  # mongomock no es seguro entre hilos
+
+    results, stored, sessions = {}, 0, 0
+    for size in sizes:
+        # Llenar con sesiones completas mediante inserciones masivas
+        while stored < size:
+            first_session, batch = sessions, []
+            while len(batch) < 10_000 and stored + len(batch) < size:
+                session_id = f"S-{sessions}"
+                batch.extend({"session_id": session_id, "seq": seq, "role": "user" if seq % 2 else "assistant", "content": f"Mensaje {seq}"}
+                             for seq in range(1, messages_per_session + 1))
+                sessions += 1
+            store.messages.insert_many(batch, ordered=False)
+            store.counters.insert_many([{"_id": f"S-{session}", "seq": messages_per_session} for session in range(first_session, sessions)])
+            stored += len(batch)
+
+        pair = [{"role": "user", "content": "¿Cuál es el horario?"}, {"role": "assistant", "content": "De 9 a 18 horas."}]
+        append = lambda: store.append(f"S-{random.randrange(sessions)}", pair)[0]["seq"]
+        read = lambda: len(store.get_messages(f"S-{random.randrange(sessions)}"))
+        _, append_latencies = run_concurrently(append, operations, workers)
+        _, read_latencies = run_concurrently(read, operations, workers)
+        stored += 2 * operations
+        results[f"{size}"] = {
+            "append": report(f"{label} append pair ({stored} messages, {sessions} sessions)", append_latencies),
+            "read": report(f"{label} get_messages ({stored} messages, {sessions} sessions)", read_latencies),
+        }
+    return results
+
+def bench_turn_persistence(sessions: int = 50, turns: int = 10, workers: int = 16, llm_latency: float = float(os.environ.get("BENCH_LLM_LATENCY", "0.05"))) -> Dict[str, Dict[str, float]]:
+    """
+    Persistence cost of a websocket chat turn, with many concurrent sessions: the
+    previous path (sequence reservation, two $push on the ticket, two SQLite ticket
+    updates and the message insert, all synchronous) against sequences assigned in
+    memory by the session's connection plus the write-behind ConversationWriter.
+    Reports the time each turn spends on persistence, the database writes per turn
+    and whether every message was stored.
+
+    Args:
+        sessions (int): Concurrent sessions.
+        turns (int): Turns per session.
+        workers (int): Threads for the blocking writes.
+        llm_latency (float): Seconds between turns of a session (BENCH_LLM_LATENCY).
+
+    Returns:
+        Dict[str, Dict[str, float]]: Metrics for each path.
+    """
+    db, label = mongo_database("bench-turn-persistence")
+    if label == "mongomock":
+        workers = 1  # mongomock no es seguro entre hilos
+    executor = ThreadPoolExecutor(max_workers=workers)
+    results = {}
+
+    async def run(mode: str, work_dir: str) -> Dict[str, float]:
+        loop = asyncio.get_running_loop()
+        call = lambda func, *args: loop.run_in_executor(executor, functools.partial(func, *args))
+        messages, counters, tickets = (CountingCollection(db[f"{mode}_{name}"]) for name in ("conversations", "counters", "tickets"))
+        store = ConversationStore(messages, counters)
+        ticket_db = TicketDatabase(os.path.join(work_dir, f"{mode}.sqlite3"))
+        writer = ConversationWriter(store, tickets, executor=executor)
+        await writer.start()
+        sqlite_writes = [0]
+        tickets.insert_many([{"id": f"T-{i}", "createdAt": "2024-01-01T00:00:00", "resolved": False, "conversation": []} for i in range(sessions)])
+        sqlite_ids = [ticket_db.save_ticket({"name": "Juan", "email": "juan@example.com", "phone": "123"}, "Inicio", "Bienvenido") for _ in range(sessions)]
+        base_writes = messages.writes + counters.writes + tickets.writes
+        latencies = []
+
+        async def session(i: int):
+            ticket_id = f"T-{i}"
+            for turn in range(turns):
+                user_message = {"role": "user", "content": f"Consulta {turn} de la sesión {i}"}
+                ai_message = {"role": "assistant", "content": f"Respuesta {turn} para la sesión {i}"}
+                start = time.perf_counter()
+                if mode == "synchronous":
+                    seq = await call(store.reserve, ticket_id, 2)
+                    await call(tickets.update_one, {"id": ticket_id}, {"$push": {"conversation": user_message}})
+                    await call(ticket_db.update_ticket, sqlite_ids[i], "Usuario", user_message["content"])
+                    await call(ticket_db.update_ticket, sqlite_ids[i], "Asistente", ai_message["content"])
+                    await call(store.insert, ticket_id, [{**user_message, "seq": seq}, {**ai_message, "seq": seq + 1}])
+                    await call(tickets.update_one, {"id": ticket_id}, {"$push": {"conversation": ai_message}})
+                    sqlite_writes[0] += 2
+                else:
+                    seq = 2 * turn + 1
+                    fields = {"description": user_message["content"]} if turn == 0 else None
+                    await writer.submit(ticket_id, [{**user_message, "seq": seq}, {**ai_message, "seq": seq + 1}], fields)
+                latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(llm_latency * random.random())
+
+        random.seed(0)
+        start = time.perf_counter()
+        await asyncio.gather(*(session(i) for i in range(sessions)))
+        await writer.stop()
+        elapsed = time.perf_counter() - start
+        total_turns = sessions * turns
+        writes = messages.writes + counters.writes + tickets.writes - base_writes + sqlite_writes[0]
+        stored = messages.count_documents({})
+        return report(
+            f"{label} {mode} ({sessions} sessions x {turns} turns)", latencies,
+            writes_per_turn=writes / total_turns, turns_per_s=total_turns / elapsed,
+            messages_stored=stored, all_stored=stored == 2 * total_turns,
+        )
+
+    try:
+        with work_directory() as work_dir:
+            for mode in ("synchronous", "write-behind"):
+                results[mode] = asyncio.run(run(mode, work_dir))
+    finally:
+        executor.shutdown()
+    return results
+
+def bench_scraper(pages: int = 120, fanout: int = 3, max_depth: int = 3, page_latency: float = 0.02, llm_latency: float = 0.05) -> Dict[str, Dict[str, float]]:
+    """
+    Crawl a local fixture site with a stub LLM, sequentially and with the concurrent
+    pipeline, and report pages per second. Also checks that exactly the pages within
+    max_depth are fetched and that every page's FAQs reach the knowledge store, then
+    re-crawls with the saved crawl state, unchanged and with one page edited, to check
+    that only changed pages reach the LLM and the corpus does not grow.
+
+    Args:
+        pages (int): Pages in the fixture site.
+        fanout (int): Child links per page.
+        max_depth (int): Crawl depth.
+        page_latency (float): Simulated seconds per HTTP response.
+        llm_latency (float): Simulated seconds per LLM call.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Crawl metrics for each configuration.
+    """
+    expected, level = 0, [0]
+    for _ in range(max_depth + 1):
+        expected += len(level)
+        level = [child for page in level for child in range(fanout * page + 1, fanout * page + fanout + 1) if child < pages]
+
+    revisions: Dict[int, int] = {}
+    server, base_url = serve_fixture_site(pages, fanout, page_latency, revisions)
+    results = {}
+    try:
+        with work_directory() as work_dir:
+            runs = (("sequential", 1, 1), ("concurrent", 8, 8), ("recrawl unchanged", 8, 8), ("recrawl 1 page edited", 8, 8))
+            for label, concurrency, llm_workers in runs:
+                if label.startswith("recrawl"):
+                    revisions.update({fanout: 1} if "edited" in label else {})
+                    name = "concurrent"
+                else:
+                    name = label
+                knowledge_db = JSONAdapter(os.path.join(work_dir, f"{name}.json"))
+                llm = StubChatLLM(latency=llm_latency)
+                scraper = FAQScraper(
+                    base_url, model="stub", llm=llm, concurrency=concurrency, llm_workers=llm_workers, rate_limit=0,
+                    knowledge_db=knowledge_db, crawl_state=CrawlState(os.path.join(work_dir, f"{name}.crawl.sqlite3")),
+                )
+                faqs, elapsed = time_call(lambda: scraper.scrape(base_url + "0", max_depth=max_depth))
+                stored = knowledge_db.get_all_faqs()
+                results[label] = report(
+                    f"scraper {label} (concurrency={concurrency}, llm_workers={llm_workers})", [elapsed],
+                    pages=scraper.pages, expected_pages=expected, unchanged_pages=scraper.unchanged, llm_calls=llm.calls,
+                    new_faqs=len(faqs), stored_faqs=len(stored), distinct_questions=len({faq["question"] for faq in stored}),
+                    errors=scraper.errors, pages_per_s=scraper.pages / elapsed,
+                )
+    finally:
+        server.shutdown()
+    return results
+
+def bench_context_window(turns: int = 200, max_tokens: int = 2000) -> Dict[str, Dict[str, float]]:
+    """
+    Replay a long support conversation and compare the prompt tokens per turn of
+    sending the whole history against the token-budgeted window, with and without a
+    (stub) rolling summary.
+
+    Args:
+        turns (int): Number of user turns.
+        max_tokens (int): Window budget.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Prompt tokens per turn for each strategy.
+    """
+    queries = load_queries(KNOWLEDGE_DB_FILE, 50)
+    summaries = {"calls": 0}
+
+    def stub_summarizer(summary: str, messages: List[Dict[str, Any]]) -> str:
+        summaries["calls"] += 1
+        return (summary + " " + " ".join(message["content"][:40] for message in messages if message["role"] == "user"))[-600:]
+
+    strategies = {
+        "full history": None,
+        "window": ContextWindow(max_tokens=max_tokens),
+        "window + summary": ContextWindow(max_tokens=max_tokens, summarizer=stub_summarizer),
+    }
+    results = {}
+    for label, window in strategies.items():
+        messages, tokens, latencies = [], [], []
+        for turn in range(turns):
+            messages.append({"role": "user", "content": queries[turn % len(queries)]})
+            prompt, elapsed = time_call(lambda: window.build(messages) if window else messages)
+            latencies.append(elapsed)
+            tokens.append(count_message_tokens(prompt))
+            messages.append({"role": "assistant", "content": "Según nuestras preguntas frecuentes, " + " ".join(queries[(turn + i) % len(queries)] for i in range(4))})
+        results[label] = report(
+            f"{label} ({turns} turns)", latencies,
+            turn_10_tokens=tokens[min(9, turns - 1)], turn_50_tokens=tokens[min(49, turns - 1)], last_turn_tokens=tokens[-1],
+            total_tokens=sum(tokens), summarizer_calls=summaries["calls"] if window and window.summarizer else 0,
+        )
+    return results
+
+def bench_instrumentation(knowledge_db_file: str = KNOWLEDGE_DB_FILE, iterations: int = 20000, queries: int = 2000) -> Dict[str, Dict[str, float]]:
+    """
+    Overhead of the pipeline instrumentation: cost of an empty span with and without
+    JSON trace logging, and throughput of cached search_faq calls (the cheapest
+    instrumented stage) with spans against the same calls with spans disabled.
+
+    Args:
+        knowledge_db_file (str): Path to the knowledge database file.
+        iterations (int): Number of spans timed per mode.
+        queries (int): Number of search_faq calls per mode.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Metrics per mode.
+    """
+    import back.database_manager as database_manager
+    from contextlib import nullcontext
+
+    def nested_spans(_):
+        with span("bench.turn"):
+            with span("bench.stage"):
+                pass
+
+    results = {}
+    previous = os.environ.pop("TRACE_LOG_FILE", None)
+    try:
+        with work_directory() as work_dir:
+            for label, destination in (("span", None), ("span + trace", os.path.join(work_dir, "traces.jsonl"))):
+                if destination:
+                    os.environ["TRACE_LOG_FILE"] = destination
+                _, latencies = time_calls(nested_spans, range(iterations))
+                results[label] = report(f"{label} ({iterations} x 2 spans)", [latency / 2 for latency in latencies])
+    finally:
+        os.environ.pop("TRACE_LOG_FILE", None)
+        if previous is not None:
+            os.environ["TRACE_LOG_FILE"] = previous
+
+    manager = FAQManager(knowledge_db_file, embeddings=HashEmbeddings(), backend="numpy")
+    traffic = load_queries(knowledge_db_file, 50)
+    for query in traffic:
+        manager.search_faq(query)
+    for label in ("search_faq (instrumented)", "search_faq (no spans)"):
+        if label.endswith("(no spans)"):
+            database_manager.span = lambda *args, **kwargs: nullcontext({})
+        try:
+            _, latencies = time_calls(lambda i: manager.search_faq(traffic[i % len(traffic)]), range(queries))
+        finally:
+            database_manager.span = span
+        results[label] = report(f"{label} ({queries} cached queries)", latencies)
+
+    exposition, elapsed = time_call(metrics.render)
+    results["render"] = report("metrics.render", [elapsed], series=exposition.count("\n"))
+    return results
+
+async def _websocket_session(url: str, query: str) -> Dict[str, float]:
+    """
+    Run one chat turn over the websocket and time it.
+
+    Args:
+        url (str): Websocket URL of the server.
+        query (str): User message to send.
+
+    Returns:
+        Dict[str, float]: Start, first-token and end timestamps of the turn, and the
+            bytes received for the non-streaming events.
+    """
+    import websockets
+    async with websockets.connect(url, max_size=None) as websocket:
+        start = time.perf_counter()
+        await websocket.send(json.dumps({"type": "new_message", "content": query}))
+        first_token, updates, received = None, 0, 0
+        while updates < 2:  # eco del mensaje del usuario y respuesta final
+            raw = await websocket.recv()
+            event = json.loads(raw)
+            if event["type"] == "message_delta":
+                if first_token is None:
+                    first_token = time.perf_counter()
+                continue
+            received += len(raw)
+            if event["type"] in ("message_append", "message_update"):
+                updates += 1
+        end = time.perf_counter()
+    return {"start": start, "first_token": first_token or end, "end": end, "bytes": received}
+
+def bench_websocket_sessions(url: str = os.environ.get("BENCH_WS_URL", "ws://localhost:8000/ws"), sessions: int = 20) -> Dict[str, Dict[str, float]]:
+    """
+    Open many websocket sessions against a running server at once and check that they
+    progress independently: with a non-blocking server the wall time stays close to a
+    single turn instead of the sum of all turns.
+
+    Args:
+        url (str): Websocket URL of a running server (BENCH_WS_URL).
+        sessions (int): Number of simultaneous sessions.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Turn latency metrics, or {} if the server is unreachable.
+    """
+    async def run_all():
+        return await asyncio.gather(*(_websocket_session(url, "¿Cómo puedo contactarlos?") for _ in range(sessions)))
+
+    try:
+        timings, wall_time = time_call(lambda: asyncio.run(run_all()))
+    except OSError as e:
+        print(f"Servidor no disponible en {url}: {e}")
+        return {}
+    latencies = [timing["end"] - timing["start"] for timing in timings]
+    first_tokens = [timing["first_token"] - timing["start"] for timing in timings]
+    return {"sessions": report(
+        f"{sessions} concurrent sessions", latencies, wall_s=wall_time,
+        first_token_p50_ms=percentile(first_tokens, 50) * 1000, concurrency=sum(latencies) / wall_time,
+        bytes_per_turn=sum(timing["bytes"] for timing in timings) / len(timings),
+    )}
+
+def bench_provider_pool(sessions: int = 100, concurrency: int = 8, connect_latency: float = 0.03) -> Dict[str, Dict[str, float]]:
+    """
+    Compare provider calls through separate OpenAI clients per session (one for chat,
+    one for embeddings, as each BackClient and FAQManager used to create) against the
+    shared ProviderClient pool, on a local stub server whose new connections cost
+    `connect_latency` (a stand-in for the TCP and TLS setup to the real API).
+
+    Args:
+        sessions (int): Sessions, each making one chat completion, one streamed
+            completion and one embedding call.
+        concurrency (int): Sessions run in parallel.
+        connect_latency (float): Simulated seconds to set up each connection.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Metrics for the separate and shared paths.
+    """
+    from openai import OpenAI
+
+    messages = [{"role": "user", "content": "¿Cómo recupero mi boleta?"}]
+    results = {}
+    with StubChatCompletionServer(connect_latency=connect_latency) as server:
+
+        def session(chat: Any, embeddings: Any) -> List[float]:
+            _, latencies = time_calls(lambda call: call(), (
+                lambda: chat.chat.completions.create(model="stub", messages=messages),
+                lambda: list(chat.chat.completions.create(model="stub", messages=messages, stream=True)),
+                lambda: embeddings.embeddings.create(model="stub", input=["¿Cómo recupero mi boleta?"]),
+            ))
+            return latencies
+
+        def separate() -> List[float]:
+            chat, embeddings = OpenAI(api_key="offline", base_url=server.base_url), OpenAI(api_key="offline", base_url=server.base_url)
+            try:
+                return session(chat, embeddings)
+            finally:
+                chat.close()
+                embeddings.close()
+
+        provider = ProviderClient(api_key="offline", base_url=server.base_url, max_connections=concurrency)
+        for name, run in (("separate", separate), ("shared", lambda: session(provider.openai, provider.openai))):
+            connections = server.connections
+            session_latencies, elapsed = time_call(lambda: run_concurrently(run, sessions, concurrency)[0])
+            latencies = [latency for result in session_latencies for latency in result]
+            extra = {"calls_per_s": len(latencies) / elapsed, "connections_per_call": (server.connections - connections) / len(latencies)}
+            if name == "shared":
+                stats = provider.stats()
+                extra.update(connections_open=stats["connections_open"], peak_in_flight=stats["peak_in_flight"], retries=stats["retries"])
+            results[name] = report(f"{name} clients, {sessions} sessions x {concurrency} threads", latencies, **extra)
+        provider.close()
+    return results
+
+def bench_startup(runs: int = 5, budget: float = float(os.environ.get("STARTUP_BUDGET_S", "1.0")), history_file: Optional[str] = os.environ.get("BENCH_STARTUP_HISTORY")) -> Dict[str, Dict[str, float]]:
+    """
+    Cold import time of the server module against a startup budget, with the modules
+    that dominate it and any heavy stack (OpenAI, LangChain, Chroma, Swarm) loaded
+    eagerly. With `history_file`, each run is appended as a JSON line with the commit,
+    to track startup time over time.
+
+    Args:
+        runs (int): Fresh interpreters started.
+        budget (float): Allowed import time in seconds (STARTUP_BUDGET_S).
+        history_file (Optional[str]): JSON lines history (BENCH_STARTUP_HISTORY).
+
+    Returns:
+        Dict[str, Dict[str, float]]: Import time of the server module.
+    """
+    measured = measure_import_time("main", runs)
+    for name, seconds in sorted(measured["children"].items(), key=lambda item: item[1], reverse=True)[:8]:
+        print(f"  {name:<40}{seconds * 1000:>10.1f} ms")
+    results = {"main": report(
+        f"import main ({runs} runs)", [measured["import_s"]],
+        budget_s=budget, within_budget=measured["import_s"] <= budget, heavy_modules=",".join(measured["heavy"]) or "none",
+    )}
+    if history_file:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+        with open(history_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": commit, "import_s": measured["import_s"], "heavy": measured["heavy"]}) + "\n")
+    return results
+
+def bench_knowledge_artifact(knowledge_db_file: str = KNOWLEDGE_DB_FILE, copies: int = 20, latency: float = 0.05) -> Dict[str, Dict[str, float]]:
+    """
+    Compare starting a FAQManager that embeds the corpus against one that opens a
+    prebuilt knowledge artifact (with the default backend), in this process and in a fresh interpreter.
+
+    Args:
+        knowledge_db_file (str): Path to the knowledge database file (never modified).
+        copies (int): Reworded copies of each FAQ in the benchmark corpus.
+        latency (float): Simulated seconds per embedding provider call.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Metrics for the embed, build and open paths.
+    """
+    results = {}
+    with work_directory() as work_dir:
+        faqs = JSONAdapter(knowledge_db_file).load_faqs()
+        corpus = [
+            {"question": f"{faq['question']} ({i})", "answer": f"{faq['answer']} Variante {i}.", "category": faq.get("category", "")}
+            for i in range(copies) for faq in faqs
+        ]
+        knowledge_file = os.path.join(work_dir, "knowledge.json")
+        with open(knowledge_file, "w", encoding="utf-8") as f:
+            json.dump({"faq": corpus}, f, ensure_ascii=False)
+        artifact_dir = os.path.join(work_dir, "artifact")
+
+        embeddings = HashEmbeddings(latency=latency)
+        _, elapsed = time_call(lambda: FAQManager(knowledge_file, embeddings=embeddings, backend="numpy", artifact_dir=""))
+        results["embed"] = report(f"start embedding {len(corpus)} FAQs", [elapsed], provider_calls=embeddings.calls)
+
+        _, elapsed = time_call(lambda: build_artifact(knowledge_file, artifact_dir, embeddings=HashEmbeddings(latency=latency)))
+        results["build"] = report("offline artifact build", [elapsed])
+
+        embeddings = HashEmbeddings(latency=latency)
+        manager, elapsed = time_call(lambda: FAQManager(knowledge_file, embeddings=embeddings, artifact_dir=artifact_dir))
+        matrix = manager.knowledge_db.matrix
+        results["open"] = report(
+            "start from artifact", [elapsed],
+            provider_calls=embeddings.calls, memory_mapped=not matrix.flags.writeable, matrix_mb=matrix.nbytes / 2**20,
+        )
+
+        # Proceso nuevo, como un worker de uvicorn: importaciones aparte, solo la apertura
+        script = (
+            "import json, sys, time; from back.database_manager import FAQManager; from bench.stubs import HashEmbeddings; "
+            "start = time.perf_counter(); FAQManager(sys.argv[1], embeddings=HashEmbeddings(), artifact_dir=sys.argv[2]); "
+            "print(json.dumps(time.perf_counter() - start))"
+        )
+        root = os.path.dirname(os.path.abspath(__file__))
+        output = subprocess.run([sys.executable, "-c", script, knowledge_file, artifact_dir], cwd=root, capture_output=True, text=True, check=True,
+                                env={**os.environ, "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "offline")}).stdout
+        results["cold_open"] = report("start from artifact in a new process", [json.loads(output.splitlines()[-1])])
+    return results
+
+BENCHMARKS: Dict[str, Callable[..., Dict]] = {
+    "faq_registry": bench_faq_registry,
+    "embedding_cache": bench_embedding_cache,
+    "query_cache": bench_query_cache,
+    "fast_path": bench_fast_path,
+    "response_cache": bench_response_cache,
+    "hybrid_retrieval": bench_hybrid_retrieval,
+    "search_batch": bench_search_batch,
+    "vector_store": bench_vector_store,
+    "knowledge_store": bench_knowledge_store,
+    "knowledge_artifact": bench_knowledge_artifact,
+    "ticket_store": bench_ticket_store,
+    "ticket_ids": bench_ticket_ids,
+    "ticket_listing": bench_ticket_listing,
+    "conversation_store": bench_conversation_store,
+    "turn_persistence": bench_turn_persistence,
+    "scraper": bench_scraper,
+    "context_window": bench_context_window,
+    "instrumentation": bench_instrumentation,
+    "provider_pool": bench_provider_pool,
+    "websocket_sessions": bench_websocket_sessions,
+    "startup": bench_startup,
+}
+
+def main():
+    """
+    Run the selected benchmarks offline and print their metrics.
+    """
+    parser = argparse.ArgumentParser(description="Offline backend benchmarks")
+    parser.add_argument("benchmarks", nargs="*", choices=list(BENCHMARKS), help="Benchmarks to run (default: all)")
+    args = parser.parse_args()
+
+    for name in args.benchmarks or list(BENCHMARKS):
+        print(f"\n== {name} ==")
+        BENCHMARKS[name]()
+
+if __name__ == "__main__":
+    main()
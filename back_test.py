@@ -1,8 +1,18 @@
 import os
 import sys
 import json
+import time
+import argparse
+import tempfile
+from typing import Dict, Tuple
 from dotenv import load_dotenv
 from back.client import BackClient
+from back.database_manager import FAQManager, TicketDatabase, faq_registry
+from back.query_cache import QueryCache
+from bench.stubs import HashEmbeddings, StubChatCompletionServer
+from bench.fixtures import labeled_queries, loaded_heavy_modules, measure_import_time, percentile
+# Importado aquí para que index_build_s mida la construcción del índice y no la carga de LangChain
+import langchain_text_splitters  # noqa: F401
 import shutil
 
 # Add the current directory to sys.path
@@ -47,12 +57,16 @@ def remove_test_databases():
     Removes test databases and ChromaDB files.
     
     This function cleans up the test environment by deleting temporary database files
-    and the ChromaDB directory.
+    (including the SQLite ticket store and the knowledge journal) and the ChromaDB directory.
     """
     if os.path.exists("test_db_knowledge.json"):
         os.remove("test_db_knowledge.json")
     if os.path.exists("test_db_tickets.json"):
         os.remove("test_db_tickets.json")
+    for path in ("test_db_tickets.sqlite3", "test_db_tickets.sqlite3-wal", "test_db_tickets.sqlite3-shm",
+                 "test_db_knowledge.json.journal", "test_db_knowledge.json.lock"):
+        if os.path.exists(path):
+            os.remove(path)
     # Remove ChromaDB database
     if os.path.exists("./chroma_db"):
         shutil.rmtree("./chroma_db", ignore_errors=True)
@@ -108,5 +122,172 @@ def test_backend():
     # Remove test databases
     remove_test_databases() 
 
+BASELINE_FILE = "back_test_baseline.json"
+
+# Métrica -> (mayor es mejor, tolerancia, tolerancia relativa o absoluta). Solo conteos y proporciones,
+# que no dependen de la máquina
+METRICS: Dict[str, Tuple[bool, float, bool]] = {
+    "import_heavy_modules": (False, 0, False),
+    "index_embedded_texts_per_faq": (False, 0.05, False),
+    "search_recall_at_1": (True, 0.01, False),
+    "search_recall_at_3": (True, 0.01, False),
+    "search_embed_calls_per_query": (False, 0.05, False),
+    "ticket_messages_stored": (True, 0, False),
+    "turn_accuracy": (True, 0.02, False),
+    "llm_requests_per_turn": (False, 0.05, False),
+    "embed_calls_per_turn": (False, 0.05, False),
+}
+
+# Tiempos: se muestran como referencia, pero no se comparan ni se guardan en el baseline
+TIMINGS = ("import_main_s", "index_build_s", "search_p50_ms", "search_p99_ms", "ticket_ops_per_s", "turn_p50_ms", "turn_p99_ms")
+
+def run_offline_benchmarks(knowledge_db_file: str = "db_knowledge.json", turns: int = 60, llm_latency: float = 0.0) -> Dict[str, float]:
+    """
+    Runs the backend benchmarks fully offline and returns their metrics.
+
+    Embeddings come from the deterministic HashEmbeddings model and the agents talk
+    to a StubChatCompletionServer through OPENAI_BASE_URL. The labeled queries are
+    derived from the knowledge database (see bench.fixtures.labeled_queries).
+
+    Args:
+        knowledge_db_file (str): Path to the knowledge database file. Defaults to db_knowledge.json.
+        turns (int): Number of end-to-end BackClient turns. Defaults to 60.
+        llm_latency (float): Simulated seconds per chat completion. Defaults to 0.
+
+    Returns:
+        Dict[str, float]: The METRICS (heavy modules loaded by the server import,
+            texts embedded per FAQ, search recall and embedding calls, stored ticket
+            messages, turn accuracy and provider calls per turn) and the TIMINGS.
+    """
+    os.environ.setdefault("OPENAI_API_KEY", "offline")  # Ningún cliente sale de la máquina
+    metrics = {
+        "import_heavy_modules": len(loaded_heavy_modules("main")),
+        "import_main_s": measure_import_time("main", runs=1)["import_s"],
+    }
+    work_dir = tempfile.mkdtemp()
+    factory, base_url = faq_registry.factory, os.environ.get("OPENAI_BASE_URL")
+    try:
+        knowledge_file = os.path.join(work_dir, "knowledge.json")
+        shutil.copy(knowledge_db_file, knowledge_file)
+
+        embeddings = HashEmbeddings()
+        start = time.perf_counter()
+        manager = FAQManager(knowledge_file, embeddings=embeddings, backend="numpy", artifact_dir="")
+        metrics["index_build_s"] = time.perf_counter() - start
+        metrics["index_embedded_texts_per_faq"] = embeddings.texts / len(manager.faqs)
+
+        queries = labeled_queries(manager)
+        manager.query_cache = QueryCache()
+        embeddings.reset()
+        latencies, at_1, at_3 = [], 0, 0
+        for _, query, expected in queries:
+            start = time.perf_counter()
+            ranked = [result["id"] for result in manager.search_faq(query, k=3)]
+            latencies.append(time.perf_counter() - start)
+            at_1 += ranked[:1] == [expected]
+            at_3 += expected in ranked[:3]
+        metrics["search_recall_at_1"] = at_1 / len(queries)
+        metrics["search_recall_at_3"] = at_3 / len(queries)
+        metrics["search_embed_calls_per_query"] = embeddings.calls / len(queries)
+        metrics["search_p50_ms"] = percentile(latencies, 50) * 1000
+        metrics["search_p99_ms"] = percentile(latencies, 99) * 1000
+
+        ticket_db = TicketDatabase(os.path.join(work_dir, "tickets.json"))
+        start = time.perf_counter()
+        ticket_ids = [ticket_db.save_ticket({"name": "Juan", "email": "juan@example.com", "phone": "123"}, "Hola", "Bienvenido") for _ in range(200)]
+        for i in range(2000):
+            ticket_db.update_ticket(ticket_ids[i % len(ticket_ids)], "Usuario", f"Mensaje {i}")
+        metrics["ticket_ops_per_s"] = 2200 / (time.perf_counter() - start)
+        stored = sum(len(ticket_db.get_ticket(ticket_id)["conversation"]) for ticket_id in ticket_ids)
+        metrics["ticket_messages_stored"] = stored / (2 * len(ticket_ids) + 2000)
+
+        # Los agentes usan el índice con embeddings deterministas y el servidor de chat local
+        faq_registry.clear()
+        turn_embeddings = HashEmbeddings()
+        faq_registry.factory = lambda path: FAQManager(path, embeddings=turn_embeddings, backend="numpy", artifact_dir="")
+        with StubChatCompletionServer(latency=llm_latency) as server:
+            os.environ["OPENAI_BASE_URL"] = server.base_url
+            client = BackClient(knowledge_file, os.path.join(work_dir, "tickets.json"))
+            latencies, correct = [], 0
+            turn_embeddings.reset()  # Sin contar la construcción del índice
+            for _, query, expected in queries[:turns]:
+                client.load_state(None)
+                client.set_user_data(name="Juan Pérez", email="juan@example.com", phone="123456789")
+                client.start_conversation()
+                start = time.perf_counter()
+                response = client.process_user_query(query)
+                latencies.append(time.perf_counter() - start)
+                correct += response.messages[-1]["content"] == manager.faqs[expected]["answer"]
+            metrics["turn_accuracy"] = correct / len(latencies)
+            metrics["turn_p50_ms"] = percentile(latencies, 50) * 1000
+            metrics["turn_p99_ms"] = percentile(latencies, 99) * 1000
+            metrics["llm_requests_per_turn"] = server.requests / len(latencies)
+            metrics["embed_calls_per_turn"] = turn_embeddings.calls / len(latencies)
+    finally:
+        faq_registry.clear()
+        faq_registry.factory = factory
+        if base_url is None:
+            os.environ.pop("OPENAI_BASE_URL", None)
+        else:
+            os.environ["OPENAI_BASE_URL"] = base_url
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return metrics
+
+def compare_with_baseline(metrics: Dict[str, float], baseline: Dict[str, float]) -> bool:
+    """
+    Prints each metric next to its baseline and flags regressions beyond the
+    tolerance in METRICS. The TIMINGS are printed for reference only.
+
+    Args:
+        metrics (Dict[str, float]): Current metrics.
+        baseline (Dict[str, float]): Stored metrics.
+
+    Returns:
+        bool: True if no metric regressed.
+    """
+    passed = True
+    print(f"\n{'metric':<30}{'baseline':>12}{'current':>12}  status")
+    for name, value in metrics.items():
+        if name in TIMINGS:
+            print(f"{name:<30}{'':>12}{value:>12.3f}  info")
+            continue
+        higher_is_better, tolerance, relative = METRICS[name]
+        reference = baseline.get(name)
+        status = "new"
+        if reference is not None:
+            allowed = tolerance * abs(reference) if relative else tolerance
+            regression = reference - value if higher_is_better else value - reference
+            status = "REGRESSION" if regression > allowed + 1e-9 else "ok"
+            passed = passed and status == "ok"
+        print(f"{name:<30}{reference if reference is not None else float('nan'):>12.3f}{value:>12.3f}  {status}")
+    return passed
+
+def main():
+    """
+    Runs the manual backend test, or the offline benchmarks compared against the stored baseline.
+    """
+    parser = argparse.ArgumentParser(description="Backend test")
+    parser.add_argument("--offline", action="store_true", help="Run the offline benchmarks instead of the manual test")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help=f"Baseline file (default: {BASELINE_FILE})")
+    parser.add_argument("--update-baseline", action="store_true", help="Store the current metrics as the baseline")
+    args = parser.parse_args()
+
+    if not args.offline:
+        test_backend()
+        return
+
+    metrics = run_offline_benchmarks()
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    passed = compare_with_baseline(metrics, baseline)
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({name: value for name, value in metrics.items() if name in METRICS}, f, indent=2)
+        print(f"Baseline guardado en {args.baseline}")
+    elif not passed:
+        sys.exit(1)
+
 if __name__ == "__main__":
-    test_backend()
+    main()
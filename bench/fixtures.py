@@ -0,0 +1,302 @@
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+from back.database_manager import FAQManager
+from back.lexical_index import tokenize
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    Compute the q-th percentile (0-100) of a list of values.
+
+    Args:
+        values (List[float]): Sample values.
+        q (float): Percentile to compute.
+
+    Returns:
+        float: The percentile value, or 0 for an empty sample.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def time_call(func: Callable[[], Any]) -> Tuple[Any, float]:
+    """
+    Call a function once and time it.
+
+    Args:
+        func (Callable[[], Any]): Function to call.
+
+    Returns:
+        Tuple[Any, float]: Its result and the elapsed seconds.
+    """
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+def time_calls(func: Callable[[Any], Any], items: Iterable[Any]) -> Tuple[List[Any], List[float]]:
+    """
+    Call a function on each item in order, timing every call.
+
+    Args:
+        func (Callable[[Any], Any]): Function to call.
+        items (Iterable[Any]): Argument of each call.
+
+    Returns:
+        Tuple[List[Any], List[float]]: Results and latencies in seconds, in call order.
+    """
+    results, latencies = [], []
+    for item in items:
+        result, elapsed = time_call(lambda: func(item))
+        results.append(result)
+        latencies.append(elapsed)
+    return results, latencies
+
+@contextmanager
+def work_directory() -> Iterator[str]:
+    """
+    Create a temporary directory for a benchmark and delete it afterwards.
+
+    Yields:
+        str: Path of the directory.
+    """
+    path = tempfile.mkdtemp()
+    try:
+        yield path
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+def paraphrase(question: str, rng: random.Random) -> str:
+    """
+    Simple paraphrase of a question: lowercase, without '¿?' and one word dropped
+    (questions under four words are only lowercased).
+
+    Args:
+        question (str): FAQ question.
+        rng (random.Random): Source of the dropped word.
+
+    Returns:
+        str: The paraphrase.
+    """
+    words = question.strip("¿?").split()
+    if len(words) >= 4:
+        del words[rng.randrange(len(words))]
+    return " ".join(words).lower()
+
+def paraphrase_traffic(questions: List[str], rng: random.Random) -> List[Tuple[str, str]]:
+    """
+    Ask each question verbatim or, half of the time, as a paraphrase.
+
+    Args:
+        questions (List[str]): FAQ questions.
+        rng (random.Random): Source of the choices.
+
+    Returns:
+        List[Tuple[str, str]]: (query, expected question) pairs.
+    """
+    traffic = []
+    for question in questions:
+        if rng.random() < 0.5 or len(question.strip("¿?").split()) < 4:
+            traffic.append((question, question))
+        else:
+            traffic.append((paraphrase(question, rng), question))
+    return traffic
+
+def report(name: str, latencies: List[float], **extra) -> Dict[str, float]:
+    """
+    Print and return latency statistics for a benchmark run.
+
+    Args:
+        name (str): Name of the measured path.
+        latencies (List[float]): Latencies in seconds.
+        **extra: Additional metrics to report.
+
+    Returns:
+        Dict[str, float]: The reported metrics.
+    """
+    metrics = {
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+    }
+    metrics.update(extra)
+    print(f"\033[92m{name}\033[0m: " + ", ".join(f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}" for key, value in metrics.items()))
+    return metrics
+
+def rss_bytes() -> int:
+    """
+    Resident set size of the current process (Linux only, 0 elsewhere).
+
+    Returns:
+        int: Resident memory in bytes.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+def mongo_database(name: str) -> Tuple[Any, str]:
+    """
+    Connect to the MongoDB at MONGO_URI, falling back to an in-memory mongomock.
+
+    Args:
+        name (str): Database name.
+
+    Returns:
+        Tuple[Any, str]: The database and a label of the backend used.
+    """
+    from pymongo import MongoClient
+    from pymongo.errors import PyMongoError
+    try:
+        client = MongoClient(os.environ.get("MONGO_URI", "mongodb://localhost:27017"), serverSelectionTimeoutMS=1000)
+        client.admin.command("ping")
+        client.drop_database(name)
+        return client[name], "mongod"
+    except PyMongoError:
+        import mongomock
+        return mongomock.MongoClient()[name], "mongomock"
+
+def run_concurrently(task: Callable[[], str], calls: int, workers: int) -> Tuple[List[str], List[float]]:
+    """
+    Run a task many times from a thread pool, recording results and latencies in call order.
+
+    Args:
+        task (Callable[[], str]): Task to run.
+        calls (int): Number of calls.
+        workers (int): Number of threads.
+
+    Returns:
+        Tuple[List[str], List[float]]: Results and latencies in seconds.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        outcomes = list(executor.map(lambda _: time_call(task), range(calls)))
+    return [result for result, _ in outcomes], [latency for _, latency in outcomes]
+
+class CountingCollection:
+    """
+    Collection proxy that counts the write operations sent to the database.
+    """
+
+    WRITE_METHODS = frozenset({"insert_one", "insert_many", "update_one", "update_many", "replace_one", "bulk_write", "find_one_and_update", "delete_one", "delete_many"})
+
+    def __init__(self, collection: Any):
+        self._collection = collection
+        self._lock = threading.Lock()
+        self.writes = 0
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._collection, name)
+        if name not in self.WRITE_METHODS:
+            return attribute
+
+        def counted(*args, **kwargs):
+            with self._lock:
+                self.writes += 1
+            return attribute(*args, **kwargs)
+        return counted
+
+def load_queries(knowledge_db_file: str, limit: int) -> List[str]:
+    """
+    Load FAQ questions from the knowledge database to use as benchmark queries.
+
+    Args:
+        knowledge_db_file (str): Path to the knowledge database file.
+        limit (int): Maximum number of queries.
+
+    Returns:
+        List[str]: Benchmark queries.
+    """
+    with open(knowledge_db_file, "r", encoding="utf-8") as f:
+        faqs = json.load(f)["faq"]
+    return [faq["question"] for faq in faqs[:limit]]
+
+def labeled_queries(manager: FAQManager, seed: int = 0) -> List[Tuple[str, str, str]]:
+    """
+    Build a labeled query set from the indexed FAQs: every question verbatim, a
+    paraphrase of it (lowercase, without punctuation and one word), and a keyword
+    query made of the words that only appear in that FAQ.
+
+    Args:
+        manager (FAQManager): Manager holding the FAQs.
+        seed (int): Seed of the paraphrases. Defaults to 0.
+
+    Returns:
+        List[Tuple[str, str, str]]: (kind, query, expected FAQ ID) triples.
+    """
+    rng = random.Random(seed)
+    queries = []
+    for faq_id, faq in manager.faqs.items():
+        question = faq["question"]
+        queries.append(("verbatim", question, faq_id))
+        queries.append(("paraphrase", paraphrase(question, rng), faq_id))
+        unique = [term for term in dict.fromkeys(tokenize(f"{faq['question']} {faq['answer']}")) if len(manager.lexical_index._postings.get(term, ())) == 1]
+        if unique:
+            queries.append(("keyword", " ".join(unique[:2]), faq_id))
+    return queries
+
+# Pilas pesadas que no deben cargarse al importar el servidor
+HEAVY_MODULES = ("openai", "langchain", "langchain_core", "langchain_openai", "langchain_community", "chromadb", "swarm", "back.client", "back.database_manager")
+
+def loaded_heavy_modules(module: str = "main") -> List[str]:
+    """
+    List the HEAVY_MODULES that importing a module loads, in a fresh interpreter.
+
+    Args:
+        module (str): Module to import. Defaults to "main".
+
+    Returns:
+        List[str]: The heavy modules left loaded after the import.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    loaded = subprocess.run(
+        [sys.executable, "-c", f"import json, sys, {module}; print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"],
+        cwd=root, capture_output=True, text=True, check=True,
+    ).stdout.strip().splitlines()[-1]
+    return json.loads(loaded)
+
+def measure_import_time(module: str = "main", runs: int = 5) -> Dict[str, Any]:
+    """
+    Time `python -X importtime -c "import <module>"` in fresh interpreters.
+
+    Args:
+        module (str): Module to import. Defaults to "main".
+        runs (int): Interpreters started; the median is reported.
+
+    Returns:
+        Dict[str, Any]: The median import time in seconds ('import_s'), the median
+            cumulative seconds of each module imported directly by it ('children'), and
+            the HEAVY_MODULES left loaded after the import ('heavy').
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    totals, children = [], {}
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=root, capture_output=True, text=True, check=True).stderr
+        for line in output.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, name = line.split("|")
+            if not cumulative.strip().isdigit():
+                continue  # Encabezado
+            if name.strip() == module and not name.startswith("  "):
+                totals.append(int(cumulative) / 1e6)
+            elif name.startswith("   ") and not name.startswith("     "):
+                # Un nivel de sangría: importado directamente por el módulo (o por site)
+                children.setdefault(name.strip(), []).append(int(cumulative) / 1e6)
+    return {
+        "import_s": statistics.median(totals),
+        "children": {name: statistics.median(values) for name, values in children.items()},
+        "heavy": loaded_heavy_modules(module),
+    }
@@ -0,0 +1,349 @@
+import asyncio
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+import unicodedata
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage
+
+
+class HashEmbeddings(Embeddings):
+    """
+    Deterministic, offline embedding model for benchmarks.
+
+    Each text is embedded as an L2-normalized bag of hashed, accent-folded tokens, so
+    texts sharing words are close in the vector space. The instance counts how many
+    provider calls and texts it has embedded.
+    """
+
+    def __init__(self, dim: int = 256, latency: float = 0.0):
+        """
+        Initialize the HashEmbeddings.
+
+        Args:
+            dim (int): Dimension of the embedding vectors. Defaults to 256.
+            latency (float): Simulated seconds per provider call. Defaults to 0.
+        """
+        self.dim = dim
+        self.latency = latency
+        self.calls = 0
+        self.texts = 0
+        self._lock = threading.Lock()
+
+    def _embed(self, text: str) -> List[float]:
+        folded = unicodedata.normalize("NFKD", text.lower())
+        folded = "".join(c for c in folded if not unicodedata.combining(c))
+        vector = [0.0] * self.dim
+        for token in re.findall(r"\w+", folded):
+            digest = hashlib.md5(token.encode("utf-8")).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def _record(self, count: int):
+        with self._lock:
+            self.calls += 1
+            self.texts += count
+        if self.latency:
+            time.sleep(self.latency)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._record(len(texts))
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self._record(1)
+        return self._embed(text)
+
+    def reset(self):
+        """
+        Reset the call counters.
+        """
+        with self._lock:
+            self.calls = 0
+            self.texts = 0
+
+
+class StubChatLLM:
+    """
+    Deterministic, offline stand-in for the scraper's chat model.
+
+    Extraction prompts are answered with the text that follows the instructions.
+    Grouping prompts are answered with a markdown JSON block holding one
+    question-answer pair per line that ends with '?' and the line after it.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        """
+        Initialize the StubChatLLM.
+
+        Args:
+            latency (float): Simulated seconds per call. Defaults to 0.
+        """
+        self.latency = latency
+        self.calls = 0
+
+    @staticmethod
+    def _prompt_text(prompt: Any) -> str:
+        if isinstance(prompt, str):
+            return prompt
+        return "\n".join(message.content for message in prompt)
+
+    def _answer(self, prompt: Any) -> AIMessage:
+        self.calls += 1
+        instructions, _, text = self._prompt_text(prompt).partition("\n\n")
+        text = text.strip()
+        if "'question'" not in instructions:
+            return AIMessage(content=text)
+        lines = [line.strip() for line in text.split("\n") if line.strip()]
+        pairs = [
+            {"question": line, "answer": lines[i + 1]}
+            for i, line in enumerate(lines[:-1])
+            if line.endswith("?")
+        ]
+        return AIMessage(content="```json\n" + json.dumps(pairs, ensure_ascii=False) + "\n```")
+
+    def invoke(self, prompt: Any) -> AIMessage:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._answer(prompt)
+
+    async def ainvoke(self, prompt: Any) -> AIMessage:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._answer(prompt)
+
+
+class StubChatCompletionServer:
+    """
+    Deterministic, offline OpenAI-compatible chat completions and embeddings endpoint.
+
+    Serves POST /v1/chat/completions and /v1/embeddings (HashEmbeddings vectors) on
+    localhost over keep-alive HTTP/1.1, so the OpenAI client used by Swarm can be
+    pointed at it through `base_url` (or OPENAI_BASE_URL). Each new connection can
+    pay a simulated setup cost, like a TLS handshake to the real API. When the request
+    offers the search_database tool and the last message is from the user, it calls
+    that tool with the user text; after a tool result it answers with the first
+    "Respuesta:" line of the result; otherwise it answers with a fixed text. Both
+    plain and streamed (server-sent events) completions are supported.
+    """
+
+    FALLBACK_ANSWER = "¿En qué más puedo ayudarte?"
+
+    def __init__(self, latency: float = 0.0, host: str = "127.0.0.1", port: int = 0, connect_latency: float = 0.0):
+        """
+        Initialize the StubChatCompletionServer.
+
+        Args:
+            latency (float): Simulated seconds per completion. Defaults to 0.
+            host (str): Interface to listen on. Defaults to 127.0.0.1.
+            port (int): Port to listen on. Defaults to 0 (any free port).
+            connect_latency (float): Simulated seconds to set up each new connection. Defaults to 0.
+        """
+        self.latency = latency
+        self.host = host
+        self.port = port
+        self.connect_latency = connect_latency
+        self.requests = 0
+        self.connections = 0
+        self.embedding_requests = 0
+        self.embeddings = HashEmbeddings()
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    def complete(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build the assistant message for a chat completion request.
+
+        Args:
+            request (Dict[str, Any]): The request body ('messages' and optionally 'tools').
+
+        Returns:
+            Dict[str, Any]: Assistant message with 'content' or 'tool_calls'.
+        """
+        with self._lock:
+            self.requests += 1
+            number = self.requests
+        messages = request.get("messages") or [{}]
+        last = messages[-1]
+        tools = {tool["function"]["name"] for tool in request.get("tools") or []}
+        if last.get("role") == "user" and "search_database" in tools:
+            return {"role": "assistant", "content": None, "tool_calls": [{
+                "id": f"call_{number}",
+                "type": "function",
+                "function": {"name": "search_database", "arguments": json.dumps({"messages": last.get("content") or ""}, ensure_ascii=False)},
+            }]}
+        content = self.FALLBACK_ANSWER
+        if last.get("role") == "tool":
+            answers = [line[len("Respuesta: "):] for line in (last.get("content") or "").split("\n") if line.startswith("Respuesta: ")]
+            content = answers[0] if answers else (last.get("content") or content)
+        return {"role": "assistant", "content": content}
+
+    def _handler(self) -> type:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Conexiones keep-alive, como la API real
+            disable_nagle_algorithm = True  # Sin esperar el ACK retardado entre encabezados y cuerpo
+
+            def log_message(self, format: str, *args: Any):
+                pass
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+                if stub.connect_latency:
+                    time.sleep(stub.connect_latency)
+
+            def _send_json(self, data: Dict[str, Any]):
+                body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path.rstrip("/").endswith("/embeddings"):
+                    texts = request.get("input") or []
+                    texts = [texts] if isinstance(texts, str) else [text if isinstance(text, str) else json.dumps(text) for text in texts]
+                    with stub._lock:
+                        stub.embedding_requests += 1
+                    self._send_json({
+                        "object": "list",
+                        "model": request.get("model", "stub"),
+                        "data": [{"object": "embedding", "index": i, "embedding": vector} for i, vector in enumerate(stub.embeddings.embed_documents(texts))],
+                        "usage": {"prompt_tokens": 0, "total_tokens": 0},
+                    })
+                    return
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+                if stub.latency:
+                    time.sleep(stub.latency)
+                message = stub.complete(request)
+                completion_id = f"chatcmpl-stub-{stub.requests}"
+                finish_reason = "tool_calls" if message.get("tool_calls") else "stop"
+                prompt_tokens = sum(len(m.get("content") or "") for m in request.get("messages", [])) // 4
+                completion_tokens = len(message.get("content") or json.dumps(message.get("tool_calls"))) // 4
+                base = {"id": completion_id, "created": int(time.time()), "model": request.get("model", "stub")}
+                if not request.get("stream"):
+                    self._send_json({
+                        **base,
+                        "object": "chat.completion",
+                        "choices": [{"index": 0, "message": message, "finish_reason": finish_reason, "logprobs": None}],
+                        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+                    })
+                    return
+
+                # Fragmentos de server-sent events, como la API de OpenAI con stream=True
+                deltas = [{"role": "assistant", "content": ""}]
+                if message.get("tool_calls"):
+                    deltas += [{"tool_calls": [{"index": i, **call}]} for i, call in enumerate(message["tool_calls"])]
+                else:
+                    deltas += [{"content": word} for word in re.findall(r"\S+\s*", message["content"])]
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")  # Sin Content-Length, la conexión sigue abierta
+                self.end_headers()
+                chunks = [{"index": 0, "delta": delta, "finish_reason": None} for delta in deltas]
+                chunks.append({"index": 0, "delta": {}, "finish_reason": finish_reason})
+                events = [f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [choice]}, ensure_ascii=False)}\n\n".encode("utf-8") for choice in chunks]
+                for event in events + [b"data: [DONE]\n\n"]:
+                    self.wfile.write(f"{len(event):x}\r\n".encode("ascii") + event + b"\r\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+        return Handler
+
+    def start(self) -> "StubChatCompletionServer":
+        """
+        Start serving in a background thread.
+
+        Returns:
+            StubChatCompletionServer: The server itself.
+        """
+        self._server = ThreadingHTTPServer((self.host, self.port), self._handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop the server.
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "StubChatCompletionServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any):
+        self.stop()
+
+def serve_fixture_site(pages: int, fanout: int, latency: float, revisions: Optional[Dict[int, int]] = None) -> Tuple[Any, str]:
+    """
+    Serve a local FAQ site shaped as a tree: page n links to its `fanout` children,
+    back to the root, and to itself with a query string and a fragment. Responses
+    carry an ETag and honor If-None-Match.
+
+    Args:
+        pages (int): Number of pages.
+        fanout (int): Links to child pages per page.
+        latency (float): Seconds each response is delayed.
+        revisions (Optional[Dict[int, int]]): Mutable map of page -> revision; changing
+            a page's revision changes its content.
+
+    Returns:
+        Tuple[Any, str]: The running server (call shutdown()) and the base URL of the pages.
+    """
+    class FixtureHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            page = int(self.path.split("?")[0].rstrip("/").rsplit("/", 1)[-1] or 0)
+            children = [child for child in range(fanout * page + 1, fanout * page + fanout + 1) if child < pages]
+            links = "".join(f'<a href="/page/{child}">Tema {child}</a>' for child in children)
+            revision = (revisions or {}).get(page, 0)
+            body = (
+                f"<html><body><h1>Tema {page} | Falabella</h1>"
+                f"<p>¿Cuál es el horario del tema {page}?</p><p>El horario del tema {page} es de 9 a {18 + revision} horas.</p>"
+                f"<p>¿Cómo contacto al tema {page}?</p><p>Escribiendo a tema{page}@example.com.</p>"
+                f'{links}<a href="/page/0">Inicio</a><a href="/page/{page}?ref=1#top">Esta página</a></body></html>'
+            ).encode("utf-8")
+            etag = f'"{hashlib.sha1(body).hexdigest()}"'
+            time.sleep(latency)
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/page/"
@@ -1,21 +1,29 @@
-from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect, HTTPException
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 import json
 import os
 from datetime import datetime
-import socket
-from openai import OpenAI
 from dotenv import load_dotenv, find_dotenv
 from pymongo import MongoClient
 from pydantic import BaseModel
-from typing import List, Dict, Any
-from back.client import BackClient
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Set
+from back.client_pool import BackClientPool
+from back.conversation_store import ConversationStore
+from back.conversation_writer import ConversationWriter
+from back.id_allocator import MongoTicketIdAllocator
+from back.ticket_listing import TicketListing
+from back.metrics import metrics, span
 import asyncio
-from fastapi.responses import JSONResponse
+import contextvars
+import functools
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from fastapi.responses import JSONResponse, PlainTextResponse
 import argparse
-from bson import json_util
+
+if TYPE_CHECKING:
+    from back.client import BackClient
 
 
 def parse_arguments():
@@ -48,23 +56,154 @@ uri = os.environ.get("MONGO_URI", "mongodb://mongodb:27017")
 PORT = 8000
 
 
-client = MongoClient(uri)
+KNOWLEDGE_DB_FILE = "db_knowledge.json"
+
+# Sin conexiones ni consultas al importar: los índices se crean en el arranque (lifespan)
+client = MongoClient(uri, connect=False)
 db = client['vue-chatbot']
-messages_collection = db['messages']
-messages_collection.delete_many({}) # Clear the messages collection
-messages_collection.insert_one({'role': 'system', 'content': 'You are a helpful assistant'}) # Add a system message
+counters_collection = db['counters']
+conversation_store = ConversationStore(
+    db['conversations'],
+    db['conversation_counters'],
+    ttl_seconds=int(os.environ.get("CONVERSATION_TTL_SECONDS", str(7 * 24 * 3600))),
+    create_indexes=False,
+)
 
 tickets_collection = db['tickets']
+ticket_id_allocator = MongoTicketIdAllocator(counters_collection)
+ticket_listing = TicketListing(tickets_collection, conversation_store, create_indexes=False)
+
+def prepare_database():
+    """
+    Create the MongoDB indexes and move the ticket counter past the existing
+    tickets (idempotent). Runs at startup, so importing the app never touches MongoDB.
+    """
+    tickets_collection.create_index("id", unique=True)
+    conversation_store.create_indexes()
+    ticket_listing.create_indexes()
+    ticket_id_allocator.seed(tickets_collection)
+
+def create_back_client() -> "BackClient":
+    """
+    Build a BackClient for the pool. The agent and retrieval stacks (Swarm, OpenAI,
+    LangChain) are imported here, on the first build, instead of with the app.
+    """
+    from back.client import BackClient
+    # Los tickets de SQLite y los del websocket comparten el contador de MongoDB
+    return BackClient(KNOWLEDGE_DB_FILE, "db_tickets.json", ticket_id_allocator=ticket_id_allocator)
 
 # Get the API key from environment variables
 
-def get_messages():
-    messages = list(messages_collection.find({}))
-    for message in messages:
-        message.pop('_id')
-    return messages
+# Pool acotado para el trabajo bloqueante (Swarm/OpenAI, pymongo, SQLite) fuera del event loop
+chat_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("CHAT_WORKERS", "16")), thread_name_prefix="chat")
+
+# Pool de BackClient precalentados, con afinidad por sesión
+client_pool = BackClientPool(
+    create_back_client,
+    size=int(os.environ.get("BACK_CLIENT_POOL_SIZE", "10")),
+    idle_timeout=float(os.environ.get("BACK_CLIENT_IDLE_TIMEOUT", "900")),
+    executor=chat_executor,
+)
 
-app = FastAPI(debug=True)
+# Única vía de escritura de los turnos del chat: mensajes en conversation_store, transcripción y campos del ticket en tickets
+conversation_writer = ConversationWriter(
+    conversation_store,
+    tickets_collection,
+    executor=chat_executor,
+    max_batch=int(os.environ.get("CONVERSATION_WRITE_BATCH", "256")),
+    max_delay=float(os.environ.get("CONVERSATION_WRITE_DELAY", "0.01")),
+)
+
+# Sesiones con un websocket abierto: cada una tiene una sola conexión, que asigna sus secuencias en memoria
+open_sessions: Set[str] = set()
+
+# Métricas de componentes, calculadas al leer /metrics
+metrics.register_collector("back_client_pool", client_pool.stats)
+metrics.register_collector("conversation_writer", conversation_writer.stats)
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Run a blocking call in the chat thread pool without blocking the event loop.
+    The call is timed as a span and runs in a copy of the current context, so its
+    nested spans join the caller's trace.
+    """
+    owner = getattr(func, "__self__", None)
+    name = f"{type(owner).__name__}.{func.__name__}" if owner is not None else getattr(func, "__name__", "call")
+
+    def call():
+        with span(f"blocking.{name}"):
+            return func(*args, **kwargs)
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(chat_executor, contextvars.copy_context().run, call)
+
+async def stream_user_query(websocket: WebSocket, chat_client: "BackClient", user_query: str):
+    """
+    Process a user query in the thread pool, forwarding partial assistant text to the
+    websocket as 'message_delta' events while the completion streams. It only
+    returns (or raises) once the turn finished, so the caller's worker is never
+    released while the thread pool still uses it.
+
+    Returns:
+        Response: The final Swarm response.
+    """
+    loop = asyncio.get_running_loop()
+    tokens = asyncio.Queue()
+
+    def on_token(token: str):
+        loop.call_soon_threadsafe(tokens.put_nowait, token)
+
+    turn = loop.run_in_executor(chat_executor, contextvars.copy_context().run, functools.partial(chat_client.process_user_query, user_query, on_token=on_token))
+    try:
+        while True:
+            next_token = asyncio.ensure_future(tokens.get())
+            done, _ = await asyncio.wait({next_token, turn}, return_when=asyncio.FIRST_COMPLETED)
+            if next_token not in done:
+                next_token.cancel()
+                break
+            await websocket.send_text(json.dumps({'type': 'message_delta', 'content': next_token.result()}))
+        # Los fragmentos llegan a la cola antes de que termine el turno
+        while not tokens.empty():
+            await websocket.send_text(json.dumps({'type': 'message_delta', 'content': tokens.get_nowait()}))
+    finally:
+        # Si el envío falla (cliente desconectado), el hilo sigue usando el cliente: no se devuelve al pool hasta que termine
+        if not turn.done():
+            await asyncio.wait({turn})
+    return await turn
+
+async def warm_up():
+    """
+    Build the pool workers, then export the stats of the shared FAQ index caches and
+    of the provider connection pool.
+    """
+    try:
+        await client_pool.start()
+    except Exception as e:
+        # Las solicitudes reintentan el arranque del pool al pedir un worker
+        print(f"Error al precalentar el pool: {e}")
+        return
+    from back.database_manager import get_faq_manager
+    faq_manager = get_faq_manager(KNOWLEDGE_DB_FILE)
+    metrics.register_collector("response_cache", faq_manager.response_cache.stats)
+    metrics.register_collector("query_cache", faq_manager.query_cache.stats)
+    from back.provider_client import provider_stats
+    metrics.register_collector("provider_pool", provider_stats)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await run_blocking(prepare_database)
+    await conversation_writer.start()
+    # El servidor acepta conexiones mientras se precalienta el pool; las primeras solicitudes lo esperan
+    warm = asyncio.create_task(warm_up())
+    try:
+        yield
+    finally:
+        warm.cancel()
+        await conversation_writer.stop()
+        from back.provider_client import close_provider_clients
+        close_provider_clients()
+
+app = FastAPI(debug=True, lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Allows all origins
@@ -88,95 +227,133 @@ async def root(request: Request):
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
+    ticket_id = None
+    resolved = False
     try:
-        chat_client = BackClient("db_knowledge.json", "db_tickets.json")
-        chat_client.set_user_data(name="Sebastian", email="sebag@gmail.com", phone="1234567890")
-        message = chat_client.start_conversation().messages[-1]
-
-        ticket_id = f"TICKET-{len(list(tickets_collection.find())) + 1:04d}"
-        tickets_collection.insert_one({
-                "id": ticket_id,
-                "user_data": chat_client.user_data,
-                "createdAt": datetime.now().isoformat(),
-                "conversation": [],
-                "resolved": False
-            })
+        # El cliente que se reconecta envía su sesión anterior; se retoma si el pool aún guarda su estado
+        # y no está abierta en otra conexión
+        requested = websocket.query_params.get('session')
+        if requested and requested not in open_sessions and client_pool.has_session(requested):
+            ticket_id = requested
+            open_sessions.add(ticket_id)
+            await conversation_writer.flush(ticket_id)
+            ticket = await run_blocking(
+                tickets_collection.find_one,
+                {"id": ticket_id},
+                {"description": 1, "resolved": 1, "cleared_seq": 1, "conversation": {"$slice": -1}},
+            ) or {}
+            described = "description" in ticket
+            resolved = bool(ticket.get("resolved"))
+            last_seq = max((message.get("seq", 0) for message in ticket.get("conversation", [])), default=0)
+            cleared_seq = ticket.get("cleared_seq", 0)
+        else:
+            ticket_id = await run_blocking(ticket_id_allocator.allocate)
+            open_sessions.add(ticket_id)
+            async with client_pool.checkout(ticket_id) as chat_client:
+                await run_blocking(chat_client.set_user_data, name="Sebastian", email="sebag@gmail.com", phone="1234567890", ticket_id=ticket_id)
+                message = (await run_blocking(chat_client.start_conversation)).messages[-1]
+                user_data = chat_client.user_data
+
+            await run_blocking(tickets_collection.insert_one, {
+                    "id": ticket_id,
+                    "user_data": user_data,
+                    "createdAt": datetime.now().isoformat(),
+                    "conversation": [],
+                    "resolved": False
+                })
+            described = False
+            # Vista en vivo: clear_messages oculta los mensajes hasta esta secuencia sin borrarlos del ticket;
+            # last_seq es la última secuencia asignada, sembrada desde la transcripción al retomar la sesión
+            last_seq = 0
+            cleared_seq = 0
+        # Si es la misma sesión, el cliente pide solo lo posterior a su cursor 'since'; si cambió, la descarta
+        await websocket.send_text(json.dumps({'type': 'session', 'content': ticket_id}))
         while True:
             data = await websocket.receive_text()
             message_data = json.loads(data)
             if message_data['type'] == 'get_messages':
-                messages = get_messages()
-                await websocket.send_text(json.dumps({'type': 'message_update', 'content': messages[1:]}))
+                # Con 'since' solo se envían los mensajes posteriores al cursor del cliente
+                since = message_data.get('since')
+                await conversation_writer.flush(ticket_id)
+                messages = await run_blocking(conversation_store.get_messages, ticket_id, max(since or 0, cleared_seq))
+                event_type = 'message_update' if since is None else 'message_append'
+                await websocket.send_text(json.dumps({'type': event_type, 'content': messages}))
 
             if message_data['type'] == 'new_message':
                 new_message = message_data['content']
                 user_message = {'role': 'user', 'content': new_message}
+                # Campos del ticket que cambian con este turno; se guardan junto con los mensajes
+                ticket_fields = {}
+                if not described:
+                    ticket_fields['description'] = new_message
+                    described = True
                 if new_message.lower() == 'cerrar':
-                    tickets_collection.update_one(
-                    {"id": ticket_id},
-                        {"$set": {"resolved": True}}
-                    )
-
-                messages_collection.insert_one(user_message)
-                messages = get_messages()
-                await websocket.send_text(json.dumps({'type': 'message_update', 'content': messages[1:]}))
-
-                tickets_collection.update_one(
-                    {"id": ticket_id},
-                    {"$push": {"conversation": user_message}}
-                )
-                
-                response = chat_client.process_user_query(new_message)
-                message = response.messages[-1]
-                ai_message = {'role': 'assistant', 'content': message['content']}
-                messages_collection.insert_one(ai_message)
-                messages = get_messages()
-                
-                tickets_collection.update_one(
-                    {"id": ticket_id},
-                    {"$push": {"conversation": ai_message}}
-                )
-                
-                await websocket.send_text(json.dumps({'type': 'message_update', 'content': messages[1:]}))
+                    ticket_fields['resolved'] = True
+                    resolved = True
+
+                with span("ws.turn", ticket_id=ticket_id):
+                    # Las secuencias del par usuario/asistente se asignan en el proceso (la conexión es dueña de la sesión)
+                    # y se guardan juntas al final del turno
+                    seq = last_seq + 1
+                    last_seq = seq + 1
+                    await websocket.send_text(json.dumps({'type': 'message_append', 'content': [{**user_message, 'seq': seq}]}))
+
+                    try:
+                        async with client_pool.checkout(ticket_id) as chat_client:
+                            response = await stream_user_query(websocket, chat_client, new_message)
+                    except Exception:
+                        await conversation_writer.submit(ticket_id, [{**user_message, 'seq': seq}], ticket_fields)
+                        raise
+                    message = response.messages[-1]
+                    ai_message = {'role': 'assistant', 'content': message['content']}
+                    if response.context_variables.get('fast_path'):
+                        ai_message['fast_path'] = True
+                    elif response.context_variables.get('response_cache'):
+                        ai_message['cached'] = True
+                    # Escritura diferida: el par usuario/asistente y los campos del ticket se agrupan con otros turnos
+                    await conversation_writer.submit(ticket_id, [{**user_message, 'seq': seq}, {**ai_message, 'seq': seq + 1}], ticket_fields)
+                    await websocket.send_text(json.dumps({'type': 'message_append', 'content': [{**ai_message, 'seq': seq + 1}]}))
 
             if message_data['type'] == 'clear_messages':
-                messages_collection.delete_many({})
-                messages_collection.insert_one({'role': 'system', 'content': 'You are a helpful assistant'})
-                messages = get_messages()
-                await websocket.send_text(json.dumps({'type': 'message_update', 'content': messages[1:]}))
+                # Solo se reinician la vista y el historial del agente; la transcripción del ticket se conserva
+                cleared_seq = last_seq
+                # Se guarda en el ticket para que una reconexión conserve la vista limpia
+                await conversation_writer.submit(ticket_id, [], {'cleared_seq': cleared_seq})
+                async with client_pool.checkout(ticket_id) as chat_client:
+                    await run_blocking(chat_client.clear_history)
+                await websocket.send_text(json.dumps({'type': 'message_update', 'content': []}))
 
             if message_data['type'] == 'ping':
                 await websocket.send_text(json.dumps({'type': 'pong'}))
 
     except WebSocketDisconnect:
         print("Client disconnected")
-        print(get_messages())
+    finally:
+        # Una sesión abierta se conserva para que el cliente pueda reconectarse; el pool la descarta tras idle_timeout
+        open_sessions.discard(ticket_id)
+        if ticket_id is not None and resolved:
+            await client_pool.close_session(ticket_id)
 
 @app.get("/api/tickets")
-async def get_tickets():
-
+async def get_tickets(
+    resolved: Optional[bool] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+):
+    # Resumen paginado por cursor; la conversación completa se pide por ticket
     try:
-        tickets_bson = tickets_collection.find()
-        tickets = json.loads(json_util.dumps(tickets_bson))
-        formatted_tickets = [
-            {
-                "id": str(ticket["id"]),  # Ensure id is a string
-                "title": f"Consulta de {ticket['user_data']['name']}",
-                "description": ticket['conversation'][0]['content'] if ticket['conversation'] else "Sin descripción",
-                "createdAt": str(ticket.get('createdAt', "Fecha no disponible")),  # Ensure date is a string
-                "resolved": bool(ticket.get('resolved', False)),  # Ensure resolved is a boolean
-                # "user_data": ticket['user_data'],
-                "conversation": ticket['conversation']
-            }
-            for ticket in tickets
-        ]
-        return JSONResponse(content=formatted_tickets)
-    except Exception as e:
-        print(f"Error in get_tickets: {str(e)}")
-        return JSONResponse(content={"error": str(e)}, status_code=500)
-
-# Inicializar el BackClient
-back_client = BackClient("db_knowledge.json", "db_tickets.json")
+        page = await run_blocking(ticket_listing.list_page, resolved=resolved, cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse(content=page)
+
+@app.get("/api/tickets/{ticket_id}/conversation")
+async def get_ticket_conversation(ticket_id: str):
+    await conversation_writer.flush(ticket_id)
+    conversation = await run_blocking(ticket_listing.get_conversation, ticket_id)
+    if conversation is None:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    return JSONResponse(content=conversation)
 
 class UserData(BaseModel):
     name: str
@@ -185,65 +362,50 @@ class UserData(BaseModel):
 
 class UserQuery(BaseModel):
     query: str
+    session_id: Optional[str] = None
 
 @app.post("/start_conversation")
 async def start_conversation(user_data: UserData):
-    client = await client_pool.get_client()
-    try:
-        client.set_user_data(user_data.name, user_data.email, user_data.phone)
-        response = client.start_conversation()
-        return {"message": response.messages[-1]["content"]}
-    finally:
-        await client_pool.release_client(client)
+    session_id = uuid.uuid4().hex
+    async with client_pool.checkout(session_id) as client:
+        await run_blocking(client.set_user_data, user_data.name, user_data.email, user_data.phone)
+        response = await run_blocking(client.start_conversation)
+        return {"message": response.messages[-1]["content"], "session_id": session_id}
 
 @app.post("/process_query")
 async def process_query(user_query: UserQuery):
-    client = await client_pool.get_client()
-    try:
-        if not client.user_data:
-            raise HTTPException(status_code=400, detail="Conversation not started. Please start a conversation first.")
-        response = client.process_user_query(user_query.query)
+    if not user_query.session_id or not client_pool.has_session(user_query.session_id):
+        raise HTTPException(status_code=400, detail="Conversation not started. Please start a conversation first.")
+    async with client_pool.checkout(user_query.session_id) as client:
+        response = await run_blocking(client.process_user_query, user_query.query)
         return {"message": response.messages[-1]["content"]}
-    finally:
-        await client_pool.release_client(client)
 
 @app.get("/tickets")
 async def get_tickets():
-    client = await client_pool.get_client()
-    try:
-        tickets = client.get_all_tickets()
+    async with client_pool.checkout() as client:
+        tickets = await run_blocking(client.get_all_tickets)
         return tickets
-    finally:
-        await client_pool.release_client(client)
 
 @app.get("/tickets/{ticket_id}")
 async def get_ticket(ticket_id: str):
-    client = await client_pool.get_client()
-    try:
-        ticket = client.get_ticket(ticket_id)
-        if not ticket:
-            raise HTTPException(status_code=404, detail="Ticket not found")
-        return ticket
-    finally:
-        await client_pool.release_client(client)
-
-# Pool de conexiones para BackClient
-class BackClientPool:
-    def __init__(self, max_connections=10):
-        self.max_connections = max_connections
-        self.clients = asyncio.Queue(maxsize=max_connections)
-        self.semaphore = asyncio.Semaphore(max_connections)
-
-    async def get_client(self):
-        async with self.semaphore:
-            if self.clients.empty():
-                return BackClient("db_knowledge.json", "db_tickets.json")
-            return await self.clients.get()
-
-    async def release_client(self, client):
-        await self.clients.put(client)
-
-client_pool = BackClientPool()
+    async with client_pool.checkout() as client:
+        ticket = await run_blocking(client.get_ticket, ticket_id)
+    if not ticket:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    return ticket
+
+@app.get("/api/pool")
+async def get_pool_stats():
+    return client_pool.stats()
+
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/response_cache")
+async def get_response_cache_stats():
+    from back.database_manager import get_faq_manager
+    return get_faq_manager(KNOWLEDGE_DB_FILE).response_cache.stats()
 
 # Modify your main block at the bottom:
 if __name__ == "__main__":
@@ -0,0 +1,64 @@
+import asyncio
+
+from back.client_pool import BackClientPool
+
+class FakeClient:
+    """
+    Worker double that records the conversation state loaded on it.
+    """
+
+    def __init__(self):
+        self.state = None
+
+    def export_state(self):
+        return self.state
+
+    def load_state(self, state=None):
+        self.state = state
+
+def test_busy_session_does_not_block_other_sessions():
+    async def scenario():
+        pool = BackClientPool(FakeClient, size=2)
+        release = asyncio.Event()
+
+        async def busy_turn():
+            async with pool.checkout("A"):
+                await release.wait()
+
+        # Una sesión ocupada con más solicitudes en cola que workers en el pool
+        queued = [asyncio.create_task(busy_turn()) for _ in range(pool.size + 2)]
+        await asyncio.sleep(0.01)
+        async with pool.checkout("B") as client:
+            served = client is not None
+        release.set()
+        await asyncio.gather(*queued)
+        return served, pool.stats()
+
+    served, stats = asyncio.run(asyncio.wait_for(scenario(), timeout=5))
+    assert served
+    assert stats["busy"] == 0
+    assert stats["checkouts"] == 2 + 2 + 1  # Las 4 solicitudes de A y la de B
+
+def test_requests_wait_when_every_worker_is_busy():
+    async def scenario():
+        pool = BackClientPool(FakeClient, size=1)
+        release = asyncio.Event()
+
+        async def hold():
+            async with pool.checkout("A"):
+                await release.wait()
+
+        async def other():
+            async with pool.checkout("B"):
+                pass
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(other())
+        await asyncio.sleep(0.01)
+        blocked = not waiter.done()
+        release.set()
+        await asyncio.wait_for(asyncio.gather(holder, waiter), timeout=1)
+        return blocked
+
+    assert asyncio.run(scenario())
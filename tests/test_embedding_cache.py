@@ -0,0 +1,29 @@
+import numpy as np
+
+from back.embedding_cache import EmbeddingCache
+from bench.stubs import HashEmbeddings
+
+def test_vectors_stored_by_another_process_are_hits(tmp_path):
+    # Dos instancias sobre el mismo directorio hacen de dos procesos
+    first = EmbeddingCache(HashEmbeddings(), cache_dir=str(tmp_path), model="hash", flush_interval=0)
+    second_provider = HashEmbeddings()
+    second = EmbeddingCache(second_provider, cache_dir=str(tmp_path), model="hash", flush_interval=0)
+
+    first.embed_query("¿Cómo recupero mi boleta?")
+    first.embed_documents(["Seguimiento de pedidos", "Cambios y devoluciones"])
+
+    second.embed_query("¿Cómo recupero mi boleta?")
+    second.embed_documents(["Seguimiento de pedidos", "Cambios y devoluciones"])
+    assert second_provider.calls == 0
+    assert second.hits == 3
+
+def test_concurrent_misses_do_not_duplicate_rows(tmp_path):
+    first = EmbeddingCache(HashEmbeddings(), cache_dir=str(tmp_path), model="hash", flush_interval=0)
+    second = EmbeddingCache(HashEmbeddings(), cache_dir=str(tmp_path), model="hash", flush_interval=0)
+    # Ambos fallaron la consulta antes de que el otro guardara el vector
+    key = first._key("Medios de pago")
+    vector = HashEmbeddings().embed_query("Medios de pago")
+    first._store([key], [vector])
+    second._store([key], [vector])
+
+    assert int(np.count_nonzero(second._keys == key)) == 1
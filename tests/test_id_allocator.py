@@ -0,0 +1,22 @@
+import mongomock
+
+from back.database_manager import TicketDatabase
+from back.id_allocator import MongoTicketIdAllocator
+
+USER = {"name": "Juan", "email": "juan@example.com", "phone": "123"}
+
+def test_sqlite_and_mongo_tickets_share_one_sequence(tmp_path):
+    db = mongomock.MongoClient()["tickets-test"]
+    allocator = MongoTicketIdAllocator(db["counters"])
+
+    # Tickets guardados en SQLite antes de configurar MongoDB
+    TicketDatabase(str(tmp_path / "tickets.sqlite3")).save_ticket(USER, "Hola", "Bienvenido")
+    ticket_db = TicketDatabase(str(tmp_path / "tickets.sqlite3"), id_allocator=allocator)
+
+    ids = []
+    for _ in range(5):
+        ids.append(ticket_db.save_ticket(USER, "Hola", "Bienvenido"))
+        ids.append(allocator.allocate())
+
+    assert "TICKET-0001" not in ids
+    assert len(set(ids)) == len(ids)
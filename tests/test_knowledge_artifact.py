@@ -0,0 +1,24 @@
+import json
+
+from back.database_manager import FAQManager
+from back.make_db import build_artifact
+from bench.stubs import HashEmbeddings
+
+FAQS = [
+    {"question": "¿Cómo recupero mi boleta?", "answer": "Desde Mis compras.", "category": "Boletas"},
+    {"question": "¿Cuáles son los medios de pago?", "answer": "Tarjetas y transferencia.", "category": "Pagos"},
+]
+
+def test_artifact_is_searched_from_the_shared_mapping_by_default(tmp_path, monkeypatch):
+    monkeypatch.delenv("FAQ_VECTOR_BACKEND", raising=False)
+    knowledge_file = tmp_path / "knowledge.json"
+    knowledge_file.write_text(json.dumps({"faq": FAQS}, ensure_ascii=False), encoding="utf-8")
+    build_artifact(str(knowledge_file), str(tmp_path / "artifact"), embeddings=HashEmbeddings())
+
+    embeddings = HashEmbeddings()
+    manager = FAQManager(str(knowledge_file), embeddings=embeddings, artifact_dir=str(tmp_path / "artifact"))
+
+    # Sin copias por proceso: la matriz del índice es el mapeo de solo lectura del artefacto
+    assert manager.backend == "numpy"
+    assert not manager.knowledge_db.matrix.flags.writeable
+    assert embeddings.calls == 0
@@ -0,0 +1,37 @@
+import asyncio
+
+import httpx
+
+from back import falabella_scraper
+from back.falabella_scraper import FAQScraper
+from bench.stubs import StubChatLLM
+
+BASE = "http://faq.test/"
+
+# S responde lento: T se encuentra primero por el camino largo raíz -> F -> F2 -> T
+SITE = {
+    "": ["s", "f"],
+    "s": ["t"],
+    "f": ["f2"],
+    "f2": ["t"],
+    "t": ["u"],
+    "u": [],
+}
+
+async def serve(request: httpx.Request) -> httpx.Response:
+    page = request.url.path.lstrip("/")
+    if page == "s":
+        await asyncio.sleep(0.2)
+    links = "".join(f'<a href="/{link}">{link}</a>' for link in SITE[page])
+    return httpx.Response(200, text=f"<html><body><p>Página {page}</p>{links}</body></html>")
+
+def test_page_reached_first_through_a_longer_path_is_followed_from_its_shortest_depth(monkeypatch):
+    client = httpx.AsyncClient
+    monkeypatch.setattr(falabella_scraper.httpx, "AsyncClient", lambda **kwargs: client(transport=httpx.MockTransport(serve), **kwargs))
+    scraper = FAQScraper(BASE, model="stub", llm=StubChatLLM(), rate_limit=0)
+
+    scraper.scrape(BASE, max_depth=3)
+
+    # T está a profundidad 2 por S, así que U (profundidad 3) también se recorre
+    assert f"{BASE}u" in scraper.visited_urls
+    assert scraper.pages == len(SITE)